@@ -0,0 +1,34 @@
+import argparse
+import logging
+import os
+
+import pyopencl as cl
+
+from solver.opencl.autotune import tune_device
+
+
+def main():
+    logging.basicConfig(
+        level=os.getenv("LOGLEVEL", "INFO"),
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Find the best grid parameters for every OpenCL device and cache them"
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=5.0,
+        help="seconds to measure each candidate (default: %(default)s)",
+    )
+    args = parser.parse_args()
+
+    for platform in cl.get_platforms():
+        for device in platform.get_devices():
+            tune_device(device, duration=args.duration)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import resource
+import secrets
+import sys
+import time
+
+from main import create_solver, options_by_solver
+from miner.stub import MAX_UINT256, adjust_difficulty
+from miner.verify import MAGIC_NUMBER
+from solver.base import BaseSolver
+from solver.combined import CombinedSolver
+from utils.ecdsa import get_account_ab
+from utils.stats import Histogram
+
+logger = logging.getLogger("bench")
+
+
+def process_cpu_seconds(pid: int) -> float:
+    # utime and stime, in clock ticks, follow the parenthesised command name
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def solver_processes(solver: BaseSolver) -> list:
+    if isinstance(solver, CombinedSolver):
+        return [process for s in solver.solvers for process in solver_processes(s)]
+    return getattr(solver, "processes", [])
+
+
+def cpu_seconds(solver: BaseSolver) -> float | None:
+    """
+    CPU time of this process and the live worker processes of the solver,
+    None where the usage of running workers can't be read
+    """
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    seconds = usage.ru_utime + usage.ru_stime
+    # Workers run for the whole step, RUSAGE_CHILDREN only counts exited ones
+    processes = solver_processes(solver)
+    if processes and not os.path.exists("/proc/self/stat"):
+        return None
+    return seconds + sum(process_cpu_seconds(process.pid) for process in processes)
+
+
+def leading_zero_bits(difficulty: int) -> int:
+    return 160 - difficulty.bit_length()
+
+
+def solver_devices(solver: BaseSolver) -> list:
+    if isinstance(solver, CombinedSolver):
+        return [device for s in solver.solvers for device in solver_devices(s)]
+    # Threaded OpenCL devices wrap the Device doing the work
+    return [
+        getattr(device, "device", device) for device in getattr(solver, "devices", [])
+    ]
+
+
+def device_speeds(solver: BaseSolver) -> list[dict]:
+    speeds = []
+    for device in solver_devices(solver):
+        speed = device.mining_speed
+        speeds.append(
+            {
+                "name": device.name,
+                "hashrate": speed,
+                "rounds_per_second": speed / (device.size * device.variants),
+            }
+        )
+    return speeds
+
+
+def device_info(solver: BaseSolver) -> list[dict]:
+    return [
+        {
+            "name": device.name,
+            "inverse_size": device.inverse_size,
+            "inverse_multiple": device.inverse_multiple,
+            "batch_size": device.batch_size,
+            "pipeline_depth": device.pipeline_depth,
+            "fused_score": device.fused_score,
+            "endomorphism": device.endomorphism,
+        }
+        for device in solver_devices(solver)
+    ]
+
+
+async def mine_step(
+    solver: BaseSolver, difficulty: int, duration: float, verify: int
+) -> dict:
+    """
+    Mine a synthetic problem for duration seconds and measure it
+    """
+    private_key_a = int(secrets.token_hex(32), base=16)
+    solutions = 0
+    invalid = 0
+    time_to_first_hash = None
+    time_to_first_solution = None
+
+    # Only a fresh solver tells how long the first round takes
+    measure_first_hash = solver.get_speed() == 0
+    t_start = time.monotonic()
+    cpu_start = cpu_seconds(solver)
+
+    async def consume():
+        nonlocal solutions, invalid, time_to_first_solution
+        async for private_key_b in solver.get_solutions(private_key_a, difficulty):
+            if time_to_first_solution is None:
+                time_to_first_solution = time.monotonic() - t_start
+            # Checking a key costs more than finding it, only check a sample
+            if solutions < verify:
+                account_ab = get_account_ab(private_key_a, private_key_b)
+                if int(account_ab.address, base=16) ^ MAGIC_NUMBER > difficulty:
+                    invalid += 1
+            solutions += 1
+            # Solvers without awaits of their own would starve the event loop
+            await asyncio.sleep(0)
+
+    consumer = asyncio.create_task(consume())
+    try:
+        while (elapsed := time.monotonic() - t_start) < duration:
+            if measure_first_hash and solver.get_speed() > 0:
+                measure_first_hash = False
+                time_to_first_hash = elapsed
+            if consumer.done():
+                consumer.result()
+            await asyncio.sleep(0.01)
+
+        hashrate = solver.get_speed()
+        devices = device_speeds(solver)
+        cpu_end = cpu_seconds(solver)
+    finally:
+        consumer.cancel()
+        await asyncio.gather(consumer, return_exceptions=True)
+
+    elapsed = time.monotonic() - t_start
+    return {
+        "difficulty": f"0x{difficulty.to_bytes(20, byteorder='big').hex()}",
+        "leading_zero_bits": leading_zero_bits(difficulty),
+        "seconds": elapsed,
+        "time_to_first_hash": time_to_first_hash,
+        "time_to_first_solution": time_to_first_solution,
+        "hashrate": hashrate,
+        "devices": devices,
+        "solutions": solutions,
+        "solutions_per_second": solutions / elapsed,
+        "invalid_solutions": invalid,
+        "cpu_percent": (
+            100 * (cpu_end - cpu_start) / elapsed
+            if cpu_start is not None and cpu_end is not None
+            else None
+        ),
+    }
+
+
+async def switch_latency(
+    solver: BaseSolver, difficulty: int, switches: int, timeout: float
+) -> dict:
+    """
+    Time from a new problem until its first solution, over several problems
+    """
+    histogram = Histogram()
+    timeouts = 0
+
+    async def first_solution(private_key_a: int):
+        async for private_key_b in solver.get_solutions(private_key_a, difficulty):
+            return private_key_b
+
+    for _ in range(switches):
+        t_start = time.monotonic()
+        try:
+            await asyncio.wait_for(
+                first_solution(int(secrets.token_hex(32), base=16)), timeout
+            )
+        except asyncio.TimeoutError:
+            timeouts += 1
+            continue
+        histogram.observe(time.monotonic() - t_start)
+
+    return {
+        "difficulty": f"0x{difficulty.to_bytes(20, byteorder='big').hex()}",
+        "switches": switches,
+        "timeouts": timeouts,
+        "avg": histogram.sum / histogram.count if histogram.count else None,
+        "p50": histogram.quantile(0.5) if histogram.count else None,
+        "p99": histogram.quantile(0.99) if histogram.count else None,
+        "max": histogram.max if histogram.count else None,
+    }
+
+
+async def bench(args) -> dict:
+    options = json.loads(args.options)
+    names = args.solver.split(",")
+    solver_options = options_by_solver(names, options)
+
+    t_start = time.monotonic()
+    solvers = [create_solver(name, **solver_options[name]) for name in names]
+    solver = solvers[0] if len(solvers) == 1 else CombinedSolver(*solvers)
+    setup_seconds = time.monotonic() - t_start
+
+    report = {
+        "solver": args.solver,
+        "options": options,
+        "host": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "devices": device_info(solver),
+        "setup_seconds": setup_seconds,
+        "time_to_first_hash": None,
+        "sweep": [],
+    }
+
+    # Same adaptive loop as StubMiner, every step is one point of the sweep
+    difficulty = MAX_UINT256 >> args.start_bits
+    for _ in range(args.steps):
+        result = await mine_step(solver, difficulty, args.step_duration, args.verify)
+        logger.info(
+            f"├ {result['leading_zero_bits']} zero bits:"
+            f" {solver.hashrate()}, {result['solutions_per_second']:.2f} solutions/s"
+        )
+        report["sweep"].append(result)
+        if report["time_to_first_hash"] is None:
+            report["time_to_first_hash"] = result.pop("time_to_first_hash")
+        else:
+            del result["time_to_first_hash"]
+        difficulty = adjust_difficulty(
+            difficulty, result["solutions_per_second"], args.target_rate
+        )
+
+    if args.switches:
+        report["switch_latency"] = await switch_latency(
+            solver, MAX_UINT256 >> args.start_bits, args.switches, args.step_duration
+        )
+    report["stats"] = {name: str(value) for name, value in solver.get_stats().items()}
+
+    if args.trace:
+        from solver.opencl.profiling import chrome_trace
+
+        profilers = {
+            f"gpu{device_idx} {device.name}": device.profiler
+            for device_idx, device in enumerate(solver_devices(solver))
+            if device.profiler is not None
+        }
+        with open(args.trace, "w") as f:
+            json.dump(chrome_trace(profilers), f)
+
+    for s in solvers:
+        if hasattr(s, "close"):
+            s.close()
+    return report
+
+
+def main():
+    logging.basicConfig(
+        level=os.getenv("LOGLEVEL", "INFO"),
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+        stream=sys.stderr,
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Benchmark solvers on synthetic problems, no RPC or funded key needed"
+    )
+    parser.add_argument(
+        "--solver",
+        default="opencl",
+        help="opencl, cpu, cpu-pool or stub, comma separated to combine (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--options",
+        default="{}",
+        help="solver options as JSON, e.g. '{\"batch_size\": 4}', keyed by solver name"
+        " when combined: '{\"opencl\": {\"batch_size\": 4}}' (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--steps",
+        type=int,
+        default=5,
+        help="number of difficulty steps (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--step-duration",
+        type=float,
+        default=10.0,
+        help="seconds to mine each step (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--start-bits",
+        type=int,
+        default=8,
+        help="leading zero bits of the first difficulty (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--target-rate",
+        type=float,
+        default=0.5,
+        help="solutions/s the difficulty is adjusted towards (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--switches",
+        type=int,
+        default=10,
+        help="problem switches to measure latency of (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--verify",
+        type=int,
+        default=10,
+        help="solutions to verify on the host per step (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--trace",
+        help="write sampled GPU commands as a Chrome trace to this file, needs"
+        " profile_every in --options",
+    )
+    parser.add_argument(
+        "--output", help="write JSON report to this file instead of stdout"
+    )
+    args = parser.parse_args()
+
+    report = asyncio.run(bench(args))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
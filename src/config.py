@@ -7,13 +7,11 @@ if v < (3, 10):
     )
     exit(0)
 
+import asyncio
 import logging
 import os
 
 import dotenv
-from eth_account import Account
-from eth_utils import is_same_address
-from web3 import Web3
 
 dotenv.load_dotenv()
 
@@ -25,52 +23,132 @@ logging.basicConfig(
 )
 
 # Node Config
-RPC = os.getenv("INFINITY_RPC", "https://rpc.soniclabs.com")
+# Comma separated: transactions are sent to all, reads go to the fastest node
+RPC = os.getenv("INFINITY_RPC", "https://rpc.soniclabs.com").split(",")
 WS = os.getenv("INFINITY_WS", "wss://rpc.soniclabs.com")
+# Also read the problem at every new block, next to problem logs and polling
+PINNED_PROBLEM_READS = os.getenv("INFINITY_PINNED_PROBLEM_READS", "0") == "1"
+
+# Serve Prometheus metrics on http://<host>:<port>/metrics, 0 disables it
+METRICS_PORT = int(os.getenv("INFINITY_METRICS_PORT", "0"))
 
 # Common miner config
 MINER_PRIVATE_KEY = os.getenv("INFINITY_MINER_PRIVATE_KEY")
 REWARDS_RECIPIENT_ADDRESS = os.getenv("INFINITY_REWARDS_RECIPIENT_ADDRESS")
 
+# Solver backends, comma separated: "opencl" (GPU), "cpu" (NumPy, single thread),
+# "cpu-pool" (NumPy, one process per core) or "remote" (workers, see worker.py)
+SOLVER = os.getenv("INFINITY_SOLVER", "opencl").split(",")
+CPU_WORKERS = int(os.getenv("INFINITY_CPU_WORKERS", "0")) or None
+
+# Coordinator/worker mode: the "remote" solver waits for workers on this address,
+# workers (worker.py) connect to INFINITY_COORDINATOR as host:port.
+# Workers aren't authenticated, anyone reaching the port can send solutions:
+# only listen on other interfaces than localhost within a trusted network
+COORDINATOR_HOST = os.getenv("INFINITY_COORDINATOR_HOST", "127.0.0.1")
+COORDINATOR_PORT = int(os.getenv("INFINITY_COORDINATOR_PORT", "8556"))
+COORDINATOR = os.getenv("INFINITY_COORDINATOR", f"127.0.0.1:{COORDINATOR_PORT}")
+# Shown on the coordinator, defaults to the host name
+WORKER_NAME = os.getenv("INFINITY_WORKER_NAME")
+
+# OpenCL solver config (comma separated values are applied per device)
+PIPELINE_DEPTH = [int(v) for v in os.getenv("INFINITY_PIPELINE_DEPTH", "2").split(",")]
+BATCH_SIZE = [int(v) for v in os.getenv("INFINITY_BATCH_SIZE", "1").split(",")]
+# Tune grid size of unknown devices on start (result is cached)
+AUTOTUNE = os.getenv("INFINITY_AUTOTUNE", "0") == "1"
+# Drive every GPU from its own thread instead of the event loop
+DEVICE_THREADS = os.getenv("INFINITY_DEVICE_THREADS", "0") == "1"
+# Score addresses inside the iterate kernel, 0 runs the separate score kernel
+FUSED_SCORE = os.getenv("INFINITY_FUSED_SCORE", "1") == "1"
+# Score six keys per computed point (endomorphism and negation), needs the fused kernel
+ENDOMORPHISM = os.getenv("INFINITY_ENDOMORPHISM", "0") == "1"
+# Time the kernels of one in every N GPU batches, reported with the stats, 0 disables it
+PROFILE_EVERY = int(os.getenv("INFINITY_PROFILE_EVERY", "0"))
+
+
+# Seconds the startup RPC check waits for a node
+RPC_CHECK_TIMEOUT = float(os.getenv("INFINITY_RPC_CHECK_TIMEOUT", "10"))
 
-# ============ Config validation ============
-
-if MINER_PRIVATE_KEY is None:
-    print(
-        "[ERROR]: INFINITY_MINER_PRIVATE_KEY is missing. Please set it in your .env file."
-    )
-    exit(0)
-
-try:
-    miner_account = Account.from_key(MINER_PRIVATE_KEY)
-except Exception:
-    pk = (
-        MINER_PRIVATE_KEY[:4]
-        + "*" * (len(MINER_PRIVATE_KEY) - 8)
-        + MINER_PRIVATE_KEY[-4:]
-    )
-    print(
-        f"[ERROR]: The value provided for INFINITY_MINER_PRIVATE_KEY ({pk}) is not a valid private key."
-    )
-    exit(0)
 
-if REWARDS_RECIPIENT_ADDRESS is None:
-    REWARDS_RECIPIENT_ADDRESS = miner_account.address
-
-
-if not is_same_address(miner_account.address, REWARDS_RECIPIENT_ADDRESS):
-    print(
-        f"[WARNING]: Make sure you have access to the INFINITY_REWARDS_RECIPIENT_ADDRESS ({REWARDS_RECIPIENT_ADDRESS})."
-    )
-
-try:
-    w3 = Web3(Web3.HTTPProvider(RPC))
-    miner_balance = w3.eth.get_balance(miner_account.address)
-except Exception:
-    print(f"[ERROR]: Unable to establish a connection with INFINITY_RPC ({RPC}).")
-    exit(0)
-
-if miner_balance < 10e18:
-    print(
-        f"[WARNING]: Current master balance is {miner_balance/1e18:.2f} $S. Consider topping it up."
-    )
+# ============ Config validation ============
+# Run by main on startup, not on import: web3 and the RPC round trips are slow
+# and don't need to hold up building the solvers.
+
+
+def validate():
+    """
+    Check the miner key and the rewards recipient, exits on an invalid key
+    """
+    global REWARDS_RECIPIENT_ADDRESS
+
+    from eth_account import Account
+    from eth_utils import is_same_address
+
+    if MINER_PRIVATE_KEY is None:
+        print(
+            "[ERROR]: INFINITY_MINER_PRIVATE_KEY is missing. Please set it in your .env file."
+        )
+        exit(0)
+
+    try:
+        miner_account = Account.from_key(MINER_PRIVATE_KEY)
+    except Exception:
+        pk = (
+            MINER_PRIVATE_KEY[:4]
+            + "*" * (len(MINER_PRIVATE_KEY) - 8)
+            + MINER_PRIVATE_KEY[-4:]
+        )
+        print(
+            f"[ERROR]: The value provided for INFINITY_MINER_PRIVATE_KEY ({pk}) is not a valid private key."
+        )
+        exit(0)
+
+    if REWARDS_RECIPIENT_ADDRESS is None:
+        REWARDS_RECIPIENT_ADDRESS = miner_account.address
+
+    if not is_same_address(miner_account.address, REWARDS_RECIPIENT_ADDRESS):
+        print(
+            f"[WARNING]: Make sure you have access to the INFINITY_REWARDS_RECIPIENT_ADDRESS ({REWARDS_RECIPIENT_ADDRESS})."
+        )
+
+
+async def check_rpc() -> bool:
+    """
+    Check all nodes at once and the miner balance, False when none is reachable
+    """
+    from eth_account import Account
+    from web3 import AsyncWeb3
+
+    address = Account.from_key(MINER_PRIVATE_KEY).address
+
+    async def get_balance(rpc: str) -> int | None:
+        w3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(rpc))
+        try:
+            return await asyncio.wait_for(
+                w3.eth.get_balance(address), RPC_CHECK_TIMEOUT
+            )
+        except Exception:
+            print(
+                f"[WARNING]: Unable to establish a connection with INFINITY_RPC ({rpc})."
+            )
+            return None
+        finally:
+            await w3.provider.disconnect()
+
+    balances = [
+        balance
+        for balance in await asyncio.gather(*(get_balance(rpc) for rpc in RPC))
+        if balance is not None
+    ]
+    if not balances:
+        print(
+            f"[ERROR]: Unable to establish a connection with INFINITY_RPC ({','.join(RPC)})."
+        )
+        return False
+
+    miner_balance = balances[0]
+    if miner_balance < 10e18:
+        print(
+            f"[WARNING]: Current master balance is {miner_balance/1e18:.2f} $S. Consider topping it up."
+        )
+    return True
@@ -0,0 +1,2 @@
+from .chain import Chain, RPCError
+from .server import DevnetServer
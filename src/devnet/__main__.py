@@ -0,0 +1,88 @@
+import argparse
+import asyncio
+import logging
+import os
+
+from .chain import Chain
+from .server import DevnetServer
+
+
+async def serve(args):
+    chain = Chain(
+        chain_id=args.chain_id,
+        block_time=args.block_time,
+        difficulty=(1 << (160 - args.difficulty_bits)) - 1,
+        problem_interval=args.problem_interval,
+        balances={address: args.balance * 10**18 for address in args.fund},
+    )
+    server = DevnetServer(chain, latency=args.latency, jitter=args.jitter)
+    await server.start(args.host, args.port)
+    logging.info(
+        f"Devnet listening on http://{args.host}:{args.port} (ws on the same port)"
+    )
+    await chain.run()
+
+
+def main():
+    logging.basicConfig(
+        level=os.getenv("LOGLEVEL", "INFO"),
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+    parser = argparse.ArgumentParser(
+        prog="python3 -m devnet",
+        description="Local JSON-RPC and WebSocket stand-in for the chain the miner uses",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8545)
+    parser.add_argument("--chain-id", type=int, default=146)
+    parser.add_argument(
+        "--block-time",
+        type=float,
+        default=1.0,
+        help="seconds between blocks (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--difficulty-bits",
+        type=int,
+        default=16,
+        help="leading zero bits of the difficulty (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--problem-interval",
+        type=float,
+        help="seconds until another miner solves a problem (default: never)",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="seconds added to every response and notification (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0.0,
+        help="up to this many random seconds added on top of latency (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--fund",
+        action="append",
+        default=[],
+        metavar="ADDRESS",
+        help="address to fund at genesis, can be repeated",
+    )
+    parser.add_argument(
+        "--balance",
+        type=int,
+        default=1000,
+        help="native balance of funded addresses in S (default: %(default)s)",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(serve(args))
+
+
+if __name__ == "__main__":
+    main()
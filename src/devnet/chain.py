@@ -0,0 +1,448 @@
+import asyncio
+import heapq
+import logging
+import secrets
+import time
+from collections import deque
+
+import rlp
+from eth_abi import decode, encode
+from eth_account import Account
+from eth_account.messages import encode_defunct
+from eth_account.typed_transactions import TypedTransaction
+from eth_keys.backends.native.ecdsa import fast_add
+from eth_utils import (
+    abi_to_signature,
+    function_abi_to_4byte_selector,
+    keccak,
+    to_checksum_address,
+)
+from web3 import Web3
+
+from miner.solo.constants import ERC20_ABI, INFINITY_ADDRESS, POW_ABI, POW_ADDRESS
+from utils.ecdsa import private_key_to_ec_point
+
+logger = logging.getLogger(__name__)
+
+MAGIC_NUMBER = 0x8888888888888888888888888888888888888888
+# 16 leading zero bits, a few solutions per second on a CPU device
+DIFFICULTY = (1 << 144) - 1
+SUBMIT_GAS = 150_000
+TRANSFER_GAS = 21_000
+# Replacement of a pending transaction must raise its fee by 10%, like geth
+REPLACEMENT_FEE_BUMP = 1.1
+# Solutions of this many previous problems are told apart from invalid ones
+STALE_PROBLEMS = 16
+
+
+class RPCError(Exception):
+    def __init__(self, message: str, code: int = -32000):
+        super().__init__(message)
+        self.code = code
+
+
+def _abi_entry(abi: list, type_: str, name: str) -> dict:
+    return next(e for e in abi if e.get("type") == type_ and e["name"] == name)
+
+
+def _selector(abi: list, name: str) -> bytes:
+    return function_abi_to_4byte_selector(_abi_entry(abi, "function", name))
+
+
+def _topic(abi: list, name: str) -> bytes:
+    return keccak(text=abi_to_signature(_abi_entry(abi, "event", name)))
+
+
+SUBMIT_SELECTOR = _selector(POW_ABI, "submit")
+NEW_PROBLEM_TOPIC = _topic(POW_ABI, "NewProblem")
+SUBMISSION_TOPIC = _topic(POW_ABI, "Submission")
+
+
+def address_of_point(x: int, y: int) -> str:
+    public_key = x.to_bytes(32, byteorder="big") + y.to_bytes(32, byteorder="big")
+    return to_checksum_address(keccak(public_key)[12:])
+
+
+class Transaction:
+    def __init__(self, raw: bytes):
+        self.raw = raw
+        self.hash = keccak(raw)
+        try:
+            self.sender = Account.recover_transaction(raw)
+        except Exception as e:
+            raise RPCError(f"invalid sender: {e}")
+
+        if raw[0] < 0x7F:
+            fields = TypedTransaction.from_bytes(raw).as_dict()
+            self.chain_id = fields["chainId"]
+            self.max_fee = fields.get("maxFeePerGas", fields.get("gasPrice"))
+            self.priority_fee = fields.get("maxPriorityFeePerGas", self.max_fee)
+            self.type = fields["type"]
+        else:
+            fields = dict(
+                zip(
+                    ("nonce", "gasPrice", "gas", "to", "value", "data", "v"),
+                    rlp.decode(raw)[:7],
+                )
+            )
+            fields = {
+                name: (
+                    value if name in ("to", "data") else int.from_bytes(value, "big")
+                )
+                for name, value in fields.items()
+            }
+            # EIP-155: v = chainId * 2 + 35 + parity
+            self.chain_id = (fields["v"] - 35) // 2 if fields["v"] >= 35 else None
+            self.max_fee = self.priority_fee = fields["gasPrice"]
+            self.type = 0
+
+        self.nonce = fields["nonce"]
+        self.gas = fields["gas"]
+        self.to = to_checksum_address(fields["to"]) if fields["to"] else None
+        self.value = fields["value"]
+        self.data = bytes(fields["data"])
+        self.received_at = time.monotonic()
+
+    def effective_gas_price(self, base_fee: int) -> int:
+        return min(self.max_fee, base_fee + self.priority_fee)
+
+
+class Chain:
+    """
+    In-memory stand-in for what SoloMiner uses on chain: the PoW contract, the
+    token balance, account nonces and a block producer.
+
+    Transactions are checked like a node would (signature, chain id, nonce, fees),
+    submit calls are checked like the contract would (PoW rule and signatureAB).
+    """
+
+    def __init__(
+        self,
+        chain_id: int = 146,
+        block_time: float = 1.0,
+        difficulty: int = DIFFICULTY,
+        problem_interval: float | None = None,
+        base_fee: int = 50 * 10**9,
+        reward: int = 8 * 10**18,
+        balances: dict[str, int] | None = None,
+    ):
+        self.chain_id = chain_id
+        self.block_time = block_time
+        self.difficulty = difficulty
+        # Problems solved by other miners, None keeps a problem until it's solved
+        self.problem_interval = problem_interval
+        self.base_fee = base_fee
+        self.reward = reward
+
+        self.balances = {
+            to_checksum_address(address): balance
+            for address, balance in (balances or {}).items()
+        }
+        self.token_balances: dict[str, int] = {}
+        self.nonces: dict[str, int] = {}
+
+        self.pending: dict[tuple[str, int], Transaction] = {}
+        self.transactions: dict[bytes, Transaction] = {}
+        self.receipts: dict[bytes, dict] = {}
+        self.blocks: list[dict] = []
+        # Queues of (kind, payload) for subscribers, kind is "newHeads" or "logs"
+        self.listeners: set[asyncio.Queue] = set()
+
+        self.stats = {
+            "transactions": 0,
+            "rejected_transactions": 0,
+            "accepted_submissions": 0,
+            "stale_submissions": 0,
+            "invalid_submissions": 0,
+            "problems": 0,
+        }
+        # Seconds from problem start to arrival of each submit transaction
+        self.problem_to_tx: list[float] = []
+
+        self.problem_nonce = 0
+        self.previous_public_keys_a = deque(maxlen=STALE_PROBLEMS)
+        self.logs: list[dict] = []
+        self._new_problem()
+        self._seal_block()
+
+    # ============ Contract state ============
+
+    def _new_problem(self):
+        if self.problem_nonce:
+            self.previous_public_keys_a.append(self.public_key_a)
+        self.problem_nonce += 1
+        self.private_key_a = int(secrets.token_hex(32), base=16)
+        self.public_key_a = private_key_to_ec_point(self.private_key_a)
+        self.problem_started = time.monotonic()
+        self.stats["problems"] += 1
+
+        self._log(
+            POW_ADDRESS,
+            [NEW_PROBLEM_TOPIC],
+            encode(
+                ["uint256", "uint256", "uint160"],
+                [self.problem_nonce, self.private_key_a, self.difficulty],
+            ),
+        )
+
+    def _log(self, address: str, topics: list[bytes], data: bytes):
+        self.logs.append({"address": address, "topics": topics, "data": data})
+
+    def call(self, to: str, data: bytes) -> bytes:
+        to = to_checksum_address(to)
+        selector, args = data[:4], data[4:]
+
+        if to == POW_ADDRESS:
+            if selector == _selector(POW_ABI, "currentProblem"):
+                return encode(
+                    ["uint256", "uint256", "uint160"],
+                    [self.problem_nonce, self.private_key_a, self.difficulty],
+                )
+            if selector == _selector(POW_ABI, "difficulty"):
+                return encode(["uint160"], [self.difficulty])
+            if selector == _selector(POW_ABI, "problemNonce"):
+                return encode(["uint256"], [self.problem_nonce])
+            if selector == _selector(POW_ABI, "privateKeyA"):
+                return encode(["uint256"], [self.private_key_a])
+            if selector == _selector(POW_ABI, "reward"):
+                return encode(["uint256"], [self.reward])
+            if selector == _selector(POW_ABI, "numSubmissions"):
+                return encode(["uint256"], [self.stats["accepted_submissions"]])
+
+        if to == INFINITY_ADDRESS:
+            if selector == _selector(ERC20_ABI, "balanceOf"):
+                (owner,) = decode(["address"], args)
+                return encode(
+                    ["uint256"],
+                    [self.token_balances.get(to_checksum_address(owner), 0)],
+                )
+            if selector == _selector(ERC20_ABI, "decimals"):
+                return encode(["uint8"], [18])
+
+        raise RPCError("execution reverted")
+
+    def _submit(self, tx: Transaction) -> bool:
+        """
+        PoW.submit, True when the solution is accepted
+        """
+        recipient, (x, y), signature, data = decode(
+            ["address", "(uint256,uint256)", "bytes", "bytes"], tx.data[4:]
+        )
+
+        recipient = to_checksum_address(recipient)
+        address_ab = address_of_point(*fast_add(self.public_key_a, (x, y)))
+        message = Web3.solidity_keccak(["address", "bytes"], [recipient, data])
+        try:
+            signer = Account.recover_message(
+                encode_defunct(message), signature=signature
+            )
+        except Exception:
+            signer = None
+
+        if int(address_ab, 16) ^ MAGIC_NUMBER > self.difficulty or signer != address_ab:
+            # A solution of a previous problem is just late, anything else is broken
+            if signer is not None and any(
+                address_of_point(*fast_add(public_key_a, (x, y))) == signer
+                for public_key_a in self.previous_public_keys_a
+            ):
+                self.stats["stale_submissions"] += 1
+            else:
+                self.stats["invalid_submissions"] += 1
+            return False
+
+        self.token_balances[recipient] = (
+            self.token_balances.get(recipient, 0) + self.reward
+        )
+        self.stats["accepted_submissions"] += 1
+        self._log(
+            POW_ADDRESS,
+            [
+                SUBMISSION_TOPIC,
+                encode(["address"], [tx.sender]),
+                encode(["address"], [address_ab]),
+            ],
+            encode(["uint256", "bytes"], [self.reward, data]),
+        )
+        self._new_problem()
+        return True
+
+    # ============ Node ============
+
+    @property
+    def block_number(self) -> int:
+        return len(self.blocks) - 1
+
+    def pending_nonce(self, address: str) -> int:
+        address = to_checksum_address(address)
+        nonce = self.nonces.get(address, 0)
+        while (address, nonce) in self.pending:
+            nonce += 1
+        return nonce
+
+    def send_raw_transaction(self, raw: bytes) -> bytes:
+        tx = Transaction(raw)
+        self.stats["transactions"] += 1
+        try:
+            self._validate(tx)
+        except RPCError:
+            self.stats["rejected_transactions"] += 1
+            raise
+
+        if tx.to == POW_ADDRESS and tx.data[:4] == SUBMIT_SELECTOR:
+            self.problem_to_tx.append(tx.received_at - self.problem_started)
+
+        self.pending[(tx.sender, tx.nonce)] = tx
+        self.transactions[tx.hash] = tx
+        return tx.hash
+
+    def _validate(self, tx: Transaction):
+        if tx.hash in self.transactions:
+            raise RPCError("already known")
+        if tx.chain_id not in (None, self.chain_id):
+            raise RPCError(f"invalid chain id {tx.chain_id}")
+        if tx.nonce < self.nonces.get(tx.sender, 0):
+            raise RPCError("nonce too low")
+        if tx.max_fee < self.base_fee:
+            raise RPCError("max fee per gas less than block base fee")
+        if self.balances.get(tx.sender, 0) < tx.gas * tx.max_fee + tx.value:
+            raise RPCError("insufficient funds for gas * price + value")
+
+        replaced = self.pending.get((tx.sender, tx.nonce))
+        if replaced is not None:
+            if tx.max_fee < replaced.max_fee * REPLACEMENT_FEE_BUMP:
+                raise RPCError("replacement transaction underpriced")
+            del self.transactions[replaced.hash]
+
+    def _execute(self, tx: Transaction, index: int) -> dict:
+        first_log = len(self.logs)
+        status = 1
+        gas_used = TRANSFER_GAS
+        if tx.to == POW_ADDRESS and tx.data[:4] == SUBMIT_SELECTOR:
+            gas_used = SUBMIT_GAS
+            try:
+                status = int(self._submit(tx))
+            except Exception:
+                self.stats["invalid_submissions"] += 1
+                status = 0
+        elif tx.to is not None and tx.value:
+            self.balances[tx.to] = self.balances.get(tx.to, 0) + tx.value
+
+        gas_price = tx.effective_gas_price(self.base_fee)
+        self.balances[tx.sender] -= gas_used * gas_price + tx.value * status
+        self.nonces[tx.sender] = tx.nonce + 1
+
+        return {
+            "transactionHash": tx.hash,
+            "transactionIndex": index,
+            "from": tx.sender,
+            "to": tx.to,
+            "status": status,
+            "gasUsed": gas_used,
+            "cumulativeGasUsed": gas_used,
+            "effectiveGasPrice": gas_price,
+            "type": tx.type,
+            "logs": self.logs[first_log:],
+        }
+
+    def _ready_transactions(self) -> list[Transaction]:
+        """
+        Pending transactions without nonce gaps, in nonce order per sender
+        """
+        queues = {}
+        for sender in {sender for sender, _ in self.pending}:
+            nonce = self.nonces.get(sender, 0)
+            queue = deque()
+            while (sender, nonce) in self.pending:
+                queue.append(self.pending.pop((sender, nonce)))
+                nonce += 1
+            if queue:
+                queues[sender] = queue
+
+        # Highest tip first, like a block builder would, but only ever the lowest
+        # nonce left of a sender
+        heads = [
+            (-queue[0].effective_gas_price(self.base_fee), sender)
+            for sender, queue in queues.items()
+        ]
+        heapq.heapify(heads)
+        ready = []
+        while heads:
+            _, sender = heapq.heappop(heads)
+            queue = queues[sender]
+            ready.append(queue.popleft())
+            if queue:
+                heapq.heappush(
+                    heads, (-queue[0].effective_gas_price(self.base_fee), sender)
+                )
+        return ready
+
+    def _seal_block(self, receipts: list[dict] = ()):
+        number = len(self.blocks)
+        parent_hash = self.blocks[-1]["hash"] if self.blocks else bytes(32)
+        block = {
+            "number": number,
+            "hash": keccak(parent_hash + number.to_bytes(32, byteorder="big")),
+            "parentHash": parent_hash,
+            "timestamp": int(time.time()),
+            "baseFeePerGas": self.base_fee,
+            "gasLimit": 30_000_000,
+            "gasUsed": sum(receipt["gasUsed"] for receipt in receipts),
+            "miner": "0x" + "00" * 20,
+            "transactions": [receipt["transactionHash"] for receipt in receipts],
+        }
+        self.blocks.append(block)
+
+        logs = []
+        for receipt in receipts:
+            receipt["blockNumber"] = number
+            receipt["blockHash"] = block["hash"]
+            for log in receipt["logs"]:
+                log.update(
+                    blockNumber=number,
+                    blockHash=block["hash"],
+                    transactionHash=receipt["transactionHash"],
+                    transactionIndex=receipt["transactionIndex"],
+                    logIndex=len(logs),
+                    removed=False,
+                )
+                logs.append(log)
+            self.receipts[receipt["transactionHash"]] = receipt
+
+        # Logs emitted outside of transactions (problems solved by others)
+        for log in self.logs:
+            if "blockNumber" not in log:
+                log.update(
+                    blockNumber=number,
+                    blockHash=block["hash"],
+                    transactionHash=bytes(32),
+                    transactionIndex=0,
+                    logIndex=len(logs),
+                    removed=False,
+                )
+                logs.append(log)
+        self.logs = []
+
+        for queue in self.listeners:
+            queue.put_nowait(("newHeads", block))
+            for log in logs:
+                queue.put_nowait(("logs", log))
+        return block
+
+    def mine_block(self) -> dict:
+        receipts = [
+            self._execute(tx, index)
+            for index, tx in enumerate(self._ready_transactions())
+        ]
+
+        if (
+            self.problem_interval is not None
+            and time.monotonic() - self.problem_started >= self.problem_interval
+        ):
+            self._new_problem()
+
+        return self._seal_block(receipts)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.block_time - time.time() % self.block_time)
+            self.mine_block()
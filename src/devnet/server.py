@@ -0,0 +1,238 @@
+import asyncio
+import json
+import logging
+import random
+
+from aiohttp import WSCloseCode, WSMsgType, web
+from eth_utils import to_checksum_address
+from hexbytes import HexBytes
+
+from .chain import Chain, RPCError
+
+logger = logging.getLogger(__name__)
+
+
+def to_rpc(value):
+    """
+    Encode a result the way a node does: quantities and bytes as 0x-hex
+    """
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, int):
+        return hex(value)
+    if isinstance(value, bytes):
+        return "0x" + value.hex()
+    if isinstance(value, dict):
+        return {name: to_rpc(item) for name, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_rpc(item) for item in value]
+    raise TypeError(f"Can't encode {type(value)}")
+
+
+def log_matches(log: dict, log_filter: dict) -> bool:
+    address = log_filter.get("address")
+    if address is not None:
+        addresses = address if isinstance(address, list) else [address]
+        if log["address"] not in [to_checksum_address(a) for a in addresses]:
+            return False
+
+    for topic, expected in zip(log["topics"], log_filter.get("topics") or []):
+        if expected is None:
+            continue
+        expected = expected if isinstance(expected, list) else [expected]
+        if topic not in [HexBytes(e) for e in expected]:
+            return False
+    return True
+
+
+class DevnetServer:
+    """
+    JSON-RPC over HTTP and WebSocket on the same port, with configurable latency
+    """
+
+    def __init__(self, chain: Chain, latency: float = 0.0, jitter: float = 0.0):
+        self.chain = chain
+        self.latency = latency
+        self.jitter = jitter
+        self.requests: dict[str, int] = {}
+        # Round trips, a batch counts once
+        self.http_requests = 0
+        self.sockets: set[web.WebSocketResponse] = set()
+
+        self.methods = {
+            "web3_clientVersion": lambda: "8infinity-devnet",
+            "net_version": lambda: str(self.chain.chain_id),
+            "eth_chainId": lambda: self.chain.chain_id,
+            "eth_blockNumber": lambda: self.chain.block_number,
+            "eth_gasPrice": lambda: self.chain.base_fee,
+            "eth_maxPriorityFeePerGas": lambda: 1,
+            "eth_getBalance": self._get_balance,
+            "eth_getTransactionCount": self._get_transaction_count,
+            "eth_call": self._call,
+            "eth_estimateGas": lambda tx, *_: 1_000_000,
+            "eth_sendRawTransaction": self._send_raw_transaction,
+            "eth_getTransactionReceipt": self._get_transaction_receipt,
+            "eth_getBlockByNumber": self._get_block_by_number,
+        }
+
+    def sample_delay(self) -> float:
+        return self.latency + random.uniform(0, self.jitter)
+
+    async def delay(self):
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.sample_delay())
+
+    # ============ Methods ============
+
+    def _get_balance(self, address, block="latest"):
+        return self.chain.balances.get(to_checksum_address(address), 0)
+
+    def _get_transaction_count(self, address, block="latest"):
+        if block == "pending":
+            return self.chain.pending_nonce(address)
+        return self.chain.nonces.get(to_checksum_address(address), 0)
+
+    def _call(self, tx, block="latest"):
+        return self.chain.call(tx["to"], HexBytes(tx.get("data") or tx.get("input")))
+
+    def _send_raw_transaction(self, raw):
+        return self.chain.send_raw_transaction(HexBytes(raw))
+
+    def _get_transaction_receipt(self, tx_hash):
+        receipt = self.chain.receipts.get(HexBytes(tx_hash))
+        if receipt is None:
+            return None
+        return {**receipt, "logsBloom": bytes(256), "contractAddress": None}
+
+    def _get_block_by_number(self, number, full_transactions=False):
+        if number in ("latest", "pending", "safe", "finalized"):
+            return self.chain.blocks[-1]
+        if number == "earliest":
+            return self.chain.blocks[0]
+        number = int(number, 16)
+        return self.chain.blocks[number] if number < len(self.chain.blocks) else None
+
+    # ============ Transport ============
+
+    def handle(self, request: dict) -> dict:
+        method = request.get("method")
+        self.requests[method] = self.requests.get(method, 0) + 1
+        response = {"jsonrpc": "2.0", "id": request.get("id")}
+
+        handler = self.methods.get(method)
+        if handler is None:
+            logger.debug(f"Unsupported method {method}")
+            response["error"] = {"code": -32601, "message": f"{method} not supported"}
+            return response
+
+        try:
+            response["result"] = to_rpc(handler(*request.get("params", [])))
+        except RPCError as e:
+            response["error"] = {"code": e.code, "message": str(e)}
+        except Exception as e:
+            logger.debug(f"{method} failed", exc_info=True)
+            response["error"] = {"code": -32603, "message": str(e)}
+        return response
+
+    def handle_payload(self, payload):
+        if isinstance(payload, list):
+            return [self.handle(request) for request in payload]
+        return self.handle(payload)
+
+    async def http_handler(self, request: web.Request) -> web.StreamResponse:
+        if request.headers.get("Upgrade", "").lower() == "websocket":
+            return await self.ws_handler(request)
+
+        payload = await request.json()
+        self.http_requests += 1
+        await self.delay()
+        return web.json_response(self.handle_payload(payload))
+
+    async def ws_handler(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.sockets.add(ws)
+
+        subscriptions: dict[str, tuple[str, dict]] = {}
+        events = asyncio.Queue()
+        self.chain.listeners.add(events)
+        # Responses and notifications share one outbox, every message is delayed
+        # on its own but never overtakes an earlier one
+        outbox = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        last_deadline = 0.0
+
+        def post(message: dict):
+            nonlocal last_deadline
+            last_deadline = max(last_deadline, loop.time() + self.sample_delay())
+            outbox.put_nowait((last_deadline, message))
+
+        async def send():
+            while True:
+                deadline, message = await outbox.get()
+                await asyncio.sleep(deadline - loop.time())
+                await ws.send_str(json.dumps(message))
+
+        async def notify():
+            while True:
+                kind, payload = await events.get()
+                for subscription, (name, log_filter) in list(subscriptions.items()):
+                    if name != kind or (
+                        kind == "logs" and not log_matches(payload, log_filter)
+                    ):
+                        continue
+                    post(
+                        {
+                            "jsonrpc": "2.0",
+                            "method": "eth_subscription",
+                            "params": {
+                                "subscription": subscription,
+                                "result": to_rpc(payload),
+                            },
+                        }
+                    )
+
+        tasks = [asyncio.create_task(send()), asyncio.create_task(notify())]
+        try:
+            async for message in ws:
+                # web3 sends requests as binary frames
+                if message.type not in (WSMsgType.TEXT, WSMsgType.BINARY):
+                    continue
+
+                request = json.loads(message.data)
+                method = request.get("method")
+                if method == "eth_subscribe":
+                    name, *options = request["params"]
+                    subscription = "0x" + random.randbytes(16).hex()
+                    subscriptions[subscription] = (name, options[0] if options else {})
+                    response = {"jsonrpc": "2.0", "id": request["id"]}
+                    response["result"] = subscription
+                elif method == "eth_unsubscribe":
+                    found = subscriptions.pop(request["params"][0], None) is not None
+                    response = {"jsonrpc": "2.0", "id": request["id"], "result": found}
+                else:
+                    response = self.handle_payload(request)
+                post(response)
+        finally:
+            self.sockets.discard(ws)
+            self.chain.listeners.discard(events)
+            for task in tasks:
+                task.cancel()
+        return ws
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("*", "/", self.http_handler)
+        # Open sockets would hold up the shutdown until they time out
+        app.on_shutdown.append(lambda app: self.close_sockets())
+        return app
+
+    async def close_sockets(self):
+        for ws in list(self.sockets):
+            await ws.close(code=WSCloseCode.GOING_AWAY)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8545) -> web.AppRunner:
+        runner = web.AppRunner(self.app(), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
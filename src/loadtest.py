@@ -0,0 +1,315 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+from eth_abi import decode
+from eth_account import Account
+
+from devnet import Chain, DevnetServer
+from devnet.chain import SUBMIT_SELECTOR
+from main import create_solver, options_by_solver
+from miner.solo import SoloMiner
+from solver.base import BaseSolver
+from solver.combined import CombinedSolver
+from utils.ecdsa import private_key_to_ec_point
+from utils.metrics import serve as serve_metrics
+
+logger = logging.getLogger("loadtest")
+
+
+class TimedSolver(BaseSolver):
+    """
+    Records when every solution leaves the solver
+    """
+
+    def __init__(self, solver: BaseSolver):
+        self.solver = solver
+        self.found: list[tuple[float, int]] = []
+
+    async def get_solutions(self, private_key_a, difficulty):
+        async for private_key_b in self.solver.get_solutions(private_key_a, difficulty):
+            self.found.append((time.monotonic(), private_key_b))
+            yield private_key_b
+
+    def get_speed(self):
+        return self.solver.get_speed()
+
+    def get_stats(self):
+        return self.solver.get_stats()
+
+    def get_metrics(self):
+        return self.solver.get_metrics()
+
+
+def summary(values: list[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "avg": sum(values) / len(values),
+        "p50": values[len(values) // 2],
+        "p99": values[min(len(values) - 1, int(len(values) * 0.99))],
+        "max": values[-1],
+    }
+
+
+def solution_to_tx(chain: Chain, found: list[tuple[float, int]]) -> list[float]:
+    """
+    Seconds from a solution leaving the solver to its transaction reaching the node
+    """
+    found_at = {private_key_to_ec_point(key): t for t, key in found}
+    latencies = []
+    for tx in chain.transactions.values():
+        if tx.data[:4] != SUBMIT_SELECTOR:
+            continue
+        _, public_key_b, _, _ = decode(
+            ["address", "(uint256,uint256)", "bytes", "bytes"], tx.data[4:]
+        )
+        if tuple(public_key_b) in found_at:
+            latencies.append(tx.received_at - found_at[tuple(public_key_b)])
+    return latencies
+
+
+async def loadtest(args) -> dict:
+    miner_account = Account.create()
+    chain = Chain(
+        block_time=args.block_time,
+        difficulty=(1 << (160 - args.difficulty_bits)) - 1,
+        problem_interval=args.problem_interval,
+        balances={miner_account.address: 1000 * 10**18},
+    )
+    # Nodes of the same chain, each answering with its own random delays
+    servers = [
+        DevnetServer(chain, latency=args.latency, jitter=args.jitter)
+        for _ in range(args.endpoints)
+    ]
+    runners = [
+        await server.start("127.0.0.1", args.port + i)
+        for i, server in enumerate(servers)
+    ]
+    chain_task = asyncio.create_task(chain.run())
+
+    workers = []
+    if args.workers:
+        # The miner coordinates, the solvers run in worker processes
+        solvers = [create_solver("remote", host="127.0.0.1", port=args.worker_port)]
+        env = {
+            **os.environ,
+            "INFINITY_SOLVER": args.solver,
+            "INFINITY_COORDINATOR": f"127.0.0.1:{args.worker_port}",
+        }
+        workers = [
+            await asyncio.create_subprocess_exec(
+                sys.executable,
+                os.path.join(os.path.dirname(__file__), "worker.py"),
+                env={**env, "INFINITY_WORKER_NAME": f"worker{i}"},
+            )
+            for i in range(args.workers)
+        ]
+    else:
+        names = args.solver.split(",")
+        solver_options = options_by_solver(names, json.loads(args.options))
+        solvers = [create_solver(name, **solver_options[name]) for name in names]
+    solver = TimedSolver(solvers[0] if len(solvers) == 1 else CombinedSolver(*solvers))
+    miner = SoloMiner(
+        solver,
+        rpc=[f"http://127.0.0.1:{args.port + i}" for i in range(args.endpoints)],
+        ws=f"ws://127.0.0.1:{args.port}",
+        miner_pk=miner_account.key,
+        pinned_problem_reads=args.pinned_problem_reads,
+    )
+
+    if args.metrics_port:
+        runners.append(await serve_metrics(miner.get_metrics, args.metrics_port))
+
+    async def drop_ws():
+        while True:
+            await asyncio.sleep(args.drop_ws_interval)
+            logger.info("Dropping WebSocket connections")
+            await servers[0].close_sockets()
+
+    t_start = time.monotonic()
+    mine_task = asyncio.create_task(miner.mine())
+    drop_ws_task = None
+    if args.drop_ws_interval:
+        drop_ws_task = asyncio.create_task(drop_ws())
+    await asyncio.sleep(args.duration)
+    elapsed = time.monotonic() - t_start
+
+    # Measured before tearing down, late submissions must not count
+    report = {
+        "solver": args.solver,
+        "options": json.loads(args.options),
+        "seconds": elapsed,
+        "block_time": args.block_time,
+        "difficulty_bits": args.difficulty_bits,
+        "problem_interval": args.problem_interval,
+        "latency": args.latency,
+        "jitter": args.jitter,
+        "endpoints": args.endpoints,
+        "drop_ws_interval": args.drop_ws_interval,
+        "hashrate": solver.get_speed(),
+        "solutions_found": len(solver.found),
+        "chain": dict(chain.stats),
+        "accepted_per_second": chain.stats["accepted_submissions"] / elapsed,
+        "transactions_per_second": chain.stats["transactions"] / elapsed,
+        "problem_to_tx": summary(chain.problem_to_tx),
+        "solution_to_tx": summary(solution_to_tx(chain, solver.found)),
+        "requests": [dict(server.requests) for server in servers],
+        "http_requests": [server.http_requests for server in servers],
+        "problem_feed": {
+            name: str(value) for name, value in miner.feed.get_stats().items()
+        },
+    }
+    if workers:
+        report["workers"] = {
+            name: str(value) for name, value in solver.get_stats().items()
+        }
+
+    tasks = [
+        task
+        for task in (
+            mine_task,
+            miner.stats_task,
+            miner.poll_info_task,
+            miner.rpc_monitor_task,
+            chain_task,
+            drop_ws_task,
+            *miner.submit_tasks,
+        )
+        if task is not None
+    ]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await miner.provider.disconnect()
+    for runner in runners:
+        await runner.cleanup()
+    for s in solvers:
+        if hasattr(s, "close"):
+            s.close()
+    for worker in workers:
+        worker.terminate()
+        await worker.wait()
+
+    return report
+
+
+def main():
+    logging.basicConfig(
+        level=os.getenv("LOGLEVEL", "INFO"),
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+        stream=sys.stderr,
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Run SoloMiner end to end against a local chain stand-in"
+    )
+    parser.add_argument(
+        "--solver",
+        default="opencl",
+        help="opencl, cpu, cpu-pool or stub, comma separated to combine (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--options",
+        default="{}",
+        help="solver options as JSON, keyed by solver name when combined (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=60.0,
+        help="seconds to mine (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8545,
+        help="port of the first endpoint, the others follow (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--endpoints",
+        type=int,
+        default=1,
+        help="RPC endpoints of the chain the miner sends to (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--block-time",
+        type=float,
+        default=1.0,
+        help="seconds between blocks (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--difficulty-bits",
+        type=int,
+        default=16,
+        help="leading zero bits of the difficulty (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--problem-interval",
+        type=float,
+        help="seconds until another miner solves a problem (default: never)",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="seconds added to every RPC response and notification (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0.0,
+        help="up to this many random seconds added on top of latency (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--drop-ws-interval",
+        type=float,
+        help="seconds between dropping the WebSocket connections (default: never)",
+    )
+    parser.add_argument(
+        "--pinned-problem-reads",
+        action="store_true",
+        help="also read the problem at every new block",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="run the solvers in this many worker processes behind a coordinator,"
+        " they take their options from the INFINITY_* environment (default: off)",
+    )
+    parser.add_argument(
+        "--worker-port",
+        type=int,
+        default=8556,
+        help="port the coordinator waits for workers on (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="serve the metrics of the miner on this port (default: off)",
+    )
+    parser.add_argument(
+        "--output", help="write JSON report to this file instead of stdout"
+    )
+    args = parser.parse_args()
+
+    report = asyncio.run(loadtest(args))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,136 @@
+import time
+
+# Taken before the heavy imports, they are part of the startup time
+STARTED_AT = time.monotonic()
+
 import asyncio
+from itertools import chain
+
+from solver.base import BaseSolver
+from solver.combined import CombinedSolver
+from solver.pending import PendingSolver
+from utils.metrics import serve as serve_metrics
+from utils.startup import Startup
+
+
+def create_solver(name: str, **options) -> BaseSolver:
+    if name == "stub":
+        from solver.stub import StubSolver
+
+        return StubSolver()
+
+    if name == "cpu":
+        from solver.cpu import CPUSolver
+
+        return CPUSolver(**options)
+
+    if name == "cpu-pool":
+        from solver.multiprocess import MultiprocessSolver
+
+        return MultiprocessSolver(**options)
+
+    if name == "remote":
+        from solver.remote import CoordinatorSolver
+
+        return CoordinatorSolver(**options)
+
+    from solver.opencl import OpenCLSolver
+
+    return OpenCLSolver(**options)
+
 
-import config
-from solver.opencl import OpenCLSolver
-from miner.solo import SoloMiner
+def options_by_solver(names: list[str], options: dict) -> dict[str, dict]:
+    """
+    Options of a comma combination are keyed by solver name, e.g.
+    {"opencl": {"batch_size": 4}}; a single solver also takes them unkeyed
+    """
+    if options and all(key in names for key in options):
+        return {name: options.get(name, {}) for name in names}
+    if options and len(names) > 1:
+        raise ValueError(
+            f"Options of combined solvers must be keyed by solver name - {', '.join(names)}"
+        )
+    return {name: options for name in names}
+
+
+def solver_options(name: str, config) -> dict:
+    if name == "cpu-pool":
+        return dict(num_workers=config.CPU_WORKERS)
+
+    if name == "remote":
+        return dict(host=config.COORDINATOR_HOST, port=config.COORDINATOR_PORT)
+
+    if name in ("stub", "cpu"):
+        return {}
+
+    return dict(
+        pipeline_depth=config.PIPELINE_DEPTH,
+        batch_size=config.BATCH_SIZE,
+        fused_score=config.FUSED_SCORE,
+        autotune=config.AUTOTUNE,
+        threaded=config.DEVICE_THREADS,
+        profile_every=config.PROFILE_EVERY,
+        endomorphism=config.ENDOMORPHISM,
+    )
+
+
+def create_solvers(config) -> BaseSolver:
+    solvers = [
+        create_solver(name, **solver_options(name, config)) for name in config.SOLVER
+    ]
+    return solvers[0] if len(solvers) == 1 else CombinedSolver(*solvers)
 
 
 async def main():
+    # Not imported at module level: solver worker processes re-import this module
+    import config
+
+    startup = Startup(STARTED_AT)
+    config.validate()
+
+    # Programs build in a thread while the miner imports web3 and connects.
+    # Submitted right away: a to_thread coroutine would only start at the first await
+    build = asyncio.get_running_loop().run_in_executor(None, create_solvers, config)
+    solver = PendingSolver(startup.run("solvers ready", build))
+    rpc_check = asyncio.create_task(startup.run("rpc check", config.check_rpc()))
+
+    # Imports web3, which takes a while, so only after the build thread is running
+    from miner.solo import SoloMiner
+
     miner = SoloMiner(
-        OpenCLSolver(),
+        solver,
         rpc=config.RPC,
         ws=config.WS,
         miner_pk=config.MINER_PRIVATE_KEY,
         reward_recipient=config.REWARDS_RECIPIENT_ADDRESS,
+        pinned_problem_reads=config.PINNED_PROBLEM_READS,
     )
-    await miner.mine()
+    metrics_runner = None
+    if config.METRICS_PORT:
+        metrics_runner = await serve_metrics(
+            lambda: chain(miner.get_metrics(), startup.get_metrics()),
+            config.METRICS_PORT,
+        )
+
+    # Only timed, cancelled on exit if still waiting
+    startup_tasks = {
+        asyncio.create_task(startup.run("first problem", miner.state.wait())),
+        asyncio.create_task(startup.wait_first_hash(solver.get_speed)),
+    }
+    mine_task = asyncio.create_task(miner.mine())
+
+    try:
+        if not await rpc_check:
+            exit(0)
+        # A failed build ends the miner instead of leaving it without a solver
+        await solver.solver
+        await mine_task
+    finally:
+        for task in startup_tasks:
+            task.cancel()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
 
 
-asyncio.run(main())
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -3,9 +3,12 @@ import asyncio
 import logging
 from abc import ABC, abstractmethod
 from functools import wraps
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Iterable
 
 from solver.base import BaseSolver
+from utils.metrics import Sample
+from utils.stats import Histogram
+from .verify import Solution, SolutionVerifier
 
 Problem = tuple[int, int, int]
 
@@ -24,19 +27,31 @@ def async_retry_infinite(fn):
 
 
 class BaseMiner(ABC):
-    def __init__(self, solver: BaseSolver, flush_stats_every=10):
+    def __init__(
+        self,
+        solver: BaseSolver,
+        flush_stats_every=10,
+        verifier: SolutionVerifier | None = None,
+    ):
         self.solver = solver
+        self.verifier = verifier or SolutionVerifier()
         self.logger = logging.getLogger(self.__class__.__qualname__)
         self.flush_stats_every = flush_stats_every
 
         self.submit_tasks: set[asyncio.Task] = set()
         self.stats_task = None
 
+        self.solutions = 0
+        self.submissions = 0
+        self.failed_submissions = 0
+        # Seconds from a solution leaving the solver until it is sent
+        self.submit_latency = Histogram()
+
     @abstractmethod
     def get_problems(self) -> AsyncGenerator[Problem, None]: ...
 
     @abstractmethod
-    async def _submit_solution(self, problem: Problem, private_key_b: int): ...
+    async def _submit_solution(self, problem: Problem, solution: Solution): ...
 
     @abstractmethod
     async def flush_stats(self): ...
@@ -52,27 +67,84 @@ class BaseMiner(ABC):
     @async_retry_infinite
     async def mine(self):
         self.stats_task = asyncio.create_task(self.stats_monitor())
+        self.verifier.start()
 
         solver_task = None
-        async for problem in self.get_problems():
-            for submit_task in self.submit_tasks:
-                submit_task.cancel()
-
+        try:
+            async for problem in self.get_problems():
+                for submit_task in self.submit_tasks:
+                    submit_task.cancel()
+
+                if solver_task is not None:
+                    solver_task.cancel()
+                solver_task = asyncio.create_task(self._solve_and_submit(problem))
+        finally:
             if solver_task is not None:
                 solver_task.cancel()
-            solver_task = asyncio.create_task(self._solve_and_submit(problem))
 
     async def _solve_and_submit(self, problem: Problem):
         _, private_key_a, difficulty = problem
 
         async for private_key_b in self.solver.get_solutions(private_key_a, difficulty):
-            self.submit_tasks.add(
-                asyncio.create_task(self.submit_solution(problem, private_key_b))
+            self.solutions += 1
+            submit_task = asyncio.create_task(
+                self.submit_solution(problem, private_key_b, time.monotonic())
             )
+            self.submit_tasks.add(submit_task)
+            submit_task.add_done_callback(self.submit_tasks.discard)
 
-    async def submit_solution(self, problem: Problem, private_key_b: int):
+    async def submit_solution(
+        self, problem: Problem, private_key_b: int, found_at: float
+    ):
+        _, private_key_a, difficulty = problem
         try:
-            return await self._submit_solution(problem, private_key_b)
+            solution = await self.verifier.verify(
+                private_key_a, difficulty, private_key_b
+            )
+            if solution is None:
+                self.logger.info(
+                    f"Dropped solution 0x{private_key_b:064x}, it doesn't meet the difficulty"
+                )
+                return
+            await self._submit_solution(problem, solution)
         except Exception as e:
+            self.failed_submissions += 1
             self.logger.info(f"Submit solution failed - {e}")
             self.logger.debug("Details", exc_info=True)
+            return
+
+        self.submissions += 1
+        self.submit_latency.observe(time.monotonic() - found_at)
+
+    def get_metrics(self) -> Iterable[Sample]:
+        """
+        Samples exposed on the metrics endpoint, read when it is scraped
+        """
+        yield from self.solver.get_metrics()
+        yield from self.verifier.get_metrics()
+        yield Sample(
+            "infinity_solutions_total",
+            "counter",
+            "Solutions delivered by the solver",
+            self.solutions,
+        )
+        yield Sample(
+            "infinity_submissions_total",
+            "counter",
+            "Solutions submitted",
+            self.submissions,
+            {"result": "sent"},
+        )
+        yield Sample(
+            "infinity_submissions_total",
+            "counter",
+            "Solutions submitted",
+            self.failed_submissions,
+            {"result": "failed"},
+        )
+        yield Sample(
+            "infinity_submit_latency_seconds",
+            "histogram",
+            "Seconds from a solution leaving the solver until it is sent",
+            self.submit_latency,
+        )
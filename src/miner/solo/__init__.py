@@ -5,7 +5,6 @@ from functools import cached_property
 from typing import AsyncGenerator
 
 from eth_account import Account
-from eth_account.messages import encode_defunct
 from eth_account.signers.local import LocalAccount
 from eth_account.types import PrivateKeyType
 from eth_typing import HexAddress
@@ -13,9 +12,15 @@ from eth_utils import abi_to_signature, keccak, encode_hex
 from web3 import AsyncWeb3
 from web3.types import EventData
 
-from utils.async_ import async_merge
-from utils.ecdsa import get_account_ab, private_key_to_ec_point
+from utils.metrics import Sample
+from utils.stats import Histogram
 from ..base import BaseMiner, Problem
+from ..verify import SolutionVerifier
+from .feed import ProblemFeed
+from .nonce import NonceManager, PendingTransaction, bump_fee
+from .rpc import MultiHTTPProvider
+from .state import ChainState
+from .submit import SubmitTemplate, submit_message_hash
 from .constants import (
     ERC20_ABI,
     INFINITY_ADDRESS,
@@ -26,100 +31,131 @@ from .constants import (
 
 class SoloMiner(BaseMiner):
     DATA = "miner-v2".encode()
+    # Polling takes over when new blocks haven't come for this many seconds
+    NEW_HEADS_TIMEOUT = 5
+    # Poll interval around the time the next block is due while polling
+    TIGHT_POLL_INTERVAL = 0.1
 
     def __init__(
         self,
         solver,
-        rpc: str,
+        rpc: list[str],
         ws: str,
         miner_pk: PrivateKeyType,
         poll_problem_interval=0.5,
         reward_recipient: HexAddress | None = None,
+        pinned_problem_reads: bool = False,
     ):
-        super().__init__(solver)
+        miner_account: LocalAccount = Account.from_key(miner_pk)
+        reward_recipient = reward_recipient or miner_account.address
+        super().__init__(
+            solver,
+            verifier=SolutionVerifier(submit_message_hash(reward_recipient, self.DATA)),
+        )
 
-        self.miner_account: LocalAccount = Account.from_key(miner_pk)
-        w3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(rpc, cache_allowed_requests=True))
+        self.miner_account = miner_account
+        self.provider = MultiHTTPProvider(rpc, cache_allowed_requests=True)
+        w3 = AsyncWeb3(self.provider)
 
         self.w3 = w3
         self.w3_ws = AsyncWeb3(AsyncWeb3.WebSocketProvider(ws))
         self.pow = w3.eth.contract(abi=POW_ABI)(POW_ADDRESS)
         self.token = w3.eth.contract(abi=ERC20_ABI)(INFINITY_ADDRESS)
-        self.lock = asyncio.Lock()
+        self.nonces = NonceManager()
 
-        self.miner_nonce = None
-        self.gas_price = None
+        self.problem_nonce = None
 
         self.poll_problem_interval = poll_problem_interval
-        self.reward_recipient = reward_recipient or self.miner_account.address
+        self.reward_recipient = reward_recipient
+        self.state = ChainState(
+            AsyncWeb3(self.provider.for_batches()),
+            self.miner_account.address,
+            self.reward_recipient,
+        )
+        # Set on new blocks, problems and failed submissions to refresh right away
+        self.refresh_state = asyncio.Event()
+        self.last_new_head = 0.0
+        self.head_arrived = asyncio.Event()
+
+        sources = {"logs": self._listen_problem, "poll": self._poll_problem}
+        if pinned_problem_reads:
+            sources["heads"] = self._read_problem_on_head
+        self.feed = ProblemFeed(sources)
 
         self.poll_info_task = asyncio.create_task(self._poll_info())
+        self.rpc_monitor_task = None
+        if len(rpc) > 1:
+            self.rpc_monitor_task = asyncio.create_task(self.provider.monitor())
+        self.submit_template: SubmitTemplate | None = None
+        # Seconds from a submission starting until its transaction is signed
+        self.prepare_latency = Histogram()
+        self.cancels = 0
         # self.maxPriorityFeePerGas = 1000000000
         self.maxPriorityFeePerGas = 1
 
     async def get_problems(self):
-        problem_nonce = None
-
-        async for problem in async_merge(self._listen_problem(), self._poll_problem()):
+        async for problem in self.feed.problems():
             nonce, _, _ = problem
-            if problem_nonce and problem_nonce >= nonce:
-                continue
-            problem_nonce = nonce
+            self.problem_nonce = nonce
+            self.refresh_state.set()
             yield problem
 
-    async def _submit_solution(self, problem, private_key_b):
-        async with self.lock:
-            nonce, private_key_a, _ = problem
-            self.logger.debug(f"Submitting solution for problem #{nonce}")
-
-            t_start = time.time()
-            account_ab = get_account_ab(private_key_a, private_key_b)
+    async def _submit_solution(self, problem, solution):
+        nonce, _, _ = problem
+        self.logger.debug(f"Submitting solution for problem #{nonce}")
 
-            public_key_b = private_key_to_ec_point(private_key_b)
-            message = self.w3.solidity_keccak(
-                ["address", "bytes"], [self.reward_recipient, self.DATA]
-            )
-            signed_message = account_ab.sign_message(encode_defunct(message))
-
-            tx_params = await self.pow.functions.submit(
-                self.reward_recipient, public_key_b, signed_message.signature, self.DATA
-            ).build_transaction(
-                {
-                    "gas": 1_000_000,
-                    "from": self.miner_account.address,
-                    "nonce": (
-                        self.miner_nonce
-                        or await self.w3.eth.get_transaction_count(
-                            self.miner_account.address
-                        )
-                    ),
-                    # "gasPrice": self.gas_price or await self.w3.eth.gas_price,
-                    "maxFeePerGas": self.gas_price or await self.w3.eth.gas_price,
-                    "maxPriorityFeePerGas": self.maxPriorityFeePerGas,
-                }
+        t_start = time.monotonic()
+        submit_template = await self._get_submit_template()
+        max_fee = self.state.gas_price or await self.w3.eth.gas_price
+        tx_nonce = await self.nonces.reserve()
+        try:
+            raw_transaction = await asyncio.to_thread(
+                submit_template.sign,
+                solution,
+                tx_nonce,
+                max_fee,
+                self.maxPriorityFeePerGas,
             )
+            self.prepare_latency.observe(time.monotonic() - t_start)
             self.logger.info(
-                f"Submit transaction prepared in {time.time() - t_start:.2f}s"
+                f"Submit transaction prepared in {time.monotonic() - t_start:.2f}s"
             )
+        except BaseException:
+            self.nonces.release(tx_nonce)
+            raise
 
-            tx_hash = await self.w3.eth.send_raw_transaction(
-                self.miner_account.sign_transaction(tx_params).raw_transaction
-            )
-            self.logger.info(
-                f"Submit tx - {tx_hash.to_0x_hex()} (in {time.time() - t_start:.2f}s, found solution - {account_ab.address})"
-            )
+        # A new problem cancels the submission, but a request already on its way
+        # still reaches the node: the nonce is settled by its answer, not by the cancel
+        send = asyncio.ensure_future(self.w3.eth.send_raw_transaction(raw_transaction))
+        send.add_done_callback(
+            lambda send: self._sent(send, tx_nonce, nonce, max_fee)
+        )
+        tx_hash = await asyncio.shield(send)
+        self.logger.info(
+            f"Submit tx - {tx_hash.to_0x_hex()} (in {time.monotonic() - t_start:.2f}s, found solution - {solution.address_ab})"
+        )
 
-            # self.gas_price = tx_params["gasPrice"]
-            self.miner_nonce = tx_params["nonce"] + 1
+    def _sent(self, send: asyncio.Future, tx_nonce: int, problem_nonce: int, max_fee):
+        if send.cancelled() or send.exception() is not None:
+            self.nonces.release(tx_nonce)
+            # The nonce may be used already, find out before handing it out again
+            self.refresh_state.set()
+            return
+        self.nonces.sent(
+            PendingTransaction(
+                tx_nonce,
+                send.result(),
+                problem_nonce,
+                max_fee,
+                self.maxPriorityFeePerGas,
+            )
+        )
 
     async def flush_stats(self):
-        native_balance = (
-            await self.w3.eth.get_balance(self.miner_account.address) / 1e18
-        )
-        token_balance = (
-            await self.token.functions.balanceOf(self.reward_recipient).call()
-        ) / 1e18
-        current_difficulty: int = await self.pow.functions.difficulty().call()
+        await self.state.refresh_balances()
+        native_balance = self.state.native_balance / 1e18
+        token_balance = self.state.token_balance / 1e18
+        _, _, current_difficulty = self.state.problem
         current_difficulty_str = current_difficulty.to_bytes(20, byteorder="big").hex()
         leading_zeros = len(current_difficulty_str) - len(
             current_difficulty_str.lstrip("0")
@@ -146,24 +182,135 @@ class SoloMiner(BaseMiner):
         if next_submit_timedelta is not None:
             self.logger.info(f"├ time to solution ~ {next_submit_timedelta}")
 
+        for name, value in {**self.solver.get_stats(), **self.feed.get_stats()}.items():
+            self.logger.info(f"├ {name}: {value}")
+
         self.logger.info(f"| ")
         self.logger.info(
             f"└ Miner address: https://sonicscan.org/address/{self.miner_account.address}"
         )
 
+    async def _get_submit_template(self) -> SubmitTemplate:
+        if self.submit_template is None:
+            self.submit_template = SubmitTemplate(
+                self.miner_account.key,
+                await self.w3.eth.chain_id,
+                self.reward_recipient,
+                self.DATA,
+            )
+        return self.submit_template
+
     async def _poll_info(self):
         while True:
-            async with self.lock:
-                self.miner_nonce = await self.w3.eth.get_transaction_count(
-                    self.miner_account.address
+            try:
+                await self._get_submit_template()
+                await self.state.refresh()
+                await self._check_transactions()
+            except Exception as e:
+                self.logger.info(f"Error in {self._poll_info.__qualname__} - {e}")
+                self.logger.debug("Details", exc_info=True)
+
+            # New blocks trigger a refresh, polling only runs while they don't come
+            if time.monotonic() - self.last_new_head < self.NEW_HEADS_TIMEOUT:
+                timeout = self.NEW_HEADS_TIMEOUT
+            else:
+                timeout = self.state.blocks.poll_delay(
+                    self.TIGHT_POLL_INTERVAL, self.poll_problem_interval
+                )
+            try:
+                await asyncio.wait_for(self.refresh_state.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self.refresh_state.clear()
+
+    async def _check_transactions(self):
+        """
+        Sync the confirmed nonce, replace stale submissions and fill nonce gaps
+        """
+        confirmed = self.nonces.update(self.state.nonce)
+        receipts = await self.state.get_receipts([tx.tx_hash for tx in confirmed])
+        for tx, receipt in zip(confirmed, receipts):
+            if isinstance(receipt, Exception):
+                # Mined in a version we didn't see, e.g. the replaced one
+                self.logger.debug(f"Nonce {tx.nonce} confirmed by another transaction")
+            elif tx.problem_nonce is not None:
+                status = "accepted" if receipt["status"] else "reverted"
+                self.logger.info(
+                    f"Submit tx - {tx.tx_hash.to_0x_hex()} {status} in block"
+                    f" {receipt['blockNumber']} ({time.monotonic() - tx.sent_at:.2f}s)"
+                )
+
+        if self.problem_nonce is not None:
+            for tx in self.nonces.stale(self.problem_nonce):
+                self.logger.info(
+                    f"Cancel tx - {tx.tx_hash.to_0x_hex()} of stale problem #{tx.problem_nonce}"
+                )
+                await self._send_cancel(
+                    tx.nonce, bump_fee(tx.max_fee), bump_fee(tx.priority_fee)
                 )
-                self.gas_price = await self.w3.eth.gas_price
-            await asyncio.sleep(1)
+
+        for nonce in self.nonces.gaps():
+            self.logger.info(f"Fill nonce gap - {nonce}")
+            self.nonces.take(nonce)
+            await self._send_cancel(
+                nonce, self.state.gas_price, self.maxPriorityFeePerGas
+            )
+
+    async def _send_cancel(self, nonce: int, max_fee: int, priority_fee: int):
+        submit_template = await self._get_submit_template()
+        max_fee = max(max_fee, self.state.gas_price)
+        try:
+            tx_hash = await self.w3.eth.send_raw_transaction(
+                submit_template.cancel(nonce, max_fee, priority_fee)
+            )
+        except Exception as e:
+            # Most likely mined meanwhile, the next check tells
+            self.logger.debug(f"Cancel of nonce {nonce} failed - {e}")
+            self.nonces.release(nonce)
+            return
+        self.cancels += 1
+        self.nonces.sent(
+            PendingTransaction(nonce, tx_hash, None, max_fee, priority_fee)
+        )
+
+    def get_metrics(self):
+        yield from super().get_metrics()
+        yield Sample(
+            "infinity_submit_prepare_seconds",
+            "histogram",
+            "Seconds from a submission starting until its transaction is signed",
+            self.prepare_latency,
+        )
+        yield Sample(
+            "infinity_cancels_total",
+            "counter",
+            "Empty transactions sent to replace stale submissions or fill nonce gaps",
+            self.cancels,
+        )
+        yield from self.nonces.get_metrics()
+        yield from self.feed.get_metrics()
+        yield from self.provider.get_metrics()
 
     async def _poll_problem(self) -> AsyncGenerator[Problem, None]:
         while True:
-            yield await self.pow.functions.currentProblem().call()
-            await asyncio.sleep(self.poll_problem_interval)
+            await self.state.wait()
+            yield self.state.problem
+
+    async def _read_problem_on_head(self) -> AsyncGenerator[Problem, None]:
+        while True:
+            await self.head_arrived.wait()
+            self.head_arrived.clear()
+            # Pinned to the block, a node that doesn't have it yet fails instead
+            # of returning the problem before it
+            block_number = self.state.blocks.block_number
+            try:
+                problem = await self.pow.functions.currentProblem().call(
+                    block_identifier=block_number
+                )
+            except Exception as e:
+                self.logger.debug(f"Problem read at block {block_number} failed - {e}")
+                continue
+            yield tuple(problem)
 
     async def _listen_problem(self) -> AsyncGenerator[Problem, None]:
         async with self.w3_ws:
@@ -174,8 +321,16 @@ class SoloMiner(BaseMiner):
                     "topics": [self._problem_topic],
                 },
             )
+            # Pending transactions are looked after on every block
+            new_heads = await self.w3_ws.eth.subscribe("newHeads")
 
             async for log in self.w3_ws.socket.process_subscriptions():
+                if log["subscription"] == new_heads:
+                    self.last_new_head = time.monotonic()
+                    self.state.blocks.observe(log["result"]["number"])
+                    self.refresh_state.set()
+                    self.head_arrived.set()
+                    continue
                 new_problem: EventData = self.pow.events.NewProblem().process_log(
                     log["result"]
                 )
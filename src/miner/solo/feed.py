@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Callable
+
+from utils.async_ import async_merge
+from utils.metrics import Sample
+from utils.stats import Histogram
+from ..base import Problem
+
+# Seconds before restarting a failed source, doubled on every failure in a row
+RESTART_DELAY = 0.5
+MAX_RESTART_DELAY = 30.0
+# Sources that ran this long before failing are restarted without backoff
+HEALTHY_RUN = 5.0
+# Problems whose arrivals are kept to measure sources that come late
+TRACKED_PROBLEMS = 16
+
+
+class ProblemFeed:
+    """
+    Newest problem out of several sources, which are restarted with backoff when
+    they fail instead of failing the feed.
+
+    Records which source delivers a problem first and how long the others take
+    to deliver the same one, time a slower source would leave the solver idle.
+    """
+
+    def __init__(self, sources: dict[str, Callable[[], AsyncIterator[Problem]]]):
+        self.sources = sources
+        self.logger = logging.getLogger(self.__class__.__qualname__)
+
+        self.problem_nonce: int | None = None
+        # Problem nonce -> first arrival and sources that delivered it
+        self.arrivals: dict[int, tuple[float, set[str]]] = {}
+        self.first = {name: 0 for name in sources}
+        self.lag = {name: Histogram() for name in sources}
+
+    async def problems(self) -> AsyncIterator[Problem]:
+        async for name, problem in async_merge(
+            *(self._run(name, source) for name, source in self.sources.items())
+        ):
+            if self._arrived(name, problem):
+                yield problem
+
+    async def _run(
+        self, name: str, source: Callable[[], AsyncIterator[Problem]]
+    ) -> AsyncIterator[tuple[str, Problem]]:
+        delay = RESTART_DELAY
+        while True:
+            t_start = time.monotonic()
+            try:
+                async for problem in source():
+                    yield name, problem
+                self.logger.info(f"Problem source {name} ended")
+            except Exception as e:
+                self.logger.info(f"Problem source {name} failed - {e}")
+                self.logger.debug("Details", exc_info=True)
+
+            if time.monotonic() - t_start > HEALTHY_RUN:
+                delay = RESTART_DELAY
+            self.logger.info(f"Restarting problem source {name} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            delay = min(2 * delay, MAX_RESTART_DELAY)
+
+    def _arrived(self, name: str, problem: Problem) -> bool:
+        """
+        Record an arrival, True when the problem is new
+        """
+        nonce, _, _ = problem
+        now = time.monotonic()
+
+        arrival = self.arrivals.get(nonce)
+        if arrival is not None:
+            first_at, sources = arrival
+            if name not in sources:
+                sources.add(name)
+                self.lag[name].observe(now - first_at)
+            return False
+
+        if self.problem_nonce is not None and nonce <= self.problem_nonce:
+            return False
+
+        self.problem_nonce = nonce
+        self.arrivals[nonce] = (now, {name})
+        self.first[name] += 1
+        while len(self.arrivals) > TRACKED_PROBLEMS:
+            del self.arrivals[min(self.arrivals)]
+        return True
+
+    def get_stats(self) -> dict[str, object]:
+        stats: dict[str, object] = {
+            "problems first": ", ".join(
+                f"{name} {count}" for name, count in self.first.items()
+            )
+        }
+        for name, lag in self.lag.items():
+            if lag.count:
+                stats[f"problem lag {name}"] = lag
+        return stats
+
+    def get_metrics(self):
+        for name in self.sources:
+            yield Sample(
+                "infinity_problems_first_total",
+                "counter",
+                "Problems this source delivered before the others",
+                self.first[name],
+                {"source": name},
+            )
+            yield Sample(
+                "infinity_problem_lag_seconds",
+                "histogram",
+                "Seconds this source delivered a problem after the first one",
+                self.lag[name],
+                {"source": name},
+            )
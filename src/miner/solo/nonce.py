@@ -0,0 +1,165 @@
+import asyncio
+import time
+
+from hexbytes import HexBytes
+
+from utils.metrics import Sample
+
+
+def bump_fee(fee: int) -> int:
+    """
+    Fee to replace a pending transaction: +12.5%, rounded up, clears the +10% nodes require
+    """
+    return fee + fee // 8 + 1
+
+
+class PendingTransaction:
+    def __init__(
+        self,
+        nonce: int,
+        tx_hash: HexBytes,
+        problem_nonce: int | None,
+        max_fee: int,
+        priority_fee: int,
+    ):
+        self.nonce = nonce
+        self.tx_hash = tx_hash
+        # None for transactions that only take up the nonce (cancels, gap fillers)
+        self.problem_nonce = problem_nonce
+        self.max_fee = max_fee
+        self.priority_fee = priority_fee
+        self.sent_at = time.monotonic()
+
+
+class NonceManager:
+    """
+    Hands out nonces of the miner account locally, so several solutions can be
+    signed and sent at the same time, and keeps track of what uses them.
+
+    Only the confirmed nonce comes from the node. Everything above it is known
+    here: nonces being signed, pending transactions and nonces given back by
+    failed submissions, which are handed out first so they don't leave a gap.
+    """
+
+    def __init__(self):
+        self.confirmed: int | None = None
+        self.next_nonce: int | None = None
+        self.reserved: set[int] = set()
+        self.released: set[int] = set()
+        self.pending: dict[int, PendingTransaction] = {}
+        self.ready = asyncio.Event()
+
+    async def reserve(self) -> int:
+        await self.ready.wait()
+        if self.released:
+            nonce = min(self.released)
+            self.released.remove(nonce)
+        else:
+            nonce = self.next_nonce
+            self.next_nonce += 1
+        self.reserved.add(nonce)
+        return nonce
+
+    def take(self, nonce: int):
+        """
+        Reserve a released nonce to fill its gap
+        """
+        self.released.remove(nonce)
+        self.reserved.add(nonce)
+
+    def release(self, nonce: int):
+        """
+        The nonce wasn't used, hand it out again
+        """
+        self.reserved.discard(nonce)
+        if nonce >= self.confirmed and nonce not in self.pending:
+            self.released.add(nonce)
+            self._trim()
+
+    def sent(self, tx: PendingTransaction):
+        self.reserved.discard(tx.nonce)
+        if tx.nonce >= self.confirmed:
+            self.pending[tx.nonce] = tx
+
+    def update(self, confirmed: int) -> list[PendingTransaction]:
+        """
+        Account for the confirmed nonce of the node, returns transactions it confirms
+        """
+        if self.confirmed is not None and confirmed < self.confirmed:
+            # A lagging node, it can't undo what was confirmed already
+            return []
+
+        self.confirmed = confirmed
+        done = [
+            self.pending.pop(nonce)
+            for nonce in sorted(self.pending)
+            if nonce < confirmed
+        ]
+        self.released = {nonce for nonce in self.released if nonce >= confirmed}
+        if self.next_nonce is None or self.next_nonce < confirmed:
+            # Transactions sent from the same account by someone else
+            self.next_nonce = confirmed
+        self._trim()
+        self.ready.set()
+        return done
+
+    def stale(self, problem_nonce: int) -> list[PendingTransaction]:
+        """
+        Pending submissions of problems before problem_nonce, they can only revert
+        """
+        return [
+            tx
+            for tx in self.pending.values()
+            if tx.problem_nonce is not None and tx.problem_nonce < problem_nonce
+        ]
+
+    def gaps(self) -> list[int]:
+        """
+        Released nonces that hold back pending transactions
+        """
+        if not self.pending:
+            return []
+        highest = max(self.pending)
+        return sorted(nonce for nonce in self.released if nonce < highest)
+
+    def _trim(self):
+        # Released nonces at the top are not a gap, they are just not used yet
+        while self.next_nonce - 1 in self.released:
+            self.next_nonce -= 1
+            self.released.remove(self.next_nonce)
+
+    def get_metrics(self):
+        if self.confirmed is not None:
+            yield Sample(
+                "infinity_nonce",
+                "gauge",
+                "Nonces of the miner account",
+                self.confirmed,
+                {"state": "confirmed"},
+            )
+            yield Sample(
+                "infinity_nonce",
+                "gauge",
+                "Nonces of the miner account",
+                self.next_nonce,
+                {"state": "next"},
+            )
+        for state, nonces in (
+            ("reserved", self.reserved),
+            ("released", self.released),
+            ("pending", self.pending),
+        ):
+            yield Sample(
+                "infinity_nonces",
+                "gauge",
+                "Nonces being signed, given back or used by pending transactions",
+                len(nonces),
+                {"state": state},
+            )
+        now = time.monotonic()
+        yield Sample(
+            "infinity_pending_transaction_age_seconds",
+            "gauge",
+            "Seconds since the oldest pending transaction was sent",
+            max((now - tx.sent_at for tx in self.pending.values()), default=0.0),
+        )
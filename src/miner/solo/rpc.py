@@ -0,0 +1,285 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Any
+from urllib.parse import urlsplit
+
+from web3 import AsyncWeb3
+from web3.providers.async_base import AsyncJSONBaseProvider
+from web3._utils.batching import async_batching_context
+from web3._utils.caching import async_handle_request_caching
+from web3.types import RPCEndpoint, RPCResponse
+
+from utils.metrics import Sample
+from utils.stats import Histogram
+
+# Weight of the latest request in the latency average of an endpoint
+LATENCY_SMOOTHING = 0.2
+# Endpoints this many blocks behind the highest one are only used as fallback
+MAX_BLOCKS_BEHIND = 1
+
+
+class Endpoint:
+    """
+    One HTTP endpoint on its own persistent session, with measured latency and height
+    """
+
+    def __init__(self, uri: str):
+        self.uri = uri
+        self.provider = AsyncWeb3.AsyncHTTPProvider(uri)
+        self.latency = 0.0
+        self.block_number = 0
+        self.healthy = True
+        # Requests in flight, they keep running when their caller is cancelled
+        self.requests: set[asyncio.Task] = set()
+
+    async def _shielded(self, coro) -> Any:
+        """
+        web3 leaks the lock of its session cache when a request is cancelled while
+        waiting for it, every later request of the provider would hang
+        """
+        task = asyncio.create_task(coro)
+        self.requests.add(task)
+        task.add_done_callback(self._request_done)
+        return await asyncio.shield(task)
+
+    def _request_done(self, task: asyncio.Task):
+        self.requests.discard(task)
+        # Retrieved here, the caller may be gone
+        if not task.cancelled():
+            task.exception()
+
+    async def request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        t_start = time.monotonic()
+        try:
+            response = await self._shielded(self.provider.make_request(method, params))
+        except Exception:
+            self.healthy = False
+            raise
+
+        self.observe(time.monotonic() - t_start)
+        self.healthy = True
+        return response
+
+    async def request_batch(
+        self, requests: list[tuple[RPCEndpoint, Any]]
+    ) -> list[RPCResponse] | RPCResponse:
+        t_start = time.monotonic()
+        try:
+            response = await self._shielded(self.provider.make_batch_request(requests))
+        except Exception:
+            self.healthy = False
+            raise
+
+        self.observe(time.monotonic() - t_start)
+        self.healthy = True
+        return response
+
+    def observe(self, latency: float):
+        if self.latency:
+            self.latency += LATENCY_SMOOTHING * (latency - self.latency)
+        else:
+            self.latency = latency
+
+    async def probe(self):
+        response = await self.request(RPCEndpoint("eth_blockNumber"), [])
+        self.block_number = int(response["result"], 16)
+
+    def __str__(self):
+        return f"{self.uri} (block {self.block_number}, {self.latency * 1000:.0f}ms)"
+
+
+class MultiHTTPProvider(AsyncJSONBaseProvider):
+    """
+    Several HTTP endpoints behind one provider.
+
+    Signed transactions are broadcast to all endpoints at once and the first one
+    to accept decides the result. Everything else goes to the endpoint that is
+    currently fastest among the most up to date ones, falling back to the others
+    when it fails. monitor() keeps latency and block height of all of them fresh.
+    """
+
+    def __init__(self, uris: list[str], probe_interval: float = 1.0, **kwargs):
+        super().__init__(**kwargs)
+        self.logger = logging.getLogger(self.__class__.__qualname__)
+        self.endpoints = [Endpoint(uri) for uri in uris]
+        self.probe_interval = probe_interval
+        # Broadcasts still running after the first endpoint answered
+        self.broadcasts: set[asyncio.Task] = set()
+        # Per method, batches count as "batch"
+        self.latency: dict[str, Histogram] = defaultdict(Histogram)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    def for_batches(self) -> "MultiHTTPProvider":
+        """
+        Provider on the same endpoints for batch requests. web3 switches the
+        whole provider to batching while a batch is sent, requests made
+        meanwhile from elsewhere would silently end up as batch entries.
+        """
+        provider = MultiHTTPProvider(
+            [],
+            self.probe_interval,
+            cache_allowed_requests=self.cache_allowed_requests,
+            cacheable_requests=self.cacheable_requests,
+        )
+        provider.endpoints = self.endpoints
+        provider.latency = self.latency
+        provider.errors = self.errors
+        return provider
+
+    def ranked(self) -> list[Endpoint]:
+        highest = max(endpoint.block_number for endpoint in self.endpoints)
+        return sorted(
+            self.endpoints,
+            key=lambda endpoint: (
+                not endpoint.healthy,
+                endpoint.block_number < highest - MAX_BLOCKS_BEHIND,
+                endpoint.latency,
+            ),
+        )
+
+    @async_handle_request_caching
+    async def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        t_start = time.monotonic()
+        try:
+            if method == "eth_sendRawTransaction" and len(self.endpoints) > 1:
+                response = await self._broadcast(method, params)
+            else:
+                response = await self._request(method, params)
+        except Exception:
+            self.errors[method] += 1
+            raise
+
+        self.latency[method].observe(time.monotonic() - t_start)
+        if "error" in response:
+            self.errors[method] += 1
+        return response
+
+    async def _request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        error = None
+        for endpoint in self.ranked():
+            try:
+                return await endpoint.request(method, params)
+            except Exception as e:
+                self.logger.debug(f"{method} failed on {endpoint.uri} - {e}")
+                error = error or e
+        raise error
+
+    @async_batching_context
+    async def make_batch_request(
+        self, requests: list[tuple[RPCEndpoint, Any]]
+    ) -> list[RPCResponse] | RPCResponse:
+        t_start = time.monotonic()
+        error = None
+        for endpoint in self.ranked():
+            try:
+                response = await endpoint.request_batch(requests)
+            except Exception as e:
+                self.logger.debug(f"Batch request failed on {endpoint.uri} - {e}")
+                error = error or e
+                continue
+            self.latency["batch"].observe(time.monotonic() - t_start)
+            return response
+        self.errors["batch"] += 1
+        raise error
+
+    async def _broadcast(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        tasks = [
+            asyncio.create_task(endpoint.request(method, params))
+            for endpoint in self.endpoints
+        ]
+        error = None
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    response = await next_done
+                except Exception as e:
+                    error = error or e
+                    continue
+                if "error" not in response:
+                    return response
+                # Rejected by this node, another one may still take it
+                error = error or response
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            for task in tasks:
+                if not task.done():
+                    self.broadcasts.add(task)
+                    task.add_done_callback(self._broadcast_done)
+
+        if isinstance(error, Exception):
+            raise error
+        return error
+
+    def _broadcast_done(self, task: asyncio.Task):
+        self.broadcasts.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.debug(f"Broadcast failed - {task.exception()}")
+
+    async def monitor(self):
+        """
+        Probe latency and block height of every endpoint, forever
+        """
+        while True:
+            await asyncio.gather(
+                *(endpoint.probe() for endpoint in self.endpoints),
+                return_exceptions=True,
+            )
+            self.logger.debug(
+                "Endpoints: " + ", ".join(str(endpoint) for endpoint in self.ranked())
+            )
+            await asyncio.sleep(self.probe_interval)
+
+    def get_metrics(self):
+        for method, latency in list(self.latency.items()):
+            yield Sample(
+                "infinity_rpc_latency_seconds",
+                "histogram",
+                "Seconds per JSON-RPC call, including fallbacks to other endpoints",
+                latency,
+                {"method": method},
+            )
+        for method, errors in list(self.errors.items()):
+            yield Sample(
+                "infinity_rpc_errors_total",
+                "counter",
+                "JSON-RPC calls that failed or returned an error",
+                errors,
+                {"method": method},
+            )
+        for endpoint_idx, endpoint in enumerate(self.endpoints):
+            # Not the URI, it may hold an API key
+            labels = {
+                "endpoint": str(endpoint_idx),
+                "host": urlsplit(endpoint.uri).hostname or "",
+            }
+            yield Sample(
+                "infinity_rpc_endpoint_latency_seconds",
+                "gauge",
+                "Average seconds per request of an endpoint",
+                endpoint.latency,
+                labels,
+            )
+            yield Sample(
+                "infinity_rpc_endpoint_block",
+                "gauge",
+                "Latest block number seen by an endpoint",
+                endpoint.block_number,
+                labels,
+            )
+            yield Sample(
+                "infinity_rpc_endpoint_healthy",
+                "gauge",
+                "1 when the last request to an endpoint succeeded",
+                int(endpoint.healthy),
+                labels,
+            )
+
+    async def disconnect(self):
+        for endpoint in self.endpoints:
+            await asyncio.gather(*endpoint.requests, return_exceptions=True)
+            await endpoint.provider.disconnect()
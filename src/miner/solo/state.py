@@ -0,0 +1,134 @@
+import asyncio
+import time
+
+from eth_typing import HexAddress
+from hexbytes import HexBytes
+from web3 import AsyncWeb3
+from web3.exceptions import TransactionNotFound
+from web3.types import TxReceipt
+
+from ..base import Problem
+from .constants import ERC20_ABI, INFINITY_ADDRESS, POW_ABI, POW_ADDRESS
+
+# Weight of the latest block in the average block interval
+INTERVAL_SMOOTHING = 0.2
+
+
+class BlockTimer:
+    """
+    When the next block is expected, from when the previous ones were first seen
+    """
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self.block_number: int | None = None
+        self.seen_at: float | None = None
+
+    def observe(self, block_number: int):
+        now = time.monotonic()
+        if self.block_number is not None:
+            if block_number <= self.block_number:
+                return
+            per_block = (now - self.seen_at) / (block_number - self.block_number)
+            self.interval += INTERVAL_SMOOTHING * (per_block - self.interval)
+        self.block_number = block_number
+        self.seen_at = now
+
+    def poll_delay(self, tight: float, relaxed: float) -> float:
+        """
+        Seconds until the next poll: relaxed between blocks, tight around the
+        time the next one is due, relaxed again when it is late by a whole interval
+        """
+        if self.seen_at is None:
+            return tight
+        until = self.seen_at + self.interval - time.monotonic()
+        if until > tight:
+            return min(until - tight, relaxed)
+        if until > -self.interval:
+            return tight
+        return relaxed
+
+
+class ChainState:
+    """
+    Chain values the miner works with, fetched together in one JSON-RPC batch.
+
+    The submit path and stats read them from here instead of making their own
+    round trips. refresh() is meant to run on every new block.
+
+    w3 must only be used for batches here, see MultiHTTPProvider.for_batches().
+    """
+
+    def __init__(
+        self,
+        w3: AsyncWeb3,
+        miner_address: HexAddress,
+        reward_recipient: HexAddress,
+    ):
+        self.w3 = w3
+        self.pow = w3.eth.contract(abi=POW_ABI)(POW_ADDRESS)
+        self.token = w3.eth.contract(abi=ERC20_ABI)(INFINITY_ADDRESS)
+        self.miner_address = miner_address
+        self.reward_recipient = reward_recipient
+
+        self.block_number: int | None = None
+        self.problem: Problem | None = None
+        # Nonce of the next transaction of the miner to be mined
+        self.nonce: int | None = None
+        self.gas_price: int | None = None
+        self.native_balance: int | None = None
+        self.token_balance: int | None = None
+        self.blocks = BlockTimer()
+
+        self._refreshed = asyncio.Event()
+
+    async def refresh(self):
+        async with self.w3.batch_requests() as batch:
+            batch.add(self.w3.eth.block_number)
+            batch.add(self.pow.functions.currentProblem())
+            batch.add(self.w3.eth.get_transaction_count(self.miner_address))
+            batch.add(self.w3.eth.gas_price)
+            block_number, problem, nonce, gas_price = await batch.async_execute()
+
+        self.block_number = block_number
+        self.blocks.observe(block_number)
+        self.problem = tuple(problem)
+        self.nonce = nonce
+        self.gas_price = gas_price
+
+        refreshed, self._refreshed = self._refreshed, asyncio.Event()
+        refreshed.set()
+
+    async def refresh_balances(self):
+        async with self.w3.batch_requests() as batch:
+            batch.add(self.w3.eth.get_balance(self.miner_address))
+            batch.add(self.token.functions.balanceOf(self.reward_recipient))
+            self.native_balance, self.token_balance = await batch.async_execute()
+
+    async def get_receipts(
+        self, tx_hashes: list[HexBytes]
+    ) -> list[TxReceipt | Exception]:
+        if not tx_hashes:
+            return []
+        try:
+            async with self.w3.batch_requests() as batch:
+                for tx_hash in tx_hashes:
+                    batch.add(self.w3.eth.get_transaction_receipt(tx_hash))
+                return await batch.async_execute()
+        except TransactionNotFound:
+            # One of them is missing, the batch doesn't tell which
+            receipts = []
+            for tx_hash in tx_hashes:
+                async with self.w3.batch_requests() as batch:
+                    batch.add(self.w3.eth.get_transaction_receipt(tx_hash))
+                    try:
+                        receipts.extend(await batch.async_execute())
+                    except TransactionNotFound as e:
+                        receipts.append(e)
+            return receipts
+
+    async def wait(self):
+        """
+        Until the next refresh
+        """
+        await self._refreshed.wait()
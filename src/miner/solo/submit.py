@@ -0,0 +1,113 @@
+import rlp
+from eth_abi import encode
+from eth_account.messages import encode_defunct
+from eth_keys import keys
+from eth_typing import HexAddress
+from eth_utils import function_abi_to_4byte_selector, keccak, to_bytes
+from web3 import Web3
+
+from ..verify import Solution
+from .constants import POW_ABI, POW_ADDRESS
+
+SUBMIT_GAS = 1_000_000
+TRANSFER_GAS = 21_000
+SIGNATURE_SIZE = 65
+
+
+def submit_message_hash(reward_recipient: HexAddress, data: bytes) -> bytes:
+    """
+    Hash the AB key signs for a submission, as eth_account.sign_message would
+    """
+    message = Web3.solidity_keccak(["address", "bytes"], [reward_recipient, data])
+    signable = encode_defunct(message)
+    return keccak(b"\x19" + signable.version + signable.header + signable.body)
+
+
+class SubmitTemplate:
+    """
+    Everything of a submit transaction that doesn't depend on the solution,
+    computed once: the calldata around publicKeyB and signatureAB and the
+    transaction fields.
+
+    publicKeyB and signatureAB come with a verified Solution, sign() is left with
+    signing the transaction, which is pure CPU and is meant to run off the event
+    loop.
+    """
+
+    def __init__(
+        self,
+        miner_pk: bytes,
+        chain_id: int,
+        reward_recipient: HexAddress,
+        data: bytes,
+        gas: int = SUBMIT_GAS,
+    ):
+        self.miner_key = keys.PrivateKey(miner_pk)
+        self.chain_id = chain_id
+        self.gas = gas
+        self.to = to_bytes(hexstr=POW_ADDRESS)
+        self.miner_address = self.miner_key.public_key.to_canonical_address()
+
+        # submit(address,(uint256,uint256),bytes,bytes) with a 65 bytes signature
+        # has a fixed layout, only publicKeyB and signatureAB change
+        selector = function_abi_to_4byte_selector(
+            next(e for e in POW_ABI if e.get("name") == "submit")
+        )
+        calldata = selector + encode(
+            ["address", "(uint256,uint256)", "bytes", "bytes"],
+            [reward_recipient, (0, 0), bytes(SIGNATURE_SIZE), data],
+        )
+        self.calldata_head = calldata[: 4 + 32]
+        signature_at = 4 + 32 * 6
+        self.calldata_middle = calldata[4 + 32 * 3 : signature_at]
+        self.calldata_tail = calldata[signature_at + SIGNATURE_SIZE :]
+
+    def calldata(self, public_key_b: tuple[int, int], signature_ab: bytes) -> bytes:
+        x, y = public_key_b
+        return b"".join(
+            [
+                self.calldata_head,
+                x.to_bytes(32, byteorder="big"),
+                y.to_bytes(32, byteorder="big"),
+                self.calldata_middle,
+                signature_ab,
+                self.calldata_tail,
+            ]
+        )
+
+    def sign(
+        self, solution: Solution, nonce: int, max_fee: int, priority_fee: int
+    ) -> bytes:
+        """
+        Signed EIP-1559 submit transaction of a solution
+        """
+        return self._sign_transaction(
+            nonce,
+            max_fee,
+            priority_fee,
+            self.gas,
+            self.to,
+            self.calldata(solution.public_key_b, solution.signature_ab),
+        )
+
+    def cancel(self, nonce: int, max_fee: int, priority_fee: int) -> bytes:
+        """
+        Signed empty transfer to the miner itself, to replace a transaction or
+        fill a nonce gap at the lowest cost
+        """
+        return self._sign_transaction(
+            nonce, max_fee, priority_fee, TRANSFER_GAS, self.miner_address, b""
+        )
+
+    def _sign_transaction(
+        self,
+        nonce: int,
+        max_fee: int,
+        priority_fee: int,
+        gas: int,
+        to: bytes,
+        data: bytes,
+    ) -> bytes:
+        fields = [self.chain_id, nonce, priority_fee, max_fee, gas, to, 0, data, []]
+        signature = self.miner_key.sign_msg_hash(keccak(b"\x02" + rlp.encode(fields)))
+        return b"\x02" + rlp.encode(fields + [signature.v, signature.r, signature.s])
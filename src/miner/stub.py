@@ -3,50 +3,54 @@ import time
 
 from eth_account import Account
 
-from utils.ecdsa import get_account_ab
 from .base import BaseMiner
 
-MAGIC_NUMBER = 0x8888888888888888888888888888888888888888
 MAX_UINT256 = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF
 
 
+def adjust_difficulty(difficulty: int, speed: float, target_speed: float) -> int:
+    """
+    Scale difficulty so solutions arrive at target_speed (solutions/s),
+    getting harder by at most 8x per step
+    """
+    if speed <= 0:
+        return min(difficulty * 8, MAX_UINT256)
+    return max(
+        min(int(difficulty * (target_speed / speed)), MAX_UINT256),
+        difficulty // 8,
+    )
+
+
 class StubMiner(BaseMiner):
     def __init__(self, solver, target_speed=0.5):
         super().__init__(solver)
-        self.submissions = []
+        # Times of the latest solutions, to adjust the difficulty
+        self.solved_at = []
         self.target_speed = target_speed
         self.difficulty = MAX_UINT256
 
     async def get_problems(self):
         while True:
             self.logger.debug(
-                f"New problem - difficulty: 0x{self.difficulty.to_bytes(20, byteorder="big").hex()}"
+                f"New problem - difficulty: 0x{self.difficulty.to_bytes(20, byteorder='big').hex()}"
             )
             self.solved = asyncio.get_running_loop().create_future()
             yield (0, int.from_bytes(Account.create()), self.difficulty)
             await self.solved
 
-    async def _submit_solution(self, problem, private_key_b):
-        _, private_key_a, difficulty = problem
-        account_ab = get_account_ab(private_key_a, private_key_b)
-
-        if int(account_ab.address, base=16) ^ MAGIC_NUMBER > difficulty:
-            return
+    async def _submit_solution(self, problem, solution):
         self.logger.debug(
-            f"New solution: {account_ab.address} (difficulty: 0x{self.difficulty.to_bytes(20, byteorder="big").hex()})"
+            f"New solution: {solution.address_ab} (difficulty: 0x{self.difficulty.to_bytes(20, byteorder='big').hex()})"
         )
 
-        self.submissions.append(time.monotonic())
-        if len(self.submissions) < 20:
+        self.solved_at.append(time.monotonic())
+        if len(self.solved_at) < 20:
             return
 
-        self.submissions = self.submissions[-20:]
-        speed = len(self.submissions) / (self.submissions[-1] - self.submissions[0])
-        self.difficulty = max(
-            int(self.difficulty * (self.target_speed / speed)) % self.MAX_UINT256,
-            self.difficulty // 8,
-        )
-        self.solved.set_result(private_key_b)
+        self.solved_at = self.solved_at[-20:]
+        speed = len(self.solved_at) / (self.solved_at[-1] - self.solved_at[0])
+        self.difficulty = adjust_difficulty(self.difficulty, speed, self.target_speed)
+        self.solved.set_result(solution.private_key_b)
 
     async def flush_stats(self):
         self.logger.info(f"[STATS] {self.difficulty=}")
@@ -0,0 +1,206 @@
+"""
+Host side check of the solutions a solver reports, before anything is signed.
+
+Every key is re-derived on the CPU and its AB address compared against the
+difficulty, so a kernel bug or overflow garbage never costs gas. The same pass
+derives what a submission needs from the key (publicKeyB and signatureAB), so
+the submit path is left with signing the transaction itself.
+
+The EC work is pure Python, it runs in a worker process in batches: solutions
+that arrive while a batch is being verified go together in the next one.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, NamedTuple
+
+from eth_keys import keys
+from eth_keys.backends.native.ecdsa import G, fast_add, fast_multiply
+from eth_keys.constants import SECPK1_N, SECPK1_P
+from eth_utils import keccak, to_checksum_address
+
+from utils.ecdsa import add_private_key
+from utils.metrics import Sample
+from utils.stats import Histogram
+
+MAGIC_NUMBER = 0x8888888888888888888888888888888888888888
+
+
+class Solution(NamedTuple):
+    """
+    A verified solution with everything of it a submission needs
+    """
+
+    private_key_b: int
+    address_ab: str
+    public_key_b: tuple[int, int]
+    # Signature of the submit message by the AB key, None without a message
+    signature_ab: bytes | None
+
+
+def point_address(point: tuple[int, int]) -> bytes:
+    x, y = point
+    return keccak(x.to_bytes(32, byteorder="big") + y.to_bytes(32, byteorder="big"))[
+        12:
+    ]
+
+
+def verify_batch(
+    message_hash: bytes | None, candidates: list[tuple[int, int, int]]
+) -> list[Solution | None]:
+    """
+    Solutions of (private_key_a, difficulty, private_key_b) candidates, None
+    for those that don't meet the difficulty. Runs in the worker process.
+    """
+    points_a: dict[int, tuple[int, int]] = {}
+    solutions: list[Solution | None] = []
+    for private_key_a, difficulty, private_key_b in candidates:
+        key_ab = add_private_key(private_key_a, private_key_b)
+        if private_key_b % SECPK1_N == 0 or key_ab == 0:
+            # publicKeyB or the AB key would be the point at infinity
+            solutions.append(None)
+            continue
+
+        point_ab = fast_multiply(G, key_ab)
+        address_ab = point_address(point_ab)
+        if int.from_bytes(address_ab, byteorder="big") ^ MAGIC_NUMBER > difficulty:
+            solutions.append(None)
+            continue
+
+        # B = AB - A, one addition instead of another multiplication
+        point_a = points_a.get(private_key_a)
+        if point_a is None:
+            point_a = points_a[private_key_a] = fast_multiply(G, private_key_a)
+        x_a, y_a = point_a
+        public_key_b = fast_add(point_ab, (x_a, SECPK1_P - y_a))
+
+        signature_ab = None
+        if message_hash is not None:
+            signature = keys.PrivateKey(
+                key_ab.to_bytes(32, byteorder="big")
+            ).sign_msg_hash(message_hash)
+            # Recovery id as 27/28 like eth_account.sign_message
+            signature_ab = signature.to_bytes()[:64] + bytes([signature.v + 27])
+
+        solutions.append(
+            Solution(
+                private_key_b,
+                to_checksum_address(address_ab),
+                public_key_b,
+                signature_ab,
+            )
+        )
+    return solutions
+
+
+class SolutionVerifier:
+    """
+    Verifies solutions in a worker process, batching those that arrive while a
+    batch is in flight.
+
+    message_hash is signed by the AB key of every valid solution.
+    """
+
+    def __init__(self, message_hash: bytes | None = None):
+        self.message_hash = message_hash
+        self.logger = logging.getLogger(self.__class__.__qualname__)
+
+        self.executor: ProcessPoolExecutor | None = None
+        self.pending: list[tuple[tuple[int, int, int], asyncio.Future]] = []
+        self.batch_task: asyncio.Task | None = None
+
+        self.invalid = 0
+        # Seconds a batch takes in the worker, including the round trip
+        self.batch_latency = Histogram()
+        self.batch_sizes = Histogram((1, 2, 4, 8, 16, 32, 64, 128, 256))
+
+    async def verify(
+        self, private_key_a: int, difficulty: int, private_key_b: int
+    ) -> Solution | None:
+        """
+        The solution of private_key_b, None when it doesn't meet the difficulty
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append(((private_key_a, difficulty, private_key_b), future))
+        if self.batch_task is None:
+            self.batch_task = asyncio.create_task(self._run_batches())
+        # A cancelled submission cancels only its future, the batch runs on
+        solution = await future
+        if solution is None:
+            self.invalid += 1
+        return solution
+
+    async def _run_batches(self):
+        try:
+            while self.pending:
+                batch, self.pending = self.pending, []
+                try:
+                    results = await self._verify_batch([c for c, _ in batch])
+                except Exception as e:
+                    results = [e] * len(batch)
+                for (_, future), result in zip(batch, results):
+                    if future.done():
+                        continue
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+        finally:
+            self.batch_task = None
+
+    def start(self):
+        """
+        Start the worker process, so the first solution doesn't wait for it
+        """
+        if self.executor is None:
+            # Spawned, a fork would copy the event loop and the GPU contexts
+            self.executor = ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn")
+            )
+            self.executor.submit(verify_batch, None, [])
+
+    async def _verify_batch(
+        self, candidates: list[tuple[int, int, int]]
+    ) -> list[Solution | None]:
+        self.start()
+        t_start = time.monotonic()
+        try:
+            solutions = await asyncio.get_running_loop().run_in_executor(
+                self.executor, verify_batch, self.message_hash, candidates
+            )
+        except BrokenProcessPool:
+            self.logger.info("Verifier process died, restarting it")
+            self.executor = None
+            raise
+        self.batch_latency.observe(time.monotonic() - t_start)
+        self.batch_sizes.observe(len(candidates))
+        return solutions
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def get_metrics(self) -> Iterable[Sample]:
+        yield Sample(
+            "infinity_invalid_solutions_total",
+            "counter",
+            "Solutions dropped by the host side check before submitting",
+            self.invalid,
+        )
+        yield Sample(
+            "infinity_verify_batch_seconds",
+            "histogram",
+            "Seconds to verify and derive a batch of solutions",
+            self.batch_latency,
+        )
+        yield Sample(
+            "infinity_verify_batch_size",
+            "histogram",
+            "Solutions per verified batch",
+            self.batch_sizes,
+        )
@@ -1,5 +1,20 @@
 from abc import ABC, abstractmethod
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Iterable
+
+from utils.metrics import Sample
+
+
+def format_hashrate(speed: float) -> str:
+    if speed < 1_000:
+        return f"{speed:.2f} H/s"
+    elif speed < 1_000_000:
+        return f"{speed/1_000:.2f} KH/s"
+    elif speed < 1_000_000_000:
+        return f"{speed/1_000_000:.2f} MH/s"
+    elif speed < 1_000_000_000_000:
+        return f"{speed/1_000_000_000:.2f} GH/s"
+    else:
+        return f"{speed/1_000_000_000_000:.2f} TH/s"
 
 
 class BaseSolver(ABC):
@@ -11,15 +26,19 @@ class BaseSolver(ABC):
     @abstractmethod
     def get_speed(self) -> float: ...
 
+    def get_stats(self) -> dict[str, object]:
+        """
+        Solver specific stats (name -> printable value) reported with miner stats
+        """
+        return {}
+
+    def get_metrics(self) -> Iterable[Sample]:
+        """
+        Samples exposed on the metrics endpoint, read when it is scraped
+        """
+        yield Sample(
+            "infinity_hashrate", "gauge", "Hashes per second", self.get_speed()
+        )
+
     def hashrate(self):
-        speed = self.get_speed()
-        if speed < 1_000:
-            return f"{speed:.2f} H/s"
-        elif speed < 1_000_000:
-            return f"{speed/1_000:.2f} KH/s"
-        elif speed < 1_000_000_000:
-            return f"{speed/1_000_000:.2f} MH/s"
-        elif speed < 1_000_000_000_000:
-            return f"{speed/1_000_000_000:.2f} GH/s"
-        else:
-            return f"{speed/1_000_000_000_000:.2f} TH/s"
+        return format_hashrate(self.get_speed())
@@ -0,0 +1,34 @@
+from utils.async_ import async_merge
+from .base import BaseSolver
+
+
+class CombinedSolver(BaseSolver):
+    """
+    Mine the same problem with several solvers at once, e.g. GPUs and spare CPU cores
+    """
+
+    def __init__(self, *solvers: BaseSolver):
+        self.solvers = solvers
+
+    async def get_solutions(self, private_key_a, difficulty):
+        async for solution in async_merge(
+            *[
+                solver.get_solutions(private_key_a, difficulty)
+                for solver in self.solvers
+            ]
+        ):
+            yield solution
+
+    def get_speed(self):
+        return sum(solver.get_speed() for solver in self.solvers)
+
+    def get_stats(self):
+        return {
+            name: value
+            for solver in self.solvers
+            for name, value in solver.get_stats().items()
+        }
+
+    def get_metrics(self):
+        for solver in self.solvers:
+            yield from solver.get_metrics()
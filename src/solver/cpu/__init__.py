@@ -0,0 +1,45 @@
+import asyncio
+import secrets
+
+from ..base import BaseSolver
+from ..speed_sampler import SpeedSamplerMixin
+from .walk import AffineWalk
+
+
+class CPUSolver(BaseSolver, SpeedSamplerMixin):
+    """
+    Same affine walk as the OpenCL kernels, computed with NumPy on the host.
+    Rounds run in a worker thread, so the event loop stays responsive.
+    """
+
+    def __init__(self, inverse_size: int = 64, inverse_multiple: int = 256):
+        self.inverse_size = inverse_size
+        self.inverse_multiple = inverse_multiple
+        # Running get_solutions generators, the next one may start before the last ends
+        self.mining = 0
+
+    async def get_solutions(self, private_key_a, difficulty):
+        self.mining += 1
+        self._start_speed()
+        try:
+            walk = await asyncio.to_thread(
+                AffineWalk,
+                private_key_a,
+                int(secrets.token_hex(32), base=16),
+                difficulty,
+                self.inverse_size,
+                self.inverse_multiple,
+            )
+
+            while True:
+                solutions = await asyncio.to_thread(walk.step)
+                for solution in solutions:
+                    yield solution
+                self._speed_sample(walk.size)
+        finally:
+            self.mining -= 1
+            if not self.mining:
+                self._stop_speed()
+
+    def get_speed(self):
+        return self.speed()
@@ -0,0 +1,173 @@
+"""
+secp256k1 field arithmetic vectorized over lanes.
+
+A batch of field elements is an (8, n) uint64 array of 32-bit little-endian limbs,
+every element is kept fully reduced modulo P.
+"""
+
+import numpy as np
+
+from eth_keys.constants import SECPK1_P as P
+
+MP_WORDS = 8
+MASK = np.uint64(0xFFFFFFFF)
+SHIFT = np.uint64(32)
+# 2^256 = 2^32 + 977 (mod P)
+REDUCE = np.uint64(977)
+
+P_LIMBS = np.array(
+    [(P >> (32 * i)) & 0xFFFFFFFF for i in range(MP_WORDS)], dtype=np.uint64
+)
+
+
+def to_limbs(values) -> np.ndarray:
+    """
+    Convert python ints to a batch of field elements
+    """
+    data = b"".join(value.to_bytes(32, byteorder="little") for value in values)
+    return np.frombuffer(data, dtype="<u4").reshape(-1, MP_WORDS).T.astype(np.uint64)
+
+
+def from_limbs(a: np.ndarray) -> list[int]:
+    data = a.T.astype("<u4").tobytes()
+    return [
+        int.from_bytes(data[i : i + 32], byteorder="little")
+        for i in range(0, len(data), 32)
+    ]
+
+
+def to_bytes_be(a: np.ndarray) -> np.ndarray:
+    """
+    (n, 32) big-endian byte representation of a batch
+    """
+    return np.ascontiguousarray(a[::-1].T.astype(">u4")).view(np.uint8)
+
+
+def _carry(r: np.ndarray) -> np.ndarray:
+    """
+    Propagate carries through columns, last column keeps the overflow
+    """
+    for i in range(len(r) - 1):
+        r[i + 1] += r[i] >> SHIFT
+        r[i] &= MASK
+    return r
+
+
+def _reduce_once(a: np.ndarray) -> np.ndarray:
+    """
+    Subtract P from elements in [P, 2^256)
+    """
+    r = np.empty_like(a)
+    borrow = np.zeros_like(a[0])
+    for i in range(MP_WORDS):
+        t = a[i] + (np.uint64(1) << SHIFT) - P_LIMBS[i] - borrow
+        r[i] = t & MASK
+        borrow = np.uint64(1) - (t >> SHIFT)
+    return np.where(borrow == 0, r, a)
+
+
+def _fold(r: np.ndarray) -> np.ndarray:
+    """
+    Reduce carried 9-column number (top column < 2^48) to a field element
+    """
+    top = r[MP_WORDS]
+    r = r[:MP_WORDS].copy()
+    r[0] += top * REDUCE
+    r[1] += top
+    r = _carry(np.concatenate([r, np.zeros_like(r[:1])]))
+
+    # Remaining overflow is at most 1
+    top = r[MP_WORDS]
+    r = r[:MP_WORDS]
+    r[0] += top * REDUCE
+    r[1] += top
+    _carry(r)
+    return _reduce_once(r)
+
+
+def mul(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    prod = a[:, None] * b[None, :]  # (8, 8, n), each product < 2^64
+    lo = prod & MASK
+    hi = prod >> SHIFT
+
+    # Column sums stay below 2^36
+    cols = np.zeros((2 * MP_WORDS + 1,) + a.shape[1:], dtype=np.uint64)
+    for i in range(MP_WORDS):
+        cols[i : i + MP_WORDS] += lo[i]
+        cols[i + 1 : i + MP_WORDS + 1] += hi[i]
+
+    # low + high * 2^256 = low + high * 977 + high * 2^32
+    high = cols[MP_WORDS : 2 * MP_WORDS]
+    r = np.zeros((MP_WORDS + 1,) + a.shape[1:], dtype=np.uint64)
+    r[:MP_WORDS] = cols[:MP_WORDS] + high * REDUCE
+    r[1:] += high
+    return _fold(_carry(r))
+
+
+def sqr(a: np.ndarray) -> np.ndarray:
+    return mul(a, a)
+
+
+def sub(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    r = np.empty_like(a)
+    borrow = np.zeros_like(a[0])
+    for i in range(MP_WORDS):
+        t = a[i] + (np.uint64(1) << SHIFT) - b[i] - borrow
+        r[i] = t & MASK
+        borrow = np.uint64(1) - (t >> SHIFT)
+
+    # Add P back where we went below zero
+    carry = np.zeros_like(a[0])
+    for i in range(MP_WORDS):
+        t = r[i] + P_LIMBS[i] * borrow + carry
+        r[i] = t & MASK
+        carry = t >> SHIFT
+    return r
+
+
+def inverse(a: np.ndarray) -> np.ndarray:
+    """
+    a^(P - 2) with the addition chain of libsecp256k1
+    """
+
+    def sqr_n(x, n):
+        for _ in range(n):
+            x = sqr(x)
+        return x
+
+    x2 = mul(sqr(a), a)
+    x3 = mul(sqr(x2), a)
+    x6 = mul(sqr_n(x3, 3), x3)
+    x9 = mul(sqr_n(x6, 3), x3)
+    x11 = mul(sqr_n(x9, 2), x2)
+    x22 = mul(sqr_n(x11, 11), x11)
+    x44 = mul(sqr_n(x22, 22), x22)
+    x88 = mul(sqr_n(x44, 44), x44)
+    x176 = mul(sqr_n(x88, 88), x88)
+    x220 = mul(sqr_n(x176, 44), x44)
+    x223 = mul(sqr_n(x220, 3), x3)
+
+    t = mul(sqr_n(x223, 23), x22)
+    t = mul(sqr_n(t, 5), a)
+    t = mul(sqr_n(t, 3), x2)
+    return mul(sqr_n(t, 2), a)
+
+
+def batch_inverse(d: np.ndarray) -> np.ndarray:
+    """
+    Invert (8, s, m) elements with one inversion per column (Montgomery trick),
+    same as profanity_inverse does for PROFANITY_INVERSE_SIZE points.
+    """
+    s = d.shape[1]
+    prefix = np.empty_like(d)
+    prefix[:, 0] = d[:, 0]
+    for i in range(1, s):
+        prefix[:, i] = mul(prefix[:, i - 1], d[:, i])
+
+    inv = inverse(prefix[:, s - 1])
+    r = np.empty_like(d)
+    for i in range(s - 1, 0, -1):
+        r[:, i] = mul(inv, prefix[:, i - 1])
+        inv = mul(inv, d[:, i])
+    r[:, 0] = inv
+    return r
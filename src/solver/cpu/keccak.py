@@ -0,0 +1,81 @@
+"""
+Keccak-256 of 64-byte messages (uncompressed public keys) vectorized over lanes
+"""
+
+import numpy as np
+
+ROUND_CONSTANTS = np.array(
+    [
+        0x0000000000000001, 0x0000000000008082, 0x800000000000808A,
+        0x8000000080008000, 0x000000000000808B, 0x0000000080000001,
+        0x8000000080008081, 0x8000000000008009, 0x000000000000008A,
+        0x0000000000000088, 0x0000000080008009, 0x000000008000000A,
+        0x000000008000808B, 0x800000000000008B, 0x8000000000008089,
+        0x8000000000008003, 0x8000000000008002, 0x8000000000000080,
+        0x000000000000800A, 0x800000008000000A, 0x8000000080008081,
+        0x8000000000008080, 0x0000000080000001, 0x8000000080008008,
+    ],
+    dtype=np.uint64,
+)  # fmt: skip
+
+# Rotation offsets indexed by lane (x + 5 * y)
+ROTATIONS = [
+    0, 1, 62, 28, 27,
+    36, 44, 6, 55, 20,
+    3, 10, 43, 25, 39,
+    41, 45, 15, 21, 8,
+    18, 2, 61, 56, 14,
+]  # fmt: skip
+
+# Pi step: lane (x, y) moves to (y, 2x + 3y)
+PI = [0] * 25
+for x in range(5):
+    for y in range(5):
+        PI[y + 5 * ((2 * x + 3 * y) % 5)] = x + 5 * y
+
+
+def _rotate(a: np.ndarray, n: int) -> np.ndarray:
+    if n == 0:
+        return a
+    return (a << np.uint64(n)) | (a >> np.uint64(64 - n))
+
+
+def keccak_f(state: np.ndarray) -> np.ndarray:
+    """
+    Keccak-f[1600] permutation of (25, n) uint64 states
+    """
+    a = list(state)
+    for rc in ROUND_CONSTANTS:
+        # Theta
+        c = [a[x] ^ a[x + 5] ^ a[x + 10] ^ a[x + 15] ^ a[x + 20] for x in range(5)]
+        d = [c[(x - 1) % 5] ^ _rotate(c[(x + 1) % 5], 1) for x in range(5)]
+        a = [a[i] ^ d[i % 5] for i in range(25)]
+
+        # Rho and Pi
+        b = [_rotate(a[src], ROTATIONS[src]) for src in PI]
+
+        # Chi
+        a = [
+            b[i] ^ (~b[(i + 1) % 5 + i - i % 5] & b[(i + 2) % 5 + i - i % 5])
+            for i in range(25)
+        ]
+
+        # Iota
+        a[0] = a[0] ^ rc
+
+    return np.stack(a)
+
+
+def keccak256_64(data: np.ndarray) -> np.ndarray:
+    """
+    Keccak-256 of (n, 64) uint8 messages, returns (n, 32) uint8 digests
+    """
+    n = data.shape[0]
+    state = np.zeros((25, n), dtype=np.uint64)
+    state[:8] = np.ascontiguousarray(data).view("<u8").T
+    # Keccak padding (not SHA-3): 0x01 after message, 0x80 at the end of the rate
+    state[8] ^= np.uint64(0x01)
+    state[16] ^= np.uint64(0x8000000000000000)
+
+    state = keccak_f(state)
+    return np.ascontiguousarray(state[:4].T.astype("<u8")).view(np.uint8)
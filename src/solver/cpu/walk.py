@@ -0,0 +1,129 @@
+"""
+Affine walk over secp256k1 points, the NumPy counterpart of the profanity kernels.
+
+Keys follow the kernels bit for bit (see decode_private_keys): lane `j` scores
+private_key_b + (r + 1) + 2^64 + 2^128 + ((j + 1) << 192) at round `r`, rounds
+counted like Device does, from FIRST_ROUND, and every round moves by +G.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+from eth_keys.backends.native.ecdsa import G, fast_add, fast_multiply
+
+from utils.ecdsa import add_private_key, private_key_to_ec_point
+from . import field
+from .keccak import keccak256_64
+
+LANE_SHIFT = 192
+# Added to private_key_b of every lane by profanity_init, next to the lane offset
+LANE_BASE = (1 << 64) + (1 << 128)
+# Round of the first batch after profanity_init, Device.round + 1
+FIRST_ROUND = 2
+MAGIC_BYTE = np.uint8(0x88)
+
+
+@lru_cache
+def lane_offsets(size: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    ((j + 1) << LANE_SHIFT) * G for every lane
+    """
+    step = fast_multiply(G, 1 << LANE_SHIFT)
+    points = [step]
+    for _ in range(size - 1):
+        points.append(fast_add(points[-1], step))
+
+    return (
+        field.to_limbs([x for x, _ in points]),
+        field.to_limbs([y for _, y in points]),
+    )
+
+
+def affine_add(px, py, qx, qy, inverse_size: int):
+    """
+    P + Q for every lane, points must not share x coordinate (see profanity.cl)
+    """
+    qx, qy = np.broadcast_to(qx, px.shape), np.broadcast_to(qy, py.shape)
+
+    dx = field.sub(qx, px)
+    inv = field.batch_inverse(dx.reshape(field.MP_WORDS, inverse_size, -1))
+    lam = field.mul(field.sub(qy, py), inv.reshape(dx.shape))
+
+    x = field.sub(field.sub(field.sqr(lam), px), qx)
+    y = field.sub(field.mul(lam, field.sub(px, x)), py)
+    return x, y
+
+
+def public_keys(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    (n, 64) uncompressed public keys without 0x04 prefix
+    """
+    return np.concatenate([field.to_bytes_be(x), field.to_bytes_be(y)], axis=1)
+
+
+def score(hashes: np.ndarray, difficulty: int) -> np.ndarray:
+    """
+    Indexes of hashes whose address ^ 0x88..88 <= difficulty, same as `score` kernel
+    """
+    address = hashes[:, 12:] ^ MAGIC_BYTE
+    words = [
+        np.ascontiguousarray(address[:, :4]).view(">u4").ravel().astype(np.uint64),
+        np.ascontiguousarray(address[:, 4:12]).view(">u8").ravel(),
+        np.ascontiguousarray(address[:, 12:]).view(">u8").ravel(),
+    ]
+    limits = [
+        np.uint64(difficulty >> 128),
+        np.uint64((difficulty >> 64) & 0xFFFFFFFFFFFFFFFF),
+        np.uint64(difficulty & 0xFFFFFFFFFFFFFFFF),
+    ]
+
+    # Lexicographic compare, from the least significant word up
+    found = words[2] <= limits[2]
+    for word, limit in zip(words[1::-1], limits[1::-1]):
+        found = (word < limit) | ((word == limit) & found)
+    return np.flatnonzero(found)
+
+
+class AffineWalk:
+    def __init__(
+        self,
+        private_key_a: int,
+        private_key_b: int,
+        difficulty: int,
+        inverse_size: int = 64,
+        inverse_multiple: int = 256,
+    ):
+        self.private_key_b = private_key_b
+        self.difficulty = difficulty
+        self.inverse_size = inverse_size
+        self.size = inverse_size * inverse_multiple
+        self.round = FIRST_ROUND
+
+        bx, by = private_key_to_ec_point(
+            add_private_key(
+                private_key_a, private_key_b + LANE_BASE + self.round + 1
+            )
+        )
+        ox, oy = lane_offsets(self.size)
+        self.x, self.y = affine_add(
+            ox, oy, field.to_limbs([bx]), field.to_limbs([by]), inverse_size
+        )
+        self.gx, self.gy = field.to_limbs([G[0]]), field.to_limbs([G[1]])
+
+    def step(self) -> list[int]:
+        """
+        Score current points of all lanes and move them by +G.
+        Returns private_key_b of found solutions.
+        """
+        hashes = keccak256_64(public_keys(self.x, self.y))
+        solutions = [
+            add_private_key(
+                self.private_key_b,
+                LANE_BASE + ((int(lane) + 1) << LANE_SHIFT) + self.round + 1,
+            )
+            for lane in score(hashes, self.difficulty)
+        ]
+
+        self.x, self.y = affine_add(self.x, self.y, self.gx, self.gy, self.inverse_size)
+        self.round += 1
+        return solutions
@@ -0,0 +1,251 @@
+"""
+CPU solver scaled to many cores: every worker process runs its own affine walk
+over a disjoint private_key_b range.
+
+Parent and workers talk only through shared memory:
+- control block, written by the parent, holds the current problem behind a
+  sequence number (odd while being written)
+- one block per worker, written by that worker: hash counter and a
+  single-producer / single-consumer ring of found solutions
+"""
+
+import asyncio
+import atexit
+import multiprocessing
+import os
+import secrets
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+from eth_keys.constants import SECPK1_N
+
+from utils.ecdsa import add_private_key
+from utils.metrics import Sample
+from .base import BaseSolver
+from .speed_sampler import SpeedSamplerMixin
+
+RING_SIZE = 256
+# Walk of one worker stays within 2^216 of its start (lane offsets + rounds)
+WORKER_SHIFT = 216
+
+KEY = (np.uint8, 32)
+CONTROL = np.dtype(
+    [
+        ("seq", np.uint64),
+        ("stop", np.uint64),
+        ("private_key_a", *KEY),
+        ("private_key_b", *KEY),
+        ("difficulty", *KEY),
+    ]
+)
+SOLUTION = np.dtype([("seq", np.uint64), ("private_key_b", *KEY)])
+WORKER = np.dtype(
+    [
+        ("hashes", np.uint64),
+        ("head", np.uint64),  # written by worker
+        ("tail", np.uint64),  # written by parent
+        ("dropped", np.uint64),
+        ("solutions", SOLUTION, RING_SIZE),
+    ]
+)
+
+
+def int_to_key(n: int) -> np.ndarray:
+    return np.frombuffer(n.to_bytes(32, byteorder="big"), dtype=np.uint8)
+
+
+def key_to_int(key: np.ndarray) -> int:
+    return int.from_bytes(key.tobytes(), byteorder="big")
+
+
+def shared_views(buf, num_workers: int) -> tuple[np.ndarray, np.ndarray]:
+    control = np.ndarray((), dtype=CONTROL, buffer=buf)
+    workers = np.ndarray(
+        (num_workers,), dtype=WORKER, buffer=buf, offset=CONTROL.itemsize
+    )
+    return control, workers
+
+
+def read_problem(control: np.ndarray) -> tuple[int, int, int, int]:
+    """
+    Consistent snapshot (seq, private_key_a, private_key_b, difficulty) of the control block
+    """
+    while True:
+        seq = int(control["seq"])
+        if seq % 2:
+            continue
+        problem = (
+            seq,
+            key_to_int(control["private_key_a"]),
+            key_to_int(control["private_key_b"]),
+            key_to_int(control["difficulty"]),
+        )
+        if int(control["seq"]) == seq:
+            return problem
+
+
+def run_worker(shm_name: str, num_workers: int, worker_idx: int, walk_options: dict):
+    from .cpu.walk import AffineWalk
+
+    shm = SharedMemory(name=shm_name)
+    control, workers = shared_views(shm.buf, num_workers)
+    me = workers[worker_idx]
+
+    walk, walk_seq = None, None
+    while not control["stop"]:
+        seq, private_key_a, private_key_b, difficulty = read_problem(control)
+        if seq != walk_seq:
+            walk_seq = seq
+            walk = None
+            if private_key_a:
+                walk = AffineWalk(
+                    private_key_a,
+                    add_private_key(private_key_b, worker_idx << WORKER_SHIFT),
+                    difficulty,
+                    **walk_options,
+                )
+
+        if walk is None:
+            time.sleep(0.005)
+            continue
+
+        for private_key_b in walk.step():
+            head = int(me["head"])
+            if head - int(me["tail"]) >= RING_SIZE:
+                me["dropped"] += 1
+                continue
+            solution = me["solutions"][head % RING_SIZE]
+            solution["seq"] = seq
+            solution["private_key_b"] = int_to_key(private_key_b)
+            # publish entry only after it's written
+            me["head"] = head + 1
+        me["hashes"] += walk.size
+
+    del control, workers, me
+    shm.close()
+
+
+class MultiprocessSolver(BaseSolver, SpeedSamplerMixin):
+    def __init__(
+        self,
+        num_workers: int | None = None,
+        inverse_size: int = 64,
+        inverse_multiple: int = 64,
+        poll_interval: float = 0.01,
+    ):
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.poll_interval = poll_interval
+
+        self.shm = SharedMemory(
+            create=True, size=CONTROL.itemsize + self.num_workers * WORKER.itemsize
+        )
+        self.control, self.workers = shared_views(self.shm.buf, self.num_workers)
+        self.control.fill(0)
+        self.workers.fill(0)
+
+        ctx = multiprocessing.get_context("spawn")
+        self.processes = [
+            ctx.Process(
+                target=run_worker,
+                args=(
+                    self.shm.name,
+                    self.num_workers,
+                    worker_idx,
+                    {
+                        "inverse_size": inverse_size,
+                        "inverse_multiple": inverse_multiple,
+                    },
+                ),
+                daemon=True,
+            )
+            for worker_idx in range(self.num_workers)
+        ]
+        for process in self.processes:
+            process.start()
+        atexit.register(self.close)
+
+    def _set_problem(self, private_key_a: int, private_key_b: int, difficulty: int):
+        seq = int(self.control["seq"])
+        self.control["seq"] = seq + 1
+        self.control["private_key_a"] = int_to_key(private_key_a)
+        self.control["private_key_b"] = int_to_key(private_key_b)
+        self.control["difficulty"] = int_to_key(difficulty)
+        self.control["seq"] = seq + 2
+        return seq + 2
+
+    def _total_hashes(self) -> int:
+        return int(self.workers["hashes"].sum())
+
+    async def get_solutions(self, private_key_a, difficulty):
+        self._start_speed()
+        seq = self._set_problem(
+            private_key_a,
+            # Full entropy, publicKeyB of a submission must not give away its key
+            secrets.randbelow(SECPK1_N),
+            difficulty,
+        )
+        hashes = self._total_hashes()
+
+        try:
+            while True:
+                await asyncio.sleep(self.poll_interval)
+                if not all(process.is_alive() for process in self.processes):
+                    raise RuntimeError("CPU worker process exited")
+
+                for worker in self.workers:
+                    head, tail = int(worker["head"]), int(worker["tail"])
+                    solutions = [
+                        (
+                            int(worker["solutions"][i % RING_SIZE]["seq"]),
+                            key_to_int(
+                                worker["solutions"][i % RING_SIZE]["private_key_b"]
+                            ),
+                        )
+                        for i in range(tail, head)
+                    ]
+                    worker["tail"] = head
+
+                    for solution_seq, private_key_b in solutions:
+                        if solution_seq == seq:
+                            yield private_key_b
+
+                total_hashes = self._total_hashes()
+                self._speed_sample(total_hashes - hashes)
+                hashes = total_hashes
+        finally:
+            # Pause workers, unless a newer problem is already set
+            if self.shm is not None and int(self.control["seq"]) == seq:
+                self._set_problem(0, 0, 0)
+                self._stop_speed()
+
+    def get_speed(self):
+        return self.speed()
+
+    def get_metrics(self):
+        yield from super().get_metrics()
+        if self.shm is None:
+            return
+        for worker_idx, worker in enumerate(self.workers):
+            yield Sample(
+                "infinity_device_dropped_solutions_total",
+                "counter",
+                "Solutions dropped because the result buffer overflowed",
+                int(worker["dropped"]),
+                {"device": f"cpu{worker_idx}"},
+            )
+
+    def close(self):
+        if self.shm is None:
+            return
+        self.control["stop"] = 1
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.kill()
+
+        # numpy views must be released before shared memory is closed
+        self.control = self.workers = None
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
@@ -1,18 +1,33 @@
 import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 import secrets
+import time
 import numpy as np
 import pyopencl as cl
 
 from utils.async_ import async_merge
-from utils.ecdsa import private_key_to_ec_point, add_private_key
-from ..base import BaseSolver
+from utils.ecdsa import (
+    add_private_key,
+    private_key_to_ec_point,
+    variant_private_key_b,
+)
+from utils.metrics import Sample
+from utils.stats import Histogram
+from ..base import BaseSolver, format_hashrate
 from . import profanity_types as t
-from .constants import OPENCL_PROGRAM, G_PRECOMP
-from .speed_sampler import SpeedSamplerMixin
+from .autotune import load_profile, tune_device
+from .constants import load_g_precomp
+from .profiling import KernelProfiler
+from .program import build_program
+from .worker import DeviceWorker
+from ..speed_sampler import SpeedSamplerMixin
 
 INVERSE_SIZE = 255
 INVERSE_MULTIPLE = 16384
+# Result buffers grow on overflow up to this many solutions per batch
+MAX_RESULT_CAPACITY = 1 << 20
 
 
 def int_to_ulong4(n: int):
@@ -23,158 +38,471 @@ def event_to_future(event):
     loop = asyncio.get_running_loop()
     future = loop.create_future()
 
+    def _set_result():
+        # future may be cancelled while command is still in queue
+        if not future.done():
+            future.set_result(None)
+
     # Callback invoked on COMPLETE status
     def _callback(_):
-        loop.call_soon_threadsafe(future.set_result, None)
+        loop.call_soon_threadsafe(_set_result)
 
     # Register callback (callback signature receives event and status)
     event.set_callback(cl.command_execution_status.COMPLETE, _callback)
     return future
 
 
-async def async_enqueue_copy(queue, dest, src, **kwargs):
-    # Enqueue a non-blocking copy
-    event = cl.enqueue_copy(queue, dest, src, is_blocking=False, **kwargs)
-    # Flush to ensure the command is submitted
-    queue.flush()
-    # Await completion via callback
-    await event_to_future(event)
+def grid_size(
+    device: cl.Device,
+    inverse_size: int | None = None,
+    inverse_multiple: int | None = None,
+) -> tuple[int, int]:
+    # Explicit values win, then tuned profile, then defaults
+    profile = load_profile(device) or {}
+    return (
+        inverse_size or profile.get("inverse_size") or INVERSE_SIZE,
+        inverse_multiple or profile.get("inverse_multiple") or INVERSE_MULTIPLE,
+    )
 
 
-class Device(SpeedSamplerMixin):
-    def __init__(self, device: cl.Device):
-        self.ctx = cl.Context([device])
-        self.queue = cl.CommandQueue(self.ctx)
-        self.program = cl.Program(self.ctx, OPENCL_PROGRAM).build(
-            options=[
-                "-D",
-                f"PROFANITY_INVERSE_SIZE={INVERSE_SIZE}",
-                "-D",
-                f"MAX_SOLUTIONS={t.MAX_SOLUTIONS}",
-            ]
-        )
+def decode_private_keys(
+    private_key_b: int, first_round: int, found: np.ndarray
+) -> list[int]:
+    """
+    Private keys of found lanes, all at once. Lane idx of round r holds
+    private_key_b + (r + 1) + 2^64 + 2^128 + (1 + idx) * 2^192
+    """
+    rounds = found["round"].astype(np.uint64) + np.uint64(first_round + 1)
+    lanes = found["foundId"].astype(np.uint64) + np.uint64(1)
+    private_key_b += (1 << 64) + (1 << 128)
+    return [
+        add_private_key(round + (lane << 192), private_key_b)
+        for round, lane in zip(rounds.tolist(), lanes.tolist())
+    ]
+
 
-        self.size = INVERSE_SIZE * INVERSE_MULTIPLE
+class LaneState:
+    """
+    Lanes of one problem with their own command queue, so the next problem can be
+    initialized while batches of the previous one are still draining.
+    """
+
+    def __init__(
+        self, ctx: cl.Context, size: int, pipeline_depth: int, profiling: bool = False
+    ):
+        self.queue = cl.CommandQueue(
+            ctx,
+            properties=(
+                cl.command_queue_properties.PROFILING_ENABLE if profiling else 0
+            ),
+        )
 
         self.p_delta_x_buf = cl.Buffer(
-            self.ctx,
+            ctx,
             cl.mem_flags.READ_WRITE | cl.mem_flags.HOST_NO_ACCESS,
-            size=self.size * t.MP_NUMBER.itemsize,
+            size=size * t.MP_NUMBER.itemsize,
         )
         self.p_prev_lambda_buf = cl.Buffer(
-            self.ctx,
+            ctx,
             cl.mem_flags.READ_WRITE | cl.mem_flags.HOST_NO_ACCESS,
-            size=self.size * t.MP_NUMBER.itemsize,
+            size=size * t.MP_NUMBER.itemsize,
         )
         self.p_inverse_buf = cl.Buffer(
-            self.ctx,
+            ctx,
             cl.mem_flags.READ_WRITE | cl.mem_flags.HOST_NO_ACCESS,
-            size=self.size * t.MP_NUMBER.itemsize,
+            size=size * t.MP_NUMBER.itemsize,
         )
+        self.difficulty_buf = cl.Buffer(ctx, cl.mem_flags.READ_ONLY, size=20)
+
+        self.ctx = ctx
+        self.pipeline_depth = pipeline_depth
+        self.allocate_results(t.MAX_SOLUTIONS)
+
+        # Transfers of a replaced problem with their host arrays, kept until they
+        # complete: dropping a pyopencl NannyEvent waits for it holding the GIL
+        self.pending: list[tuple[np.ndarray, cl.Event]] = []
+
+    def keep(self, host: np.ndarray, event: cl.Event):
+        self.pending.append((host, event))
+
+    def release_completed(self):
+        self.pending = [
+            (host, event)
+            for host, event in self.pending
+            if event.command_execution_status != cl.command_execution_status.COMPLETE
+        ]
+
+    def allocate_results(self, capacity: int):
+        """
+        (Re)allocate the ring of result buffers, one per batch in flight.
+        Batches already in flight keep their previous buffers.
+        """
+        self.result_capacity = capacity
+        result = t.result_dtype(capacity)
+        self.p_result_bufs = [
+            cl.Buffer(self.ctx, cl.mem_flags.READ_WRITE, size=result.itemsize)
+            for _ in range(self.pipeline_depth)
+        ]
+        self.host_results = [
+            np.zeros(1, dtype=result) for _ in range(self.pipeline_depth)
+        ]
+
+
+class Device(SpeedSamplerMixin):
+    def __init__(
+        self,
+        device: cl.Device,
+        pipeline_depth: int = 2,
+        batch_size: int = 1,
+        inverse_size: int | None = None,
+        inverse_multiple: int | None = None,
+        lane_states: int = 2,
+        fused_score: bool = True,
+        profile_every: int = 0,
+        endomorphism: bool = False,
+    ):
+        if endomorphism and not fused_score:
+            raise ValueError("Endomorphism needs the fused score kernel")
+
+        self.inverse_size, self.inverse_multiple = grid_size(
+            device, inverse_size, inverse_multiple
+        )
+
+        self.name = device.name
+        self.ctx = cl.Context([device])
+        # Fused kernel scores addresses in registers, the split one is kept for comparison
+        self.fused_score = fused_score
+        # Every point is scored as six keys, see profanity_iterate_score
+        self.endomorphism = endomorphism
+        self.program = build_program(
+            self.ctx, device, self.inverse_size, self.fused_score, self.endomorphism
+        )
+
+        self.size = self.inverse_size * self.inverse_multiple
+        self.variants = t.VARIANTS if self.endomorphism else 1
+        # Number of rounds covered by one dispatch group and one readback
+        self.batch_size = max(1, batch_size)
+        self.pipeline_depth = max(1, pipeline_depth)
+
         self.precomp_buf = cl.Buffer(
             self.ctx,
             cl.mem_flags.READ_ONLY | cl.mem_flags.COPY_HOST_PTR,
-            hostbuf=G_PRECOMP.astype(t.POINT),
+            hostbuf=load_g_precomp(),
         )
-        self.p_result_buf = cl.Buffer(
-            self.ctx, cl.mem_flags.READ_WRITE, size=t.RESULT.itemsize
+
+        # Kernel timing of a sample of batches, one in every profile_every
+        self.profiler = KernelProfiler(profile_every) if profile_every else None
+        # Commands enqueued since the last batch, they are profiled with the next one
+        self.commands: list[tuple[str, cl.Event]] = []
+
+        # Problems take turns on the lane states, one spare is ready for a switch
+        self.states = [
+            LaneState(
+                self.ctx, self.size, self.pipeline_depth, self.profiler is not None
+            )
+            for _ in range(max(1, lane_states))
+        ]
+        self.state_idx = 0
+        self.state = None
+        self.private_key_a = None
+        # Running get_solutions generators, the next one may start before the last ends
+        self.mining = 0
+
+        # Seconds from problem arrival until its first batch is submitted
+        self.switch_latency = Histogram()
+        # Solutions dropped because a batch found more than its result buffer holds
+        self.overflows = 0
+        # Totals since start, for the metrics endpoint
+        self.rounds = 0
+        self.solutions = 0
+
+    def _base_point(self, private_key_a: int) -> tuple[int, int, int]:
+        """
+        Pick private_key_b and compute the base point of a problem, pure Python so
+        it is kept off the event loop.
+        """
+        private_key_b = int(secrets.token_hex(32), base=16)
+        x, y = private_key_to_ec_point(add_private_key(private_key_a, private_key_b))
+        return private_key_b, x, y
+
+    def _set_difficulty(self, difficulty: int):
+        difficulty_bytes = difficulty.to_bytes(20, byteorder="big")
+        if self.fused_score:
+            # Compared as big endian words by profanity_iterate_score
+            difficulty_host = np.frombuffer(difficulty_bytes, dtype=">u4").astype(
+                np.uint32
+            )
+        else:
+            difficulty_host = np.frombuffer(difficulty_bytes, dtype=np.uint8)
+
+        event = cl.enqueue_copy(
+            self.state.queue,
+            self.state.difficulty_buf,
+            difficulty_host,
+            is_blocking=False,
         )
+        # Queued behind the batches in flight, it must not be waited for here
+        self.state.keep(difficulty_host, event)
 
-    def _new_problem(self, private_key_a: int, difficulty: int):
-        self.round = 1
+    def _needs_init(self, private_key_a: int) -> bool:
+        # Difficulty-only changes keep walking the lanes of the current problem
+        return self.state is None or private_key_a != self.private_key_a
+
+    def _new_problem(
+        self,
+        private_key_a: int,
+        difficulty: int,
+        base_point: tuple[int, int, int] | None = None,
+    ):
+        if not self._needs_init(private_key_a):
+            self._set_difficulty(difficulty)
+            return
+
+        private_key_b, x, y = base_point or self._base_point(private_key_a)
 
+        self.round = 1
+        self.batch = 0
         self.private_key_a = private_key_a
-        self.private_key_b = int(secrets.token_hex(32), base=16)
+        self.private_key_b = private_key_b
 
-        self.difficulty_buf = cl.Buffer(
-            self.ctx,
-            cl.mem_flags.READ_ONLY | cl.mem_flags.COPY_HOST_PTR,
-            hostbuf=np.frombuffer(
-                difficulty.to_bytes(20, byteorder="big"), dtype=np.uint8
-            ),
-        )
-        x, y = private_key_to_ec_point(
-            add_private_key(self.private_key_a, self.private_key_b)
-        )
+        # Previous state keeps draining on its own queue
+        self.state_idx = (self.state_idx + 1) % len(self.states)
+        self.state = self.states[self.state_idx]
+        self._set_difficulty(difficulty)
 
-        self.program.profanity_init(
-            self.queue,
+        init = self.program.profanity_init(
+            self.state.queue,
             (self.size,),
             None,
             self.precomp_buf,
-            self.p_delta_x_buf,
-            self.p_prev_lambda_buf,
+            self.state.p_delta_x_buf,
+            self.state.p_prev_lambda_buf,
             int_to_ulong4(x),
             int_to_ulong4(y),
         )
+        self.commands = [("profanity_init", init)]
+
+    def _retire(self, in_flight: deque, state: LaneState | None = None):
+        """
+        Drop batches in flight without blocking, their readbacks complete on
+        the lane state they were enqueued on
+        """
+        state = state or self.state
+        for _, host_result, event in in_flight:
+            state.keep(host_result, event)
+        in_flight.clear()
 
     def _mine_iteration(self):
-        self.round += 1
-        self.program.profanity_inverse(
-            self.queue,
-            (self.size // INVERSE_SIZE,),
-            None,
-            self.p_delta_x_buf,
-            self.p_inverse_buf,
-            self.p_result_buf,
-        )
-        self.program.profanity_iterate(
-            self.queue,
-            (self.size,),
-            None,
-            self.p_delta_x_buf,
-            self.p_inverse_buf,
-            self.p_prev_lambda_buf,
+        """
+        Enqueue a batch of rounds and a single non-blocking readback of its result.
+        Returns (first_round, host_result, event) for the batch in flight.
+        """
+        for lane_state in self.states:
+            lane_state.release_completed()
+
+        state = self.state
+        batch = self.batch
+        slot = batch % self.pipeline_depth
+        self.batch += 1
+        p_result_buf = state.p_result_bufs[slot]
+        host_result = state.host_results[slot]
+        result_capacity = np.uint32(state.result_capacity)
+        first_round = self.round + 1
+
+        commands, self.commands = self.commands, []
+        commands.append(
+            (
+                "fill_result",
+                cl.enqueue_fill_buffer(state.queue, p_result_buf, np.uint32(0), 0, 4),
+            )
         )
-        self.program.score(
-            self.queue,
-            (self.size,),
-            None,
-            self.p_inverse_buf,
-            self.p_result_buf,
-            self.difficulty_buf,
+        for round_offset in range(self.batch_size):
+            self.round += 1
+            inverse = self.program.profanity_inverse(
+                state.queue,
+                (self.size // self.inverse_size,),
+                None,
+                state.p_delta_x_buf,
+                state.p_inverse_buf,
+            )
+            commands.append(("profanity_inverse", inverse))
+            if self.fused_score:
+                iterate = self.program.profanity_iterate_score(
+                    state.queue,
+                    (self.size,),
+                    None,
+                    state.p_delta_x_buf,
+                    state.p_inverse_buf,
+                    state.p_prev_lambda_buf,
+                    p_result_buf,
+                    result_capacity,
+                    state.difficulty_buf,
+                    np.uint32(round_offset),
+                )
+                commands.append(("profanity_iterate_score", iterate))
+                continue
+
+            iterate = self.program.profanity_iterate(
+                state.queue,
+                (self.size,),
+                None,
+                state.p_delta_x_buf,
+                state.p_inverse_buf,
+                state.p_prev_lambda_buf,
+            )
+            score = self.program.score(
+                state.queue,
+                (self.size,),
+                None,
+                state.p_inverse_buf,
+                p_result_buf,
+                result_capacity,
+                state.difficulty_buf,
+                np.uint32(round_offset),
+            )
+            commands += [("profanity_iterate", iterate), ("score", score)]
+
+        event = cl.enqueue_copy(
+            state.queue, host_result, p_result_buf, is_blocking=False
         )
+        if self.profiler is not None:
+            commands.append(("read_result", event))
+            self.profiler.add(batch, self.state_idx, commands)
+        # Flush to ensure the batch is submitted
+        state.queue.flush()
+        return first_round, host_result, event
+
+    def _grow_results(self, num_found: int):
+        capacity = self.states[0].result_capacity
+        while capacity < min(2 * num_found, MAX_RESULT_CAPACITY):
+            capacity *= 2
+        capacity = min(capacity, MAX_RESULT_CAPACITY)
+
+        for state in self.states:
+            if state.result_capacity < capacity:
+                state.allocate_results(capacity)
 
-    async def _process_result(self):
-        round = self.round  # we copy round, because it can be changed async
-        host_result = np.zeros(1, dtype=t.RESULT)
-        await async_enqueue_copy(self.queue, host_result, self.p_result_buf)
+    def _process_result(self, first_round: int, host_result: np.ndarray) -> list[int]:
+        num_found, found = host_result[0]
+        num_found = int(num_found)
 
-        num_results, idxs = host_result[0]
-        for idx in idxs[:num_results]:
-            key_parts = np.zeros(4, dtype=np.uint64)
-            key_parts[0] = np.uint64(round + 1)
-            key_parts[1] = np.uint64(1 + (key_parts[0] < round))
-            key_parts[2] = np.uint64(1 + (key_parts[1] == 0))
-            key_parts[3] = np.uint64(1 + (key_parts[2] == 0) + idx)
-            private_key_b_delta = int(
-                "".join(f"{part:016x}" for part in reversed(key_parts)), base=16
+        if num_found > len(found):
+            # Rounds are gone, only the next batches can be saved
+            self.overflows += num_found - len(found)
+            self._grow_results(num_found)
+
+        if self.profiler is not None:
+            self.profiler.collect()
+
+        self.rounds += self.batch_size
+        self.solutions += num_found
+
+        found = found[:num_found]
+        if not self.endomorphism:
+            return decode_private_keys(self.private_key_b, first_round, found)
+
+        variants = (found["foundId"] >> t.VARIANT_SHIFT).tolist()
+        found = found.copy()
+        found["foundId"] &= (1 << t.VARIANT_SHIFT) - 1
+        return [
+            variant_private_key_b(self.private_key_a, private_key_b, variant)
+            for private_key_b, variant in zip(
+                decode_private_keys(self.private_key_b, first_round, found), variants
             )
-            yield add_private_key(private_key_b_delta, self.private_key_b)
+        ]
 
     async def get_solutions(self, private_key_a: int, difficulty: int):
-        self._reset_speed()
-        self._new_problem(private_key_a, difficulty)
+        switch_start = time.monotonic()
+        self.mining += 1
+        self._start_speed()
 
-        while True:
-            self._mine_iteration()
-            async for solution in self._process_result():
-                yield solution
-            self._speed_sample(self.size)
+        state = None
+        # Next batches are queued while previous one is being read back
+        in_flight = deque()
+        try:
+            base_point = None
+            if self._needs_init(private_key_a):
+                base_point = await asyncio.to_thread(self._base_point, private_key_a)
+            self._new_problem(private_key_a, difficulty, base_point)
+            state = self.state
+
+            while True:
+                while len(in_flight) < self.pipeline_depth:
+                    in_flight.append(self._mine_iteration())
+                    if switch_start is not None:
+                        self.switch_latency.observe(time.monotonic() - switch_start)
+                        switch_start = None
+
+                # Left in flight until read back, a cancel retires it with the others
+                first_round, host_result, event = in_flight[0]
+                await event_to_future(event)
+                in_flight.popleft()
+                for solution in self._process_result(first_round, host_result):
+                    yield solution
+                self._speed_sample(self.size * self.batch_size * self.variants)
+        finally:
+            # Next problem may be on another lane state already
+            self._retire(in_flight, state)
+            self.mining -= 1
+            if not self.mining:
+                self._stop_speed()
 
     @property
     def mining_speed(self):
         return self.speed()
 
+    @property
+    def hashes(self):
+        return self.speed_meter.total
+
+
+def per_device_options(device_options: dict, device_idx: int) -> dict:
+    """
+    Options given as a list are applied per device (by device index),
+    scalar options are shared by all devices.
+    """
+    return {
+        name: (
+            value[device_idx % len(value)]
+            if isinstance(value, (list, tuple))
+            else value
+        )
+        for name, value in device_options.items()
+    }
+
 
 class OpenCLSolver(BaseSolver):
-    def __init__(self):
-        self.devices = [
-            Device(device)
+    def __init__(self, autotune=False, threaded=False, **device_options):
+        cl_devices = [
+            device
             for platform in cl.get_platforms()
             for device in platform.get_devices()
         ]
 
+        # Tune devices we have never seen, profile is picked up by Device
+        if autotune:
+            for device in cl_devices:
+                if load_profile(device) is None:
+                    tune_device(device)
+
+        # Devices are set up in parallel, mostly to build programs concurrently,
+        # the precomputed table is loaded next to the builds
+        with ThreadPoolExecutor(max_workers=len(cl_devices) + 1) as executor:
+            executor.submit(load_g_precomp)
+            self.devices = list(
+                executor.map(
+                    lambda device_idx, device: Device(
+                        device, **per_device_options(device_options, device_idx)
+                    ),
+                    range(len(cl_devices)),
+                    cl_devices,
+                )
+            )
+
+        # Each device gets its own thread with its own command queue loop
+        if threaded:
+            self.devices = [DeviceWorker(device) for device in self.devices]
+
     async def get_solutions(self, private_key_a, difficulty):
         async for solution in async_merge(
             *[
@@ -186,3 +514,104 @@ class OpenCLSolver(BaseSolver):
 
     def get_speed(self):
         return sum(device.mining_speed for device in self.devices)
+
+    def get_stats(self):
+        stats = {}
+        for device_idx, device in enumerate(self.devices):
+            speed = device.speed_stats()
+            window = SpeedSamplerMixin.SPEED_EXTREMES_WINDOW
+            stats[f"hashrate gpu{device_idx}"] = (
+                f"{format_hashrate(speed['speed'])}"
+                f" (ewma {format_hashrate(speed['ewma'])},"
+                f" {window:.0f}s min {format_hashrate(speed['min'])}"
+                f" max {format_hashrate(speed['max'])})"
+            )
+            if device.speed_stalled():
+                stats[f"stalled gpu{device_idx}"] = (
+                    f"no batch for over {SpeedSamplerMixin.SPEED_STALL_AFTER:.0f}s"
+                )
+            stats[f"switch latency gpu{device_idx}"] = device.switch_latency
+            if device.overflows:
+                stats[f"dropped solutions gpu{device_idx}"] = device.overflows
+            if device.profiler is not None:
+                for name, value in device.profiler.get_stats().items():
+                    stats[f"{name} gpu{device_idx}"] = value
+        return stats
+
+    def get_metrics(self):
+        for device_idx, device in enumerate(self.devices):
+            labels = {"device": f"gpu{device_idx}", "name": device.name}
+            speed = device.speed_stats()
+            yield Sample(
+                "infinity_hashrate",
+                "gauge",
+                "Hashes per second",
+                speed["speed"],
+                labels,
+            )
+            yield Sample(
+                "infinity_hashrate_ewma",
+                "gauge",
+                "Exponentially weighted average of hashes per second",
+                speed["ewma"],
+                labels,
+            )
+            yield Sample(
+                "infinity_device_hashes_total",
+                "counter",
+                "Hashes computed",
+                device.hashes,
+                labels,
+            )
+            yield Sample(
+                "infinity_device_stalled",
+                "gauge",
+                "1 while the device is mining but hasn't finished a batch lately",
+                int(device.speed_stalled()),
+                labels,
+            )
+            yield Sample(
+                "infinity_device_rounds_total",
+                "counter",
+                "Rounds completed",
+                device.rounds,
+                labels,
+            )
+            yield Sample(
+                "infinity_device_solutions_total",
+                "counter",
+                "Solutions found, including dropped ones",
+                device.solutions,
+                labels,
+            )
+            yield Sample(
+                "infinity_device_dropped_solutions_total",
+                "counter",
+                "Solutions dropped because the result buffer overflowed",
+                device.overflows,
+                labels,
+            )
+            yield Sample(
+                "infinity_device_switch_latency_seconds",
+                "histogram",
+                "Seconds from problem arrival until its first batch is submitted",
+                device.switch_latency,
+                labels,
+            )
+            if device.profiler is None:
+                continue
+            for kernel_name, kernel in list(device.profiler.kernels.items()):
+                yield Sample(
+                    "infinity_kernel_seconds",
+                    "histogram",
+                    "Seconds per command of sampled batches",
+                    kernel,
+                    {**labels, "kernel": kernel_name},
+                )
+            yield Sample(
+                "infinity_kernel_host_gap_seconds",
+                "histogram",
+                "Seconds the device is idle between consecutive batches",
+                device.profiler.gap,
+                labels,
+            )
@@ -0,0 +1,161 @@
+import logging
+import multiprocessing
+import secrets
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pyopencl as cl
+
+from . import profanity_types as t
+from .cache import cache_path, device_id, read_json, source_hash, write_json
+from .constants import OPENCL_PROGRAM
+
+logger = logging.getLogger(__name__)
+
+PROFILES_FILE = "profiles.json"
+
+INVERSE_SIZES = (63, 127, 255, 511)
+INVERSE_MULTIPLES = tuple(2**i for i in range(8, 17))  # 256 .. 65536
+
+# Share of global memory lane buffers (and spilled private memory) may use
+MAX_GLOBAL_MEM_SHARE = 0.8
+# Candidates which don't improve hashrate by this much stop the sweep
+MIN_IMPROVEMENT = 1.03
+
+
+def profile_key(device: cl.Device) -> str:
+    return f"{device_id(device)} / {source_hash(OPENCL_PROGRAM)[:16]}"
+
+
+def load_profile(device: cl.Device) -> dict | None:
+    return read_json(cache_path(PROFILES_FILE)).get(profile_key(device))
+
+
+def save_profile(device: cl.Device, profile: dict):
+    path = cache_path(PROFILES_FILE)
+    profiles = read_json(path)
+    profiles[profile_key(device)] = profile
+    write_json(path, profiles)
+
+
+def fits_global_memory(device: cl.Device, inverse_size: int, inverse_multiple: int):
+    lanes_buf_size = inverse_size * inverse_multiple * t.MP_NUMBER.itemsize
+    if lanes_buf_size > device.max_mem_alloc_size:
+        return False
+
+    # pDeltaX, pPrevLambda, pInverse + buffer/buffer2 of profanity_inverse,
+    # once more for the spare lane state of a problem switch
+    private_size = 2 * inverse_size * t.MP_NUMBER.itemsize * inverse_multiple
+    total_size = 2 * (3 * lanes_buf_size + private_size)
+    return total_size <= device.global_mem_size * MAX_GLOBAL_MEM_SHARE
+
+
+def device_index(device: cl.Device) -> tuple[int, int]:
+    for platform_idx, platform in enumerate(cl.get_platforms()):
+        for device_idx, platform_device in enumerate(platform.get_devices()):
+            if platform_device == device:
+                return platform_idx, device_idx
+    raise ValueError(f"Unknown device {device_id(device)}")
+
+
+def measure(
+    device_idx: tuple[int, int],
+    inverse_size: int,
+    inverse_multiple: int,
+    duration: float,
+) -> float:
+    """
+    Mine a problem without solutions on the device and return hashrate (H/s)
+    """
+    from . import Device
+
+    platform_idx, device_idx = device_idx
+    device = cl.get_platforms()[platform_idx].get_devices()[device_idx]
+
+    miner = Device(
+        device,
+        pipeline_depth=1,
+        inverse_size=inverse_size,
+        inverse_multiple=inverse_multiple,
+        lane_states=1,
+    )
+
+    private_mem_size = miner.program.profanity_inverse.get_work_group_info(
+        cl.kernel_work_group_info.PRIVATE_MEM_SIZE, device
+    )
+    if private_mem_size * inverse_multiple > device.global_mem_size * (
+        1 - MAX_GLOBAL_MEM_SHARE
+    ):
+        return 0.0
+
+    miner._new_problem(int(secrets.token_hex(32), base=16), 0)
+
+    # First round includes init and warm-up, it's not measured
+    _, _, event = miner._mine_iteration()
+    event.wait()
+
+    miner._reset_speed()
+    t_end = time.monotonic() + duration
+    while time.monotonic() < t_end:
+        _, _, event = miner._mine_iteration()
+        event.wait()
+        miner._speed_sample(miner.size * miner.batch_size * miner.variants)
+
+    return miner.mining_speed
+
+
+def measure_isolated(*args) -> float:
+    """
+    Run measure in a fresh process, so a driver crash on too big
+    configuration doesn't take the miner down
+    """
+    with ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        return executor.submit(measure, *args).result()
+
+
+def tune_device(device: cl.Device, duration: float = 5.0) -> dict:
+    """
+    Sweep inverse size / multiple for the device, persist and return the best one.
+    For each inverse size the grid grows until hashrate stops improving.
+    """
+    logger.info(f"Autotuning {device_id(device)}")
+    idx = device_index(device)
+
+    best = {"inverse_size": None, "inverse_multiple": None, "hashrate": 0.0}
+    for inverse_size in INVERSE_SIZES:
+        size_best = 0.0
+        for inverse_multiple in INVERSE_MULTIPLES:
+            if not fits_global_memory(device, inverse_size, inverse_multiple):
+                break
+
+            try:
+                hashrate = measure_isolated(
+                    idx, inverse_size, inverse_multiple, duration
+                )
+            except (cl.Error, BrokenProcessPool) as e:
+                logger.info(f"├ {inverse_size} x {inverse_multiple}: failed - {e}")
+                break
+            logger.info(f"├ {inverse_size} x {inverse_multiple}: {hashrate:,.0f} H/s")
+
+            if hashrate > best["hashrate"]:
+                best = {
+                    "inverse_size": inverse_size,
+                    "inverse_multiple": inverse_multiple,
+                    "hashrate": hashrate,
+                }
+            if hashrate < size_best * MIN_IMPROVEMENT:
+                break
+            size_best = hashrate
+
+    if best["inverse_size"] is None:
+        raise RuntimeError(f"No suitable configuration for {device_id(device)}")
+
+    logger.info(
+        f"└ best: {best['inverse_size']} x {best['inverse_multiple']} "
+        f"({best['hashrate']:,.0f} H/s)"
+    )
+    save_profile(device, best)
+    return best
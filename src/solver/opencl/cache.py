@@ -0,0 +1,44 @@
+import hashlib
+import json
+import os
+
+import pyopencl as cl
+
+CACHE_DIR = os.path.expanduser(
+    os.getenv("INFINITY_CACHE_DIR", "~/.cache/8infinity-miner")
+)
+
+
+def source_hash(source: str | bytes) -> str:
+    if isinstance(source, str):
+        source = source.encode()
+    return hashlib.sha256(source).hexdigest()
+
+
+def device_id(device: cl.Device) -> str:
+    """
+    Human readable identity of a device and the driver it runs on
+    """
+    return f"{device.platform.name} / {device.name} / {device.driver_version}"
+
+
+def cache_path(*parts: str) -> str:
+    path = os.path.join(CACHE_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def read_json(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_json(path: str, data: dict):
+    # Write to temporary file first, so concurrent readers never see partial file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp_path, path)
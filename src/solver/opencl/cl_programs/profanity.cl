@@ -415,9 +415,17 @@ void point_add(point * const r, point * const p, point * const o) {
 /* ------------------------------------------------------------------------ */
 /* Profanity.                                                               */
 /* ------------------------------------------------------------------------ */
+typedef struct {
+	uint round;
+	uint foundId;
+} found;
+
+// Solutions of a whole batch of rounds, numFound is reset by the host before a batch.
+// found holds maxFound entries (sized by the host), numFound keeps counting past it
+// so the host can detect an overflow and grow the buffer.
 typedef struct {
 	uint numFound;
-	uint foundId[MAX_SOLUTIONS];
+	found found[];
 } result;
 
 void profanity_init_seed(__global const point * const precomp, point * const p, bool * const pIsFirst, const size_t precompOffset, const ulong seed) {
@@ -494,8 +502,7 @@ __kernel void profanity_init(__global const point * const precomp, __global mp_n
 // My RX 480 is very sensitive to changes in the second loop and sometimes I have
 // to make seemingly non-functional changes to the code to make the compiler
 // generate the most optimized version.
-__kernel void profanity_inverse(__global const mp_number * const pDeltaX, __global mp_number * const pInverse, __global result * const pResult) {
-	pResult->numFound = 0;
+__kernel void profanity_inverse(__global const mp_number * const pDeltaX, __global mp_number * const pInverse) {
 	const size_t id = get_global_id(0) * PROFANITY_INVERSE_SIZE;
 
 	// negativeDoubleGy = 0x6f8a4b11b2b8773544b60807e3ddeeae05d0976eb2f557ccc7705edf09de52bf
@@ -604,20 +611,16 @@ __kernel void profanity_inverse(__global const mp_number * const pDeltaX, __glob
 // in hopes that using constant storage instead of private storage
 // will aid speeds.
 //
-// After the above point addition this kernel calculates the public address
-// corresponding to the point and stores it in pInverse which is used only
-// as interim storage as it won't otherwise be used again this cycle.
+// After the above point addition profanity_step calculates the public address
+// corresponding to the point. profanity_iterate stores it in pInverse which is
+// used only as interim storage as it won't otherwise be used again this cycle.
 //
 // One of the scoring kernels will run after this and fetch the address
-// from pInverse.
-__kernel void profanity_iterate(__global mp_number * const pDeltaX, __global mp_number * const pInverse, __global mp_number * const pPrevLambda) {
-	const size_t id = get_global_id(0);
-
+// from pInverse, unless the fused profanity_iterate_score kernel is used.
+void profanity_step_point(__global mp_number * const pDeltaX, __global mp_number * const pInverse, __global mp_number * const pPrevLambda, const size_t id, mp_number * const x, mp_number * const y) {
 	// negativeGx = 0x8641998106234453aa5f9d6a3178f4f8fd640324d231d726a60d7ea3e907e497
 	mp_number negativeGx = { {0xe907e497, 0xa60d7ea3, 0xd231d726, 0xfd640324, 0x3178f4f8, 0xaa5f9d6a, 0x06234453, 0x86419981 } };
 
-	ethhash h = { { 0 } };
-
 	mp_number dX = pDeltaX[id];
 	mp_number tmp = pInverse[id];
 	mp_number lambda = pPrevLambda[id];
@@ -641,28 +644,46 @@ __kernel void profanity_iterate(__global mp_number * const pDeltaX, __global mp_
 	mp_mod_sub_const(&tmp, &negativeGy, &tmp);
 
 	// Restore X coordinate from delta value
-	mp_mod_sub(&dX, &dX, &negativeGx);
+	mp_mod_sub(x, &dX, &negativeGx);
+	*y = tmp;
+}
 
+// Keccak of a public key, h must be zeroed
+void profanity_hash(const mp_number * const x, const mp_number * const y, ethhash * const h) {
 	// Initialize Keccak structure with point coordinates in big endian
-	h.d[0] = bswap32(dX.d[MP_WORDS - 1]);
-	h.d[1] = bswap32(dX.d[MP_WORDS - 2]);
-	h.d[2] = bswap32(dX.d[MP_WORDS - 3]);
-	h.d[3] = bswap32(dX.d[MP_WORDS - 4]);
-	h.d[4] = bswap32(dX.d[MP_WORDS - 5]);
-	h.d[5] = bswap32(dX.d[MP_WORDS - 6]);
-	h.d[6] = bswap32(dX.d[MP_WORDS - 7]);
-	h.d[7] = bswap32(dX.d[MP_WORDS - 8]);
-	h.d[8] = bswap32(tmp.d[MP_WORDS - 1]);
-	h.d[9] = bswap32(tmp.d[MP_WORDS - 2]);
-	h.d[10] = bswap32(tmp.d[MP_WORDS - 3]);
-	h.d[11] = bswap32(tmp.d[MP_WORDS - 4]);
-	h.d[12] = bswap32(tmp.d[MP_WORDS - 5]);
-	h.d[13] = bswap32(tmp.d[MP_WORDS - 6]);
-	h.d[14] = bswap32(tmp.d[MP_WORDS - 7]);
-	h.d[15] = bswap32(tmp.d[MP_WORDS - 8]);
-	h.d[16] ^= 0x01; // length 64
-
-	sha3_keccakf(&h);
+	h->d[0] = bswap32(x->d[MP_WORDS - 1]);
+	h->d[1] = bswap32(x->d[MP_WORDS - 2]);
+	h->d[2] = bswap32(x->d[MP_WORDS - 3]);
+	h->d[3] = bswap32(x->d[MP_WORDS - 4]);
+	h->d[4] = bswap32(x->d[MP_WORDS - 5]);
+	h->d[5] = bswap32(x->d[MP_WORDS - 6]);
+	h->d[6] = bswap32(x->d[MP_WORDS - 7]);
+	h->d[7] = bswap32(x->d[MP_WORDS - 8]);
+	h->d[8] = bswap32(y->d[MP_WORDS - 1]);
+	h->d[9] = bswap32(y->d[MP_WORDS - 2]);
+	h->d[10] = bswap32(y->d[MP_WORDS - 3]);
+	h->d[11] = bswap32(y->d[MP_WORDS - 4]);
+	h->d[12] = bswap32(y->d[MP_WORDS - 5]);
+	h->d[13] = bswap32(y->d[MP_WORDS - 6]);
+	h->d[14] = bswap32(y->d[MP_WORDS - 7]);
+	h->d[15] = bswap32(y->d[MP_WORDS - 8]);
+	h->d[16] ^= 0x01; // length 64
+
+	sha3_keccakf(h);
+}
+
+void profanity_step(__global mp_number * const pDeltaX, __global mp_number * const pInverse, __global mp_number * const pPrevLambda, const size_t id, ethhash * const h) {
+	mp_number x, y;
+
+	profanity_step_point(pDeltaX, pInverse, pPrevLambda, id, &x, &y);
+	profanity_hash(&x, &y, h);
+}
+
+__kernel void profanity_iterate(__global mp_number * const pDeltaX, __global mp_number * const pInverse, __global mp_number * const pPrevLambda) {
+	const size_t id = get_global_id(0);
+	ethhash h = { { 0 } };
+
+	profanity_step(pDeltaX, pInverse, pPrevLambda, id, &h);
 
 	// Save public address hash in pInverse, only used as interim storage until next cycle
 	pInverse[id].d[0] = h.d[3];
@@ -672,7 +693,7 @@ __kernel void profanity_iterate(__global mp_number * const pDeltaX, __global mp_
 	pInverse[id].d[4] = h.d[7];
 }
 
-__kernel void score(__global mp_number * const pInverse, __global result * const pResult,  __constant const uchar * const difficulty) {
+__kernel void score(__global mp_number * const pInverse, __global result * const pResult, const uint maxFound, __constant const uchar * const difficulty, const uint round) {
 	const size_t id = get_global_id(0);
 	__global const uchar * const hash = pInverse[id].d;
 
@@ -683,7 +704,74 @@ __kernel void score(__global mp_number * const pInverse, __global result * const
     }
 
 	uint index = atomic_inc(&pResult->numFound);
-	if (index < MAX_SOLUTIONS) {
-		pResult->foundId[index] = id;
+	if (index < maxFound) {
+		pResult->found[index].round = round;
+		pResult->found[index].foundId = id;
 	}
-}
\ No newline at end of file
+}
+
+#ifdef PROFANITY_FUSED_SCORE
+// difficulty holds the 20 difficulty bytes as five big endian words, comparing
+// big endian words is the same as comparing the bytes one by one.
+bool profanity_score_hash(const ethhash * const h, __constant const uint * const difficulty) {
+	for (int i = 0; i < 5; ++i) {
+		const uint word = bswap32(h->d[3 + i]) ^ 0x88888888;
+		if (word > difficulty[i]) return false;
+		else if (word < difficulty[i]) break;
+	}
+	return true;
+}
+
+void profanity_found(__global result * const pResult, const uint maxFound, const uint round, const uint foundId) {
+	uint index = atomic_inc(&pResult->numFound);
+	if (index < maxFound) {
+		pResult->found[index].round = round;
+		pResult->found[index].foundId = foundId;
+	}
+}
+
+#ifdef PROFANITY_ENDOMORPHISM
+// Cube root of unity mod p: (βx, y) is the point of λk when (x, y) is the one of k,
+// β² x = -x - βx. Together with negation (x, -y) <=> -k every point gives six keys.
+// beta = 0x7ae96a2b657c07106e64479eac3434e99cf0497512f58995c1396c28719501ee
+__constant const mp_number beta = { {0x719501ee, 0xc1396c28, 0x12f58995, 0x9cf04975, 0xac3434e9, 0x6e64479e, 0x657c0710, 0x7ae96a2b} };
+
+// Variant of a winner is kept in the high bits of foundId, the host maps it to
+// the private key: 0 k, 1 λk, 2 λ²k, 3 -k, 4 -λk, 5 -λ²k
+#define PROFANITY_VARIANT_SHIFT 29
+#endif
+
+// profanity_iterate followed by score, without the round trip of the address
+// through global memory. The address is compared while still in registers and
+// only winners touch pResult.
+__kernel void profanity_iterate_score(__global mp_number * const pDeltaX, __global mp_number * const pInverse, __global mp_number * const pPrevLambda, __global result * const pResult, const uint maxFound, __constant const uint * const difficulty, const uint round) {
+	const size_t id = get_global_id(0);
+
+#ifdef PROFANITY_ENDOMORPHISM
+	const mp_number zero = { {0} };
+	mp_number b = beta;
+	mp_number x[3], y[2];
+
+	profanity_step_point(pDeltaX, pInverse, pPrevLambda, id, &x[0], &y[0]);
+	mp_mod_mul(&x[1], &x[0], &b);
+	mp_mod_sub(&x[2], &zero, &x[0]);
+	mp_mod_sub(&x[2], &x[2], &x[1]);
+	mp_mod_sub(&y[1], &zero, &y[0]);
+
+	for (uint variant = 0; variant < 6; ++variant) {
+		ethhash h = { { 0 } };
+		profanity_hash(&x[variant % 3], &y[variant / 3], &h);
+		if (profanity_score_hash(&h, difficulty)) {
+			profanity_found(pResult, maxFound, round, (variant << PROFANITY_VARIANT_SHIFT) | id);
+		}
+	}
+#else
+	ethhash h = { { 0 } };
+
+	profanity_step(pDeltaX, pInverse, pPrevLambda, id, &h);
+	if (profanity_score_hash(&h, difficulty)) {
+		profanity_found(pResult, maxFound, round, id);
+	}
+#endif
+}
+#endif
@@ -1,29 +1,84 @@
 import json
-import numpy as np
+import logging
 import os
+import threading
+from functools import lru_cache
+
+import numpy as np
+from eth_keys.backends.native.ecdsa import G, fast_add, fast_multiply
 
 from . import profanity_types as t
+from .cache import cache_path
+
+logger = logging.getLogger(__name__)
 
 dirname = os.path.dirname(__file__)
 
+G_PRECOMP_JSON = os.path.join(dirname, "./cl_programs/g_precomp.json")
+# 4 words of 64 bits, 8 bytes per word, 255 non-zero values per byte
+G_PRECOMP_SIZE = 4 * 8 * 255
+# Devices set up in parallel must not generate the cache twice
+_g_precomp_lock = threading.Lock()
 
-def parse_hex_list(hex_array: list[str]) -> list[int]:
-    return [int(i, base=16) for i in hex_array]
 
+def g_precomp_from_json(path: str) -> np.ndarray:
+    with open(path) as f:
+        g_precomp = json.load(f)
 
-with open(os.path.join(dirname, "./cl_programs/g_precomp.json")) as f:
-    G_PRECOMP = np.array(
-        [
-            np.array(
-                (
-                    parse_hex_list(g_i[0]),
-                    parse_hex_list(g_i[1]),
-                ),
-                dtype=t.POINT,
-            )
-            for g_i in json.load(f)
-        ],
+    limbs = np.fromiter(
+        (int(limb, base=16) for g_i in g_precomp for coord in g_i for limb in coord),
+        dtype=np.uint32,
     )
+    return limbs.view(t.POINT)
+
+
+def g_precomp_from_curve() -> np.ndarray:
+    """
+    precomp[word * 8 * 255 + byte_idx * 255 + byte - 1] = (byte << (64 * word + 8 * byte_idx)) * G
+    """
+    limbs = bytearray()
+    for shift in range(0, 256, 8):
+        base = fast_multiply(G, 1 << shift)
+        point = base
+        for _ in range(255):
+            limbs += point[0].to_bytes(32, byteorder="little")
+            limbs += point[1].to_bytes(32, byteorder="little")
+            point = fast_add(point, base)
+
+    return np.frombuffer(limbs, dtype="<u4").astype(np.uint32).view(t.POINT)
+
+
+def load_g_precomp() -> np.ndarray:
+    """
+    Precomputed multiples of G in `point` layout, memory-mapped from the binary cache.
+    The cache is generated once from the shipped JSON (or from curve arithmetic).
+    """
+    with _g_precomp_lock:
+        return _load_g_precomp()
+
+
+@lru_cache
+def _load_g_precomp() -> np.ndarray:
+    path = cache_path("g_precomp.npy")
+    try:
+        g_precomp = np.load(path, mmap_mode="r")
+        if g_precomp.dtype == t.POINT and g_precomp.shape == (G_PRECOMP_SIZE,):
+            return g_precomp
+    except (OSError, ValueError):
+        pass
+
+    logger.info("Generating precomputed table cache")
+    if os.path.exists(G_PRECOMP_JSON):
+        g_precomp = g_precomp_from_json(G_PRECOMP_JSON)
+    else:
+        g_precomp = g_precomp_from_curve()
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, g_precomp)
+    os.replace(tmp_path, path)
+
+    return np.load(path, mmap_mode="r")
 
 
 with (
@@ -1,13 +1,25 @@
 import numpy as np
 
 MP_WORDS = 8
+# Initial capacity of a result buffer, grown when a batch overflows it
 MAX_SOLUTIONS = 100
+# Endomorphism kernels score six keys per point, foundId holds the variant above
+# this bit (PROFANITY_VARIANT_SHIFT)
+VARIANTS = 6
+VARIANT_SHIFT = 29
 
 MP_NUMBER = np.dtype([("mp_word", np.uint32, MP_WORDS)])
 POINT = np.dtype([("x", MP_NUMBER), ("y", MP_NUMBER)])
-RESULT = np.dtype(
-    [
-        ("numFound", np.uint32),
-        ("foundIds", np.uint32, MAX_SOLUTIONS),
-    ]
-)
+FOUND = np.dtype([("round", np.uint32), ("foundId", np.uint32)])
+
+
+def result_dtype(capacity: int) -> np.dtype:
+    return np.dtype(
+        [
+            ("numFound", np.uint32),
+            ("found", FOUND, capacity),
+        ]
+    )
+
+
+RESULT = result_dtype(MAX_SOLUTIONS)
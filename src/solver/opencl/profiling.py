@@ -0,0 +1,177 @@
+"""
+Sampled timing of the commands a Device enqueues, read from OpenCL profiling
+events: per kernel durations, their share of the batch and the time the device
+sits idle between batches.
+
+Only every n-th batch keeps its events and reads their timestamps, so it can
+stay on in production. The queues still have to be created with profiling
+enabled, which is the only cost for batches that are not sampled.
+"""
+
+from collections import defaultdict, deque
+
+import pyopencl as cl
+
+from utils.stats import Histogram
+
+# Upper bounds (seconds) suited for kernels, from a few microseconds up
+KERNEL_BUCKETS = (
+    0.000005,
+    0.00001,
+    0.000025,
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+)
+# Consecutive batches sampled at a time, the gap is measured between them
+PROFILE_BURST = 2
+# Commands kept for the Chrome trace, oldest are dropped
+TRACE_COMMANDS = 20_000
+# Commands run once per problem, not part of the share of a batch
+PROBLEM_COMMANDS = ("profanity_init",)
+
+
+class ProfiledBatch:
+    def __init__(self, batch: int, lane: int, commands: list[tuple[str, cl.Event]]):
+        self.batch = batch
+        self.lane = lane
+        self.commands = commands
+
+
+class KernelProfiler:
+    """
+    Per kernel statistics of sampled batches, collected once their readback is done
+    """
+
+    def __init__(self, every: int):
+        self.every = max(1, every)
+
+        self.kernels: dict[str, Histogram] = {}
+        # Seconds spent in each kernel and from first start to last end of batches
+        self.busy: dict[str, float] = defaultdict(float)
+        self.span = 0.0
+        # Seconds the device is idle between consecutive batches of a lane
+        self.gap = Histogram(KERNEL_BUCKETS)
+        # (name, lane, batch, queued, submit, start, end) in device nanoseconds
+        self.trace: deque[tuple[str, int, int, int, int, int, int]] = deque(
+            maxlen=TRACE_COMMANDS
+        )
+
+        self.pending: deque[ProfiledBatch] = deque()
+        # Batch, lane and end of the last collected batch
+        self.previous: tuple[int, int, int] | None = None
+
+    def sampled(self, batch: int) -> bool:
+        return batch % self.every < PROFILE_BURST
+
+    def add(self, batch: int, lane: int, commands: list[tuple[str, cl.Event]]):
+        if self.sampled(batch):
+            self.pending.append(ProfiledBatch(batch, lane, commands))
+
+    def collect(self):
+        """
+        Read timestamps of the sampled batches that are done, in enqueue order
+        """
+        while self.pending:
+            _, last_event = self.pending[0].commands[-1]
+            if (
+                last_event.command_execution_status
+                != cl.command_execution_status.COMPLETE
+            ):
+                return
+            self._observe(self.pending.popleft())
+
+    def _observe(self, batch: ProfiledBatch):
+        first_start = None
+        last_end = None
+        for name, event in batch.commands:
+            profile = event.profile
+            queued, submit, start, end = (
+                profile.queued,
+                profile.submit,
+                profile.start,
+                profile.end,
+            )
+            kernel = self.kernels.get(name)
+            if kernel is None:
+                kernel = self.kernels[name] = Histogram(KERNEL_BUCKETS)
+            kernel.observe((end - start) / 1e9)
+            self.trace.append(
+                (name, batch.lane, batch.batch, queued, submit, start, end)
+            )
+            if name in PROBLEM_COMMANDS:
+                continue
+
+            self.busy[name] += (end - start) / 1e9
+            first_start = start if first_start is None else min(first_start, start)
+            last_end = end if last_end is None else max(last_end, end)
+
+        self.span += (last_end - first_start) / 1e9
+        if self.previous is not None:
+            previous_batch, previous_lane, previous_end = self.previous
+            if previous_batch == batch.batch - 1 and previous_lane == batch.lane:
+                self.gap.observe(max(0, first_start - previous_end) / 1e9)
+        self.previous = (batch.batch, batch.lane, last_end)
+
+    def get_stats(self) -> dict[str, str]:
+        stats = {}
+        # Copied first, a device thread may add kernels meanwhile
+        for name, kernel in list(self.kernels.items()):
+            stats[name] = (
+                f"mean={kernel.sum / kernel.count * 1e6:.0f}us"
+                f" p50<={kernel.quantile(0.5) * 1e6:.0f}us"
+                f" p99<={kernel.quantile(0.99) * 1e6:.0f}us"
+            )
+            if name in self.busy and self.span:
+                stats[name] += f" share={self.busy[name] / self.span:.1%}"
+        if self.gap.count:
+            stats["host gap"] = (
+                f"mean={self.gap.sum / self.gap.count * 1e6:.0f}us"
+                f" p99<={self.gap.quantile(0.99) * 1e6:.0f}us"
+            )
+        return stats
+
+
+def chrome_trace(profilers: dict[str, KernelProfiler]) -> dict:
+    """
+    Sampled commands as a Chrome trace (chrome://tracing, Perfetto), one process
+    per device and one thread per lane state
+    """
+    # Copied first, device threads may still append commands
+    traces = {device: list(profiler.trace) for device, profiler in profilers.items()}
+    starts = [start for trace in traces.values() for *_, start, _ in trace]
+    origin = min(starts, default=0)
+
+    events = []
+    for pid, (device, trace) in enumerate(traces.items()):
+        events.append(
+            {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": device}}
+        )
+        for name, lane, batch, queued, submit, start, end in trace:
+            events.append(
+                {
+                    "name": name,
+                    "ph": "X",
+                    "pid": pid,
+                    "tid": lane,
+                    "ts": (start - origin) / 1000,
+                    "dur": (end - start) / 1000,
+                    "args": {
+                        "batch": batch,
+                        "queued_us": (start - queued) / 1000,
+                        "submit_us": (start - submit) / 1000,
+                    },
+                }
+            )
+    return {"traceEvents": events, "displayTimeUnit": "ns"}
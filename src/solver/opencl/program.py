@@ -0,0 +1,72 @@
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+import pyopencl as cl
+
+from .cache import cache_path, device_id, source_hash
+from .constants import OPENCL_PROGRAM
+
+logger = logging.getLogger(__name__)
+
+# One lock per program variant, so devices needing the same binary build it once
+# while different variants are built in parallel
+_build_locks: defaultdict[str, threading.Lock] = defaultdict(threading.Lock)
+
+
+def build_options(
+    inverse_size: int, fused_score: bool = True, endomorphism: bool = False
+) -> list[str]:
+    options = [
+        "-D",
+        f"PROFANITY_INVERSE_SIZE={inverse_size}",
+    ]
+    if fused_score:
+        options += ["-D", "PROFANITY_FUSED_SCORE"]
+    if endomorphism:
+        options += ["-D", "PROFANITY_ENDOMORPHISM"]
+    return options
+
+
+def binary_key(device: cl.Device, options: list[str]) -> str:
+    return source_hash(
+        "\n".join([device_id(device), " ".join(options), source_hash(OPENCL_PROGRAM)])
+    )
+
+
+def build_program(
+    ctx: cl.Context,
+    device: cl.Device,
+    inverse_size: int,
+    fused_score: bool = True,
+    endomorphism: bool = False,
+) -> cl.Program:
+    """
+    Build profanity program for the device, reusing binary from the on-disk cache
+    """
+    options = build_options(inverse_size, fused_score, endomorphism)
+    key = binary_key(device, options)
+    path = cache_path("programs", f"{key}.bin")
+
+    with _build_locks[key]:
+        if os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    binary = f.read()
+                return cl.Program(ctx, [device], [binary]).build(options=options)
+            except cl.Error as e:
+                logger.info(f"Cached program for {device.name} is unusable - {e}")
+
+        t_start = time.time()
+        program = cl.Program(ctx, OPENCL_PROGRAM).build(options=options)
+        logger.info(f"Program for {device.name} built in {time.time() - t_start:.2f}s")
+
+        binary = program.get_info(cl.program_info.BINARIES)[0]
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(binary)
+        os.replace(tmp_path, path)
+
+        return program
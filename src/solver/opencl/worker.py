@@ -0,0 +1,161 @@
+import asyncio
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+STOP = object()
+PAUSE = object()
+
+
+class DeviceWorker:
+    """
+    Drives a Device from a dedicated thread, so driver calls never block the event loop.
+
+    Problem switches reach the thread as control messages, solutions are handed
+    back to the event loop with call_soon_threadsafe.
+    """
+
+    def __init__(self, device):
+        self.device = device
+        self.name = device.name
+        self.control = queue.SimpleQueue()
+        self.thread = threading.Thread(
+            target=self._run, name=f"opencl-{device.name}", daemon=True
+        )
+        self.thread.start()
+        atexit.register(self.close)
+
+    async def get_solutions(self, private_key_a: int, difficulty: int):
+        loop = asyncio.get_running_loop()
+        solutions = asyncio.Queue()
+
+        def deliver(batch: list[int] | Exception):
+            try:
+                loop.call_soon_threadsafe(solutions.put_nowait, batch)
+            except RuntimeError:
+                pass  # event loop is already closed
+
+        problem = (private_key_a, difficulty, deliver, time.monotonic())
+        self.control.put(problem)
+        try:
+            while True:
+                batch = await solutions.get()
+                # Thread gave up on the problem, the miner decides about a retry
+                if isinstance(batch, Exception):
+                    raise batch
+                for solution in batch:
+                    yield solution
+        finally:
+            # Generator may be finalized late, after a newer problem was sent
+            self.control.put((PAUSE, problem))
+
+    @property
+    def mining_speed(self):
+        return self.device.mining_speed
+
+    def speed_stats(self):
+        return self.device.speed_stats()
+
+    def speed_stalled(self):
+        return self.device.speed_stalled()
+
+    @property
+    def hashes(self):
+        return self.device.speed_meter.total
+
+    @property
+    def switch_latency(self):
+        return self.device.switch_latency
+
+    @property
+    def overflows(self):
+        return self.device.overflows
+
+    @property
+    def profiler(self):
+        return self.device.profiler
+
+    @property
+    def rounds(self):
+        return self.device.rounds
+
+    @property
+    def solutions(self):
+        return self.device.solutions
+
+    def close(self):
+        # Thread must leave driver calls before interpreter shutdown
+        self.control.put(STOP)
+        self.thread.join()
+
+    def _run(self):
+        device = self.device
+        problem = None
+        switch_start = None
+        in_flight = deque()
+
+        while True:
+            # Block while idle, otherwise only drain pending messages
+            target = problem
+            try:
+                message = self.control.get(block=problem is None)
+                while True:
+                    if message is STOP:
+                        target = STOP
+                        break
+                    if message[0] is PAUSE:
+                        if message[1] is target:
+                            target = None
+                    else:
+                        target = message
+                    message = self.control.get_nowait()
+            except queue.Empty:
+                pass
+
+            if target is STOP:
+                # Thread must not leave batches behind in the driver
+                device._retire(in_flight)
+                for state in device.states:
+                    for _, event in state.pending:
+                        event.wait()
+                return
+
+            try:
+                if target is not problem:
+                    # Batches of previous problem drain on their own, drop their results
+                    device._retire(in_flight)
+
+                    problem = target
+                    if problem is None:
+                        device._stop_speed()
+                        continue
+
+                    private_key_a, difficulty, deliver, switch_start = problem
+                    device._start_speed()
+                    device._new_problem(private_key_a, difficulty)
+
+                while len(in_flight) < device.pipeline_depth:
+                    in_flight.append(device._mine_iteration())
+                    if switch_start is not None:
+                        device.switch_latency.observe(time.monotonic() - switch_start)
+                        switch_start = None
+
+                first_round, host_result, event = in_flight.popleft()
+                event.wait()
+                solutions = device._process_result(first_round, host_result)
+                device._speed_sample(device.size * device.batch_size * device.variants)
+            except Exception as e:
+                logger.exception(f"Mining failed on {device.name}")
+                device._retire(in_flight)
+                problem = None
+                device._stop_speed()
+                deliver(e)
+                continue
+
+            if solutions:
+                deliver(solutions)
@@ -0,0 +1,38 @@
+import asyncio
+from typing import Awaitable
+
+from .base import BaseSolver
+
+
+class PendingSolver(BaseSolver):
+    """
+    Stands in for a solver that is still being built, so the miner can connect
+    and fetch the first problem meanwhile. Solutions start once it is ready.
+    """
+
+    def __init__(self, solver: Awaitable[BaseSolver]):
+        self.solver = asyncio.ensure_future(solver)
+
+    def _ready(self) -> BaseSolver | None:
+        if self.solver.done() and not self.solver.cancelled():
+            if self.solver.exception() is None:
+                return self.solver.result()
+        return None
+
+    async def get_solutions(self, private_key_a, difficulty):
+        solver = await self.solver
+        async for solution in solver.get_solutions(private_key_a, difficulty):
+            yield solution
+
+    def get_speed(self):
+        solver = self._ready()
+        return solver.get_speed() if solver is not None else 0.0
+
+    def get_stats(self):
+        solver = self._ready()
+        return solver.get_stats() if solver is not None else {}
+
+    def get_metrics(self):
+        solver = self._ready()
+        if solver is not None:
+            yield from solver.get_metrics()
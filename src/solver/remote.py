@@ -0,0 +1,198 @@
+"""
+Solver backed by worker processes on other rigs (or the same one), see worker.py.
+
+The coordinator runs the miner: problem feed, nonces and submissions stay in one
+place for the miner account, workers only run a solver. Messages are JSON lines
+over TCP, keys as hex strings:
+
+    worker -> coordinator  {"type": "hello", "name": ...}
+    coordinator -> worker  {"type": "problem", "problem": seq, "private_key_a": ..., "difficulty": ...}
+    coordinator -> worker  {"type": "pause"}
+    worker -> coordinator  {"type": "solution", "problem": seq, "private_key_b": ...}
+    worker -> coordinator  {"type": "speed", "hashrate": ...}
+
+Problems are numbered by the coordinator, solutions of a replaced problem are
+dropped. Every solver starts a problem from its own random 256 bit key, so the
+walks of different workers don't overlap; a key found twice is reported once.
+"""
+
+import asyncio
+import json
+import logging
+
+from utils.metrics import Sample
+from .base import BaseSolver, format_hashrate
+
+# Seconds between hashrate reports of a worker
+SPEED_REPORT_INTERVAL = 1.0
+# Longest message accepted, problems and solutions are a few hundred bytes
+MAX_MESSAGE_SIZE = 1 << 16
+
+
+async def read_message(reader: asyncio.StreamReader) -> dict | None:
+    """
+    Next message, None once the connection is closed
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+def write_message(writer: asyncio.StreamWriter, message: dict):
+    writer.write(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+
+
+class RemoteWorker:
+    """
+    A connected worker as the coordinator sees it
+    """
+
+    def __init__(self, name: str, peer: str, writer: asyncio.StreamWriter):
+        self.name = name
+        self.peer = peer
+        self.writer = writer
+        self.hashrate = 0.0
+        self.solutions = 0
+
+
+class CoordinatorSolver(BaseSolver):
+    """
+    Pushes every problem to all connected workers and merges their solutions.
+    Workers connecting mid-problem get the current one right away.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8556):
+        self.host = host
+        self.port = port
+        self.logger = logging.getLogger(self.__class__.__qualname__)
+
+        self.server: asyncio.Server | None = None
+        self.workers: dict[str, RemoteWorker] = {}
+        # Current problem and its solutions, None between problems
+        self.problem: dict | None = None
+        self.solutions: asyncio.Queue[int] | None = None
+        self.seen: set[int] = set()
+        self.problem_seq = 0
+        self.duplicates = 0
+
+    async def start(self):
+        if self.server is None:
+            self.server = await asyncio.start_server(
+                self._serve_worker, self.host, self.port, limit=MAX_MESSAGE_SIZE
+            )
+            self.logger.info(f"Waiting for workers on {self.host}:{self.port}")
+
+    async def _serve_worker(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        host, port = writer.get_extra_info("peername")[:2]
+        peer = f"{host}:{port}"
+        worker = None
+        try:
+            hello = await read_message(reader)
+            if hello is None or hello.get("type") != "hello":
+                return
+            worker = RemoteWorker(hello.get("name") or peer, peer, writer)
+            self.workers[peer] = worker
+            self.logger.info(f"Worker {worker.name} connected from {peer}")
+            if self.problem is not None:
+                write_message(writer, self.problem)
+
+            while (message := await read_message(reader)) is not None:
+                self._handle_message(worker, message)
+        except (ConnectionError, KeyError, ValueError) as e:
+            self.logger.info(f"Worker {peer} dropped - {e}")
+        finally:
+            if worker is not None:
+                del self.workers[peer]
+                self.logger.info(f"Worker {worker.name} disconnected")
+            writer.close()
+
+    def _handle_message(self, worker: RemoteWorker, message: dict):
+        if message["type"] == "speed":
+            worker.hashrate = float(message["hashrate"])
+            return
+
+        if message["type"] != "solution":
+            return
+        if self.problem is None or message["problem"] != self.problem["problem"]:
+            return
+        private_key_b = int(message["private_key_b"], base=16)
+        if private_key_b in self.seen:
+            self.duplicates += 1
+            return
+        self.seen.add(private_key_b)
+        worker.solutions += 1
+        self.solutions.put_nowait(private_key_b)
+
+    def _broadcast(self, message: dict):
+        for worker in self.workers.values():
+            # Only buffered, a slow worker doesn't hold up the others
+            write_message(worker.writer, message)
+
+    async def get_solutions(self, private_key_a, difficulty):
+        await self.start()
+
+        self.problem_seq += 1
+        problem = {
+            "type": "problem",
+            "problem": self.problem_seq,
+            "private_key_a": hex(private_key_a),
+            "difficulty": hex(difficulty),
+        }
+        solutions = asyncio.Queue()
+        self.problem, self.solutions, self.seen = problem, solutions, set()
+        self._broadcast(problem)
+
+        try:
+            while True:
+                yield await solutions.get()
+        finally:
+            # Pause workers, unless a newer problem is already out
+            if self.problem is problem:
+                self.problem = self.solutions = None
+                self._broadcast({"type": "pause"})
+
+    def get_speed(self):
+        return sum(worker.hashrate for worker in self.workers.values())
+
+    def get_stats(self):
+        stats: dict[str, object] = {"workers": len(self.workers)}
+        for worker in self.workers.values():
+            stats[f"hashrate {worker.name}"] = (
+                f"{format_hashrate(worker.hashrate)}, {worker.solutions} solutions"
+            )
+        return stats
+
+    def get_metrics(self):
+        yield Sample(
+            "infinity_workers", "gauge", "Connected workers", len(self.workers)
+        )
+        yield Sample(
+            "infinity_worker_duplicate_solutions_total",
+            "counter",
+            "Solutions reported again by a worker, dropped",
+            self.duplicates,
+        )
+        for worker in self.workers.values():
+            labels = {"worker": worker.name, "peer": worker.peer}
+            yield Sample(
+                "infinity_hashrate",
+                "gauge",
+                "Hashes per second",
+                worker.hashrate,
+                labels,
+            )
+            yield Sample(
+                "infinity_worker_solutions_total",
+                "counter",
+                "Solutions delivered by a worker",
+                worker.solutions,
+                labels,
+            )
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+            self.server = None
@@ -0,0 +1,60 @@
+from utils.stats import RateMeter
+
+
+class SpeedSamplerMixin:
+    # Ring of samples behind the windowed speed, kept across problem switches
+    SPEED_SAMPLER_NUM_SAMPLES = 4096
+    # Seconds the reported speed is averaged over
+    SPEED_WINDOW = 10.0
+    # Seconds the min/max speed is taken over
+    SPEED_EXTREMES_WINDOW = 60.0
+    # A running solver without samples for this many seconds reports no speed
+    SPEED_STALL_AFTER = 10.0
+
+    @property
+    def speed_meter(self) -> RateMeter:
+        if "_speed_meter" not in self.__dict__:
+            self._speed_meter = RateMeter(self.SPEED_SAMPLER_NUM_SAMPLES)
+        return self._speed_meter
+
+    def _speed_sample(self, n):
+        self.speed_meter.add(n)
+
+    def _start_speed(self):
+        """
+        Mark the solver as mining, samples taken before are kept
+        """
+        self.speed_meter.start()
+
+    def _stop_speed(self):
+        """
+        Mark the solver as idle, the time until the next start doesn't count
+        """
+        self.speed_meter.stop()
+
+    def _reset_speed(self):
+        """
+        Drop all samples and start measuring from now
+        """
+        self._speed_meter = RateMeter(self.SPEED_SAMPLER_NUM_SAMPLES)
+        self._speed_meter.start()
+
+    def speed(self, window: float | None = None) -> float:
+        if self.speed_stalled():
+            return 0.0
+        return self.speed_meter.rate(window or self.SPEED_WINDOW)
+
+    def speed_stalled(self) -> bool:
+        return self.speed_meter.stalled(self.SPEED_STALL_AFTER)
+
+    def speed_stats(self) -> dict[str, float]:
+        """
+        Windowed speed, EWMA and min/max for stats and metrics
+        """
+        low, high = self.speed_meter.extremes(self.SPEED_EXTREMES_WINDOW)
+        return {
+            "speed": self.speed(),
+            "ewma": self.speed_meter.ewma,
+            "min": low,
+            "max": high,
+        }
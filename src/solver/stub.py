@@ -1,3 +1,5 @@
+import asyncio
+
 from utils.ecdsa import get_account_ab
 from .base import BaseSolver
 
@@ -13,6 +15,8 @@ class StubSolver(BaseSolver):
                 yield private_key_b
 
             private_key_b += 1
+            # Gives the loop a turn, the stub never waits for anything else
+            await asyncio.sleep(0)
 
     def get_speed(self):
         return 0.0
@@ -12,18 +12,23 @@ async def async_merge(*async_iters: AsyncIterator[K]) -> AsyncIterator[K]:
     # Kick off one __anext__() call per iterator
     pending = {asyncio.create_task(it.__anext__()): it for it in async_iters}
 
-    while pending:
-        # Wait until at least one iterator yields (or raises StopAsyncIteration)
-        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+    try:
+        while pending:
+            # Wait until at least one iterator yields (or raises StopAsyncIteration)
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
 
-        for task in done:
-            it = pending.pop(task)
-            try:
-                item = task.result()
-            except StopAsyncIteration:
-                # that iterator is exhausted—don’t reschedule
-                continue
-            else:
-                # yield the item and schedule the next from this iterator
-                yield item
-                pending[asyncio.create_task(it.__anext__())] = it
+            for task in done:
+                it = pending.pop(task)
+                try:
+                    item = task.result()
+                except StopAsyncIteration:
+                    # that iterator is exhausted—don’t reschedule
+                    continue
+                else:
+                    # yield the item and schedule the next from this iterator
+                    yield item
+                    pending[asyncio.create_task(it.__anext__())] = it
+    finally:
+        # Stop the iterators we are not going to consume anymore
+        for task in pending:
+            task.cancel()
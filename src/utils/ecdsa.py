@@ -3,6 +3,19 @@ from eth_account import Account
 from eth_account.signers.local import LocalAccount
 from eth_keys.backends.native.ecdsa import G, fast_multiply
 
+# Endomorphism of secp256k1: λ(x, y) = (βx, y), β a cube root of unity mod p
+LAMBDA = 0x5363AD4CC05C30E0A5261C028812645A122E22EA20816678DF02967C1B23BD72
+# Factor of the private key per variant scored by the endomorphism kernels:
+# (x, y), (βx, y), (β²x, y), (x, -y), (βx, -y), (β²x, -y)
+VARIANT_FACTORS = (
+    1,
+    LAMBDA,
+    LAMBDA * LAMBDA % SECPK1_N,
+    SECPK1_N - 1,
+    SECPK1_N - LAMBDA,
+    SECPK1_N - LAMBDA * LAMBDA % SECPK1_N,
+)
+
 
 def add_private_key(private_key_a: int, private_key_b: int) -> int:
     return (private_key_a + private_key_b) % SECPK1_N
@@ -16,3 +29,11 @@ def get_account_ab(private_key_a: int, private_key_b: int) -> LocalAccount:
 
 def private_key_to_ec_point(private_key: int) -> tuple[int, int]:
     return fast_multiply(G, private_key)
+
+
+def variant_private_key_b(private_key_a: int, private_key_b: int, variant: int) -> int:
+    """
+    private_key_b whose AB key is the variant of the AB key of private_key_b
+    """
+    key_ab = add_private_key(private_key_a, private_key_b)
+    return (VARIANT_FACTORS[variant] * key_ab - private_key_a) % SECPK1_N
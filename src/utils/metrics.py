@@ -0,0 +1,107 @@
+import math
+from typing import TYPE_CHECKING, Callable, Iterable, NamedTuple
+
+from .stats import Histogram
+
+if TYPE_CHECKING:
+    from aiohttp import web
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Sample(NamedTuple):
+    """
+    One value of a metric, kind is "counter", "gauge" or "histogram"
+    """
+
+    name: str
+    kind: str
+    help: str
+    value: float | Histogram
+    labels: dict[str, str] | None = None
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        for value in labels.values()
+    )
+    return (
+        "{"
+        + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped))
+        + "}"
+    )
+
+
+def render(samples: Iterable[Sample]) -> str:
+    """
+    Prometheus text exposition of samples, grouped by metric name
+    """
+    families: dict[str, tuple[str, str, list[Sample]]] = {}
+    for sample in samples:
+        families.setdefault(sample.name, (sample.kind, sample.help, []))[2].append(
+            sample
+        )
+
+    lines = []
+    for name, (kind, help, family) in families.items():
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        for sample in family:
+            labels = sample.labels or {}
+            if kind != "histogram":
+                lines.append(
+                    f"{name}{_format_labels(labels)} {_format_value(sample.value)}"
+                )
+                continue
+
+            histogram = sample.value
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                bucket_labels = {**labels, "le": _format_value(float(bound))}
+                lines.append(
+                    f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}"
+                )
+            lines.append(
+                f"{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}"
+            )
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+
+async def serve(
+    collect: Callable[[], Iterable[Sample]], port: int, host: str = "0.0.0.0"
+) -> "web.AppRunner":
+    """
+    Serve GET /metrics on the running event loop.
+
+    Samples are read from the counters and histograms the miner keeps anyway, only
+    when scraped, so mining pays nothing for an idle endpoint.
+    """
+    # Not imported at module level: solvers import Sample in worker processes
+    from aiohttp import web
+
+    async def metrics(request: web.Request) -> web.Response:
+        return web.Response(
+            body=render(collect()).encode(), headers={"Content-Type": CONTENT_TYPE}
+        )
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,47 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Iterable, TypeVar
+
+from .metrics import Sample
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+
+class Startup:
+    """
+    Seconds from process start until each startup phase is done, phases run
+    concurrently and are only timed here
+    """
+
+    def __init__(self, started_at: float):
+        self.started_at = started_at
+        self.phases: dict[str, float] = {}
+
+    def done(self, phase: str):
+        self.phases[phase] = time.monotonic() - self.started_at
+        logger.info(f"Startup - {phase} in {self.phases[phase]:.2f}s")
+
+    async def run(self, phase: str, awaitable: Awaitable[T]) -> T:
+        result = await awaitable
+        self.done(phase)
+        return result
+
+    async def wait_first_hash(
+        self, get_speed: Callable[[], float], poll_interval: float = 0.01
+    ):
+        while get_speed() <= 0:
+            await asyncio.sleep(poll_interval)
+        self.done("first hash")
+
+    def get_metrics(self) -> Iterable[Sample]:
+        for phase, seconds in self.phases.items():
+            yield Sample(
+                "infinity_startup_seconds",
+                "gauge",
+                "Seconds from process start until a startup phase is done",
+                seconds,
+                {"phase": phase},
+            )
@@ -0,0 +1,178 @@
+import bisect
+import math
+import time
+from collections import deque
+
+# Upper bounds (seconds) suited for latencies from sub-millisecond to a few seconds
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Histogram:
+    """
+    Cumulative histogram with fixed bucket upper bounds, cheap enough to observe
+    from the hot path of a solver.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """
+        Upper bound of the bucket holding the q-th quantile (max for the last bucket)
+        """
+        if self.count == 0:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def __str__(self):
+        if self.count == 0:
+            return "no samples"
+        return (
+            f"n={self.count}"
+            f" avg={self.sum / self.count * 1000:.1f}ms"
+            f" p50<={self.quantile(0.5) * 1000:.1f}ms"
+            f" p99<={self.quantile(0.99) * 1000:.1f}ms"
+            f" max={self.max * 1000:.1f}ms"
+        )
+
+
+class RateMeter:
+    """
+    Rate of work (e.g. hashes) from a ring of timestamped samples, over sliding
+    windows and as an EWMA.
+
+    Each sample covers the time since the previous one, so work is spread over
+    the time it really took, problem switches included. Time while stopped
+    (e.g. no problem to mine) doesn't count.
+    """
+
+    def __init__(
+        self,
+        num_samples: int = 4096,
+        history: float = 300.0,
+        ewma_halflife: float = 10.0,
+    ):
+        # (start, end, amount) of each sample, oldest first
+        self.samples: deque[tuple[float, float, int]] = deque(maxlen=num_samples)
+        # Samples older than this many seconds are dropped
+        self.history = history
+        self.ewma_tau = ewma_halflife / math.log(2)
+
+        self.ewma = 0.0
+        self.total = 0
+        # End of the last sample, or start of mining, None while stopped
+        self.started_at: float | None = None
+        self.last_sample_at: float | None = None
+
+    @property
+    def running(self) -> bool:
+        return self.started_at is not None
+
+    def start(self, now: float | None = None):
+        """
+        Start timing the next sample, no-op when already running so the time
+        of a problem switch is accounted to the sample after it
+        """
+        if self.started_at is None:
+            self.started_at = time.monotonic() if now is None else now
+
+    def stop(self):
+        self.started_at = None
+
+    def add(self, amount: int, now: float | None = None):
+        now = time.monotonic() if now is None else now
+        if self.started_at is None:
+            # Nothing tells when the work started, the sample only counts in totals
+            self.total += amount
+            self.started_at = self.last_sample_at = now
+            return
+
+        duration = now - self.started_at
+        if duration > 0:
+            rate = amount / duration
+            if self.samples:
+                alpha = 1 - math.exp(-duration / self.ewma_tau)
+                self.ewma += alpha * (rate - self.ewma)
+            else:
+                self.ewma = rate
+            self.samples.append((self.started_at, now, amount))
+
+        self.total += amount
+        self.started_at = self.last_sample_at = now
+        while self.samples and self.samples[0][1] < now - self.history:
+            self.samples.popleft()
+
+    def _window(self, window: float, now: float | None = None):
+        """
+        (amount share, seconds) of each sample overlapping the last window seconds
+        """
+        now = time.monotonic() if now is None else now
+        since = now - window
+        # Copied at once, samples may be added from a device thread meanwhile
+        for start, end, amount in reversed(tuple(self.samples)):
+            if end <= since:
+                break
+            overlap = end - max(start, since)
+            yield amount * overlap / (end - start), overlap
+
+    def rate(self, window: float, now: float | None = None) -> float:
+        """
+        Average rate of the samples in the last window seconds
+        """
+        amount = seconds = 0.0
+        for share, overlap in self._window(window, now):
+            amount += share
+            seconds += overlap
+        return amount / seconds if seconds > 0 else 0.0
+
+    def extremes(self, window: float, now: float | None = None) -> tuple[float, float]:
+        """
+        Lowest and highest rate of a single sample in the last window seconds
+        """
+        rates = [
+            share / overlap for share, overlap in self._window(window, now) if overlap
+        ]
+        if not rates:
+            return 0.0, 0.0
+        return min(rates), max(rates)
+
+    def stalled(self, timeout: float, now: float | None = None) -> bool:
+        """
+        Running, but without a sample for more than timeout seconds
+        """
+        if self.started_at is None:
+            return False
+        now = time.monotonic() if now is None else now
+        return now - self.started_at > timeout
@@ -0,0 +1,50 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pyopencl as cl
+
+from solver.opencl import grid_size
+from solver.opencl.constants import load_g_precomp
+from solver.opencl.program import build_program
+
+
+def warmup_device(device: cl.Device, fused_score: bool, endomorphism: bool):
+    # Same program variant as Device builds, or the cache misses on start
+    inverse_size, _ = grid_size(device)
+    build_program(
+        cl.Context([device]), device, inverse_size, fused_score, endomorphism
+    )
+
+
+def main():
+    # Not imported at module level: only the solver options are needed from it
+    import config
+
+    logging.basicConfig(
+        level=os.getenv("LOGLEVEL", "INFO"),
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+    devices = [
+        device for platform in cl.get_platforms() for device in platform.get_devices()
+    ]
+
+    t_start = time.time()
+    load_g_precomp()
+    with ThreadPoolExecutor(max_workers=max(1, len(devices))) as executor:
+        list(
+            executor.map(
+                lambda device: warmup_device(
+                    device, config.FUSED_SCORE, config.ENDOMORPHISM
+                ),
+                devices,
+            )
+        )
+    logging.info(f"Caches warmed up in {time.time() - t_start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import socket
+
+from main import create_solvers
+from solver.base import BaseSolver
+from solver.remote import (
+    MAX_MESSAGE_SIZE,
+    SPEED_REPORT_INTERVAL,
+    read_message,
+    write_message,
+)
+
+logger = logging.getLogger("worker")
+
+# Seconds before reconnecting to the coordinator, doubled on every failure in a row
+RECONNECT_DELAY = 0.5
+MAX_RECONNECT_DELAY = 30.0
+
+
+async def solve(solver: BaseSolver, writer: asyncio.StreamWriter, problem: dict):
+    private_key_a = int(problem["private_key_a"], base=16)
+    difficulty = int(problem["difficulty"], base=16)
+    try:
+        async for private_key_b in solver.get_solutions(private_key_a, difficulty):
+            write_message(
+                writer,
+                {
+                    "type": "solution",
+                    "problem": problem["problem"],
+                    "private_key_b": hex(private_key_b),
+                },
+            )
+            await writer.drain()
+    except Exception as e:
+        logger.info(f"Mining problem #{problem['problem']} failed - {e}")
+        logger.debug("Details", exc_info=True)
+
+
+async def report_speed(solver: BaseSolver, writer: asyncio.StreamWriter):
+    while True:
+        write_message(writer, {"type": "speed", "hashrate": solver.get_speed()})
+        await writer.drain()
+        await asyncio.sleep(SPEED_REPORT_INTERVAL)
+
+
+async def work(solver: BaseSolver, host: str, port: int, name: str):
+    """
+    Mine the problems of one coordinator connection until it is closed
+    """
+    reader, writer = await asyncio.open_connection(host, port, limit=MAX_MESSAGE_SIZE)
+    logger.info(f"Connected to coordinator {host}:{port}")
+    write_message(writer, {"type": "hello", "name": name})
+
+    speed_task = asyncio.create_task(report_speed(solver, writer))
+    solve_task = None
+    try:
+        while (message := await read_message(reader)) is not None:
+            # The previous problem stops as soon as the next one is read
+            if solve_task is not None:
+                solve_task.cancel()
+                solve_task = None
+            if message["type"] == "problem":
+                logger.info(f"New problem #{message['problem']}")
+                solve_task = asyncio.create_task(solve(solver, writer, message))
+        logger.info("Coordinator closed the connection")
+    finally:
+        for task in (speed_task, solve_task):
+            if task is not None:
+                task.cancel()
+        writer.close()
+
+
+async def main():
+    # Not imported at module level: solver worker processes re-import this module
+    import config
+
+    solver = await asyncio.to_thread(create_solvers, config)
+    host, port = config.COORDINATOR.rsplit(":", 1)
+    name = config.WORKER_NAME or socket.gethostname()
+
+    delay = RECONNECT_DELAY
+    while True:
+        try:
+            await work(solver, host, int(port), name)
+            delay = RECONNECT_DELAY
+        except (ConnectionError, OSError, ValueError) as e:
+            logger.info(f"Coordinator connection failed - {e}")
+        logger.info(f"Reconnecting in {delay:.1f}s")
+        await asyncio.sleep(delay)
+        delay = min(2 * delay, MAX_RECONNECT_DELAY)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
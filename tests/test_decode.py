@@ -0,0 +1,54 @@
+import numpy as np
+from eth_keys.constants import SECPK1_N
+
+from miner.verify import MAGIC_NUMBER
+from solver.cpu.walk import AffineWalk
+from solver.opencl import decode_private_keys
+from solver.opencl import profanity_types as t
+from utils.ecdsa import get_account_ab
+
+PRIVATE_KEY_A = 0x3C6E0B8A9C15224A8228B9A98CA1531D5D6E5F1B8B4C7E5A3E0F8A9B2C1D0E0F
+PRIVATE_KEY_B = 0x1F0E2D3C4B5A69788796A5B4C3D2E1F00F1E2D3C4B5A69788796A5B4C3D2E1F0
+LANE_BASE = (1 << 64) + (1 << 128)
+
+
+def found(*rounds_and_lanes: tuple[int, int]) -> np.ndarray:
+    result = np.zeros(len(rounds_and_lanes), dtype=t.FOUND)
+    for i, (round, lane) in enumerate(rounds_and_lanes):
+        result[i] = (round, lane)
+    return result
+
+
+def test_decode_known_answer():
+    keys = decode_private_keys(5, 2, found((0, 0), (3, 7)))
+    assert keys == [
+        5 + (2 + 0 + 1) + LANE_BASE + (1 << 192),
+        5 + (2 + 3 + 1) + LANE_BASE + (8 << 192),
+    ]
+
+
+def test_decode_wraps_around_n():
+    (key,) = decode_private_keys(SECPK1_N - 1, 0, found((0, 0)))
+    assert key == (SECPK1_N - 1 + 1 + LANE_BASE + (1 << 192)) % SECPK1_N
+
+
+def test_decode_matches_walk():
+    """
+    Keys the walk finds (the kernels' layout) decode from their round and lane,
+    and their AB addresses meet the difficulty
+    """
+    difficulty = 1 << 157
+    walk = AffineWalk(
+        PRIVATE_KEY_A, PRIVATE_KEY_B, difficulty, inverse_size=16, inverse_multiple=16
+    )
+    lanes = found(*((0, lane) for lane in range(walk.size)))
+
+    solutions = 0
+    for _ in range(4):
+        decoded = set(decode_private_keys(PRIVATE_KEY_B, walk.round, lanes))
+        for private_key_b in walk.step():
+            assert private_key_b in decoded
+            address = get_account_ab(PRIVATE_KEY_A, private_key_b).address
+            assert int(address, base=16) ^ MAGIC_NUMBER <= difficulty
+            solutions += 1
+    assert solutions > 0
@@ -0,0 +1,97 @@
+import os
+import re
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from eth_account import Account
+from eth_keys.constants import SECPK1_N, SECPK1_P
+
+from solver.opencl import Device, decode_private_keys
+from solver.opencl import profanity_types as t
+from utils.ecdsa import (
+    LAMBDA,
+    VARIANT_FACTORS,
+    add_private_key,
+    get_account_ab,
+    private_key_to_ec_point,
+    variant_private_key_b,
+)
+
+# Cube root of unity mod p matching LAMBDA: λ(x, y) = (βx, y)
+BETA = 0x7AE96A2B657C07106E64479EAC3434E99CF0497512F58995C1396C28719501EE
+
+PRIVATE_KEY_A = 0x3C6E0B8A9C15224A8228B9A98CA1531D5D6E5F1B8B4C7E5A3E0F8A9B2C1D0E0F
+PRIVATE_KEY_B = 0x1F0E2D3C4B5A69788796A5B4C3D2E1F00F1E2D3C4B5A69788796A5B4C3D2E1F0
+
+
+def variant_point(point: tuple[int, int], variant: int) -> tuple[int, int]:
+    """
+    Point the kernels score as the variant, (x, y), (βx, y), (β²x, y), then negated
+    """
+    x, y = point
+    x = x * pow(BETA, variant % 3, SECPK1_P) % SECPK1_P
+    return (x, y) if variant < 3 else (x, SECPK1_P - y)
+
+
+def test_lambda_is_a_cube_root_of_unity():
+    assert LAMBDA != 1 and pow(LAMBDA, 3, SECPK1_N) == 1
+    assert BETA != 1 and pow(BETA, 3, SECPK1_P) == 1
+
+
+@pytest.mark.parametrize("variant", range(t.VARIANTS))
+def test_variant_factors_match_points(variant):
+    key = add_private_key(PRIVATE_KEY_A, PRIVATE_KEY_B)
+    assert private_key_to_ec_point(
+        VARIANT_FACTORS[variant] * key % SECPK1_N
+    ) == variant_point(private_key_to_ec_point(key), variant)
+
+
+@pytest.mark.parametrize("variant", range(t.VARIANTS))
+def test_variant_private_key_b(variant):
+    private_key_b = variant_private_key_b(PRIVATE_KEY_A, PRIVATE_KEY_B, variant)
+    key_ab = VARIANT_FACTORS[variant] * (PRIVATE_KEY_A + PRIVATE_KEY_B) % SECPK1_N
+    assert (
+        get_account_ab(PRIVATE_KEY_A, private_key_b).address
+        == Account.from_key(key_ab.to_bytes(32, byteorder="big")).address
+    )
+
+
+def test_variant_shift_matches_kernel():
+    path = os.path.join(os.path.dirname(t.__file__), "cl_programs", "profanity.cl")
+    with open(path) as f:
+        shift = re.search(r"#define PROFANITY_VARIANT_SHIFT (\d+)", f.read())
+    assert int(shift.group(1)) == t.VARIANT_SHIFT
+    assert t.VARIANTS <= 1 << (32 - t.VARIANT_SHIFT)
+
+
+def test_process_result_decodes_variants():
+    """
+    foundId holds the variant above VARIANT_SHIFT, the lane below it
+    """
+    entries = [(0, 0, 0), (1, 5, 1), (2, 9, 3), (3, 1234, 5)]
+    host_result = np.zeros(1, dtype=t.result_dtype(8))
+    host_result[0]["numFound"] = len(entries)
+    for i, (round, lane, variant) in enumerate(entries):
+        host_result[0]["found"][i] = (round, (variant << t.VARIANT_SHIFT) | lane)
+
+    device = SimpleNamespace(
+        private_key_a=PRIVATE_KEY_A,
+        private_key_b=PRIVATE_KEY_B,
+        endomorphism=True,
+        profiler=None,
+        overflows=0,
+        rounds=0,
+        solutions=0,
+        batch_size=1,
+    )
+    keys = Device._process_result(device, 2, host_result)
+
+    for key, (round, lane, variant) in zip(keys, entries, strict=True):
+        lanes = np.zeros(1, dtype=t.FOUND)
+        lanes[0] = (round, lane)
+        (scored,) = decode_private_keys(PRIVATE_KEY_B, 2, lanes)
+        point = private_key_to_ec_point(add_private_key(PRIVATE_KEY_A, scored))
+        assert private_key_to_ec_point(
+            add_private_key(PRIVATE_KEY_A, key)
+        ) == variant_point(point, variant)
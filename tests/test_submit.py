@@ -0,0 +1,99 @@
+from eth_account import Account
+from eth_account.messages import encode_defunct
+from eth_keys import keys
+from web3 import Web3
+
+from miner.solo.constants import POW_ABI, POW_ADDRESS
+from miner.solo.submit import (
+    SUBMIT_GAS,
+    TRANSFER_GAS,
+    SubmitTemplate,
+    submit_message_hash,
+)
+from miner.verify import verify_batch
+from utils.ecdsa import add_private_key
+
+MINER_KEY = bytes.fromhex(
+    "4c0883a69102937d6231471b5dbb6204fe5129617082792ae468d01a3f362318"
+)
+REWARD_RECIPIENT = "0x2c7536E3605D9C16a7a3D7b1898e529396a65c23"
+DATA = "miner-v2".encode()
+CHAIN_ID = 146
+
+PRIVATE_KEY_A = 0x3C6E0B8A9C15224A8228B9A98CA1531D5D6E5F1B8B4C7E5A3E0F8A9B2C1D0E0F
+PRIVATE_KEY_B = 0x1F0E2D3C4B5A69788796A5B4C3D2E1F00F1E2D3C4B5A69788796A5B4C3D2E1F0
+
+
+def solution():
+    (solution,) = verify_batch(
+        submit_message_hash(REWARD_RECIPIENT, DATA),
+        [(PRIVATE_KEY_A, 1 << 160, PRIVATE_KEY_B)],
+    )
+    return solution
+
+
+def test_solution_matches_eth_account():
+    """
+    publicKeyB and signatureAB as the contract recovers them
+    """
+    key_ab = add_private_key(PRIVATE_KEY_A, PRIVATE_KEY_B).to_bytes(32, "big")
+    message = Web3.solidity_keccak(["address", "bytes"], [REWARD_RECIPIENT, DATA])
+    public_key_b = keys.PrivateKey(PRIVATE_KEY_B.to_bytes(32, "big")).public_key
+
+    found = solution()
+    assert found.address_ab == Account.from_key(key_ab).address
+    assert found.public_key_b == (
+        int.from_bytes(public_key_b.to_bytes()[:32], "big"),
+        int.from_bytes(public_key_b.to_bytes()[32:], "big"),
+    )
+    assert (
+        found.signature_ab
+        == Account.sign_message(encode_defunct(message), key_ab).signature
+    )
+
+
+def test_sign_matches_eth_account():
+    found = solution()
+    template = SubmitTemplate(MINER_KEY, CHAIN_ID, REWARD_RECIPIENT, DATA)
+    calldata = Web3().eth.contract(abi=POW_ABI).encode_abi(
+        "submit", [REWARD_RECIPIENT, found.public_key_b, found.signature_ab, DATA]
+    )
+    assert template.calldata(found.public_key_b, found.signature_ab) == bytes.fromhex(
+        calldata[2:]
+    )
+
+    expected = Account.sign_transaction(
+        {
+            "type": 2,
+            "chainId": CHAIN_ID,
+            "nonce": 7,
+            "maxFeePerGas": 55 * 10**9,
+            "maxPriorityFeePerGas": 10**9,
+            "gas": SUBMIT_GAS,
+            "to": POW_ADDRESS,
+            "value": 0,
+            "data": calldata,
+        },
+        MINER_KEY,
+    )
+    assert template.sign(found, 7, 55 * 10**9, 10**9) == expected.raw_transaction
+
+
+def test_cancel_matches_eth_account():
+    template = SubmitTemplate(MINER_KEY, CHAIN_ID, REWARD_RECIPIENT, DATA)
+    miner = Account.from_key(MINER_KEY)
+    expected = Account.sign_transaction(
+        {
+            "type": 2,
+            "chainId": CHAIN_ID,
+            "nonce": 8,
+            "maxFeePerGas": 60 * 10**9,
+            "maxPriorityFeePerGas": 2 * 10**9,
+            "gas": TRANSFER_GAS,
+            "to": miner.address,
+            "value": 0,
+            "data": b"",
+        },
+        MINER_KEY,
+    )
+    assert template.cancel(8, 60 * 10**9, 2 * 10**9) == expected.raw_transaction